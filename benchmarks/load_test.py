@@ -0,0 +1,259 @@
+"""
+Multi-session load test for the dashboard.
+
+Simulates N concurrent users driving realistic widget interactions (task2 year
+slider, task3 Time Grouping / threshold controls, home page column explorer)
+through Streamlit's AppTest, and reports rerun latency percentiles, throughput
+and resident memory over time.
+
+Usage (from the repository root):
+    python benchmarks/load_test.py --sessions 20 --interactions 10
+    python benchmarks/load_test.py --sessions 8 --mode threads --json results.json
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# -----------------------------------------------------------------------------
+# Scenarios: each one opens a page and returns a list of interactions. An
+# interaction mutates a widget on the AppTest and is followed by a timed rerun.
+
+
+def _widget(widgets, label):
+    """Find a widget by its label (the pages do not set keys everywhere)"""
+    for widget in widgets:
+        if widget.label == label:
+            return widget
+    raise LookupError(f"No widget labelled {label!r}")
+
+
+def _task2_interactions(rng):
+    def move_year_slider(at):
+        start = int(rng.integers(1971, 2010))
+        end = int(rng.integers(start + 1, 2018))
+        _widget(at.slider, 'Select Year Range').set_range(start, end)
+    return [move_year_slider]
+
+
+def _task3_interactions(rng):
+    def switch_time_grouping(at):
+        at.selectbox(key="time_group").select(rng.choice(["Month", "Year"]))
+
+    def move_threshold(at):
+        _widget(at.slider, 'Minimum Incidents per Weapon Type').set_value(int(rng.integers(1, 51)))
+
+    def toggle_log_scale(at):
+        checkbox = _widget(at.checkbox, 'Use Log Scale')
+        checkbox.set_value(not checkbox.value)
+
+    return [switch_time_grouping, move_threshold, toggle_log_scale]
+
+
+def _home_interactions(rng):
+    def select_column(at):
+        selectbox = _widget(at.selectbox, 'Select Column for Detailed Analysis')
+        selectbox.select(rng.choice(list(selectbox.options)))
+    return [select_column]
+
+
+SCENARIOS = {
+    'task2': ('pages/task2.py', _task2_interactions),
+    'task3': ('pages/task3.py', _task3_interactions),
+    'home': ('homePage.py', _home_interactions),
+}
+
+
+def _timed_run(at):
+    """Rerun the page: (start time, latency in seconds, ok)"""
+    started = time.time()
+    start = time.perf_counter()
+    try:
+        at.run()
+        ok = not at.exception
+    except RuntimeError:
+        # AppTest raises on timeout
+        ok = False
+    return started, time.perf_counter() - start, ok
+
+
+def run_session(session_id, scenario, interactions, timeout, seed):
+    """
+    Run one simulated user session and return its timed reruns.
+
+    Each rerun is recorded as (scenario, start time in seconds since the
+    epoch, latency in seconds, ok); the report turns start times into offsets
+    from the start of the test.
+    """
+    os.chdir(ROOT)
+    if str(ROOT) not in sys.path:
+        sys.path.insert(0, str(ROOT))
+    from streamlit.testing.v1 import AppTest
+
+    rng = np.random.default_rng(seed + session_id)
+    script, make_interactions = SCENARIOS[scenario]
+    script = str(ROOT / script)
+    actions = make_interactions(rng)
+    records = []
+
+    at = AppTest.from_file(script, default_timeout=timeout)
+    records.append((scenario, *_timed_run(at)))
+
+    for _ in range(interactions):
+        action = actions[int(rng.integers(len(actions)))]
+        try:
+            action(at)
+        except LookupError:
+            # The page failed to render the widget (e.g. an exception on the
+            # previous run); count it as an error and reload the page.
+            records.append((scenario, time.time(), 0.0, False))
+            at = AppTest.from_file(script, default_timeout=timeout)
+            records.append((scenario, *_timed_run(at)))
+            continue
+        records.append((scenario, *_timed_run(at)))
+    return records
+
+
+# -----------------------------------------------------------------------------
+# Memory sampling
+
+
+def _rss_kb(pid):
+    """Resident set size of a process in kB, read from /proc (Linux only)"""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except (FileNotFoundError, ProcessLookupError, PermissionError):
+        pass
+    return 0
+
+
+def _child_pids(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as children:
+            return [int(child) for child in children.read().split()]
+    except FileNotFoundError:
+        return []
+
+
+class RSSSampler(threading.Thread):
+    """Sample the RSS of this process (plus worker processes) at a fixed interval"""
+
+    def __init__(self, interval):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.samples = []
+        self._stop_event = threading.Event()
+
+    def run(self):
+        pid = os.getpid()
+        while not self._stop_event.is_set():
+            total_kb = _rss_kb(pid) + sum(_rss_kb(child) for child in _child_pids(pid))
+            self.samples.append((time.time(), total_kb / 1024))
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+# -----------------------------------------------------------------------------
+# Reporting
+
+
+def summarize(records, wall_time):
+    """Latency percentiles and throughput, overall and per scenario"""
+    summary = {}
+    groups = {'all': records}
+    for scenario in sorted({record[0] for record in records}):
+        groups[scenario] = [record for record in records if record[0] == scenario]
+
+    for name, group in groups.items():
+        latencies = np.array([record[2] for record in group if record[3]])
+        errors = sum(1 for record in group if not record[3])
+        stats = {'reruns': len(group), 'errors': errors}
+        if latencies.size:
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            stats.update({
+                'p50_ms': p50 * 1000,
+                'p95_ms': p95 * 1000,
+                'p99_ms': p99 * 1000,
+                'max_ms': latencies.max() * 1000,
+            })
+        stats['throughput_per_s'] = len(group) / wall_time if wall_time else 0.0
+        summary[name] = stats
+    return summary
+
+
+def print_report(summary, rss_samples, started):
+    print(f"{'scenario':<10}{'reruns':>8}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'rerun/s':>10}")
+    for name, stats in summary.items():
+        print(
+            f"{name:<10}{stats['reruns']:>8}{stats['errors']:>8}"
+            f"{stats.get('p50_ms', float('nan')):>10.1f}{stats.get('p95_ms', float('nan')):>10.1f}"
+            f"{stats.get('p99_ms', float('nan')):>10.1f}{stats['throughput_per_s']:>10.2f}"
+        )
+    if rss_samples:
+        print("\nRSS over time (MB):")
+        step = max(1, len(rss_samples) // 20)
+        for timestamp, rss_mb in rss_samples[::step]:
+            print(f"  t={timestamp - started:7.1f}s  {rss_mb:9.1f}")
+        print(f"  peak {max(rss for _, rss in rss_samples):.1f} MB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1], formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=10, help='Number of concurrent simulated users')
+    parser.add_argument('--interactions', type=int, default=5, help='Widget interactions per session')
+    parser.add_argument('--scenarios', nargs='+', choices=sorted(SCENARIOS), default=['task2', 'task3'],
+                        help='Scenarios assigned round-robin to sessions')
+    parser.add_argument('--mode', choices=['processes', 'threads'], default='processes',
+                        help='processes isolate sessions; threads share one in-process cache like a single server '
+                             '(AppTest keeps a global runtime, so expect occasional spurious errors)')
+    parser.add_argument('--timeout', type=float, default=300, help='Per-rerun timeout in seconds')
+    parser.add_argument('--rss-interval', type=float, default=0.5, help='Seconds between RSS samples')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', type=Path, help='Write the full results to this JSON file')
+    args = parser.parse_args(argv)
+
+    sampler = RSSSampler(args.rss_interval)
+    sampler.start()
+    started = time.time()
+
+    executor_cls = ThreadPoolExecutor if args.mode == 'threads' else ProcessPoolExecutor
+    with executor_cls(max_workers=args.sessions) as executor:
+        futures = [
+            executor.submit(run_session, session_id, args.scenarios[session_id % len(args.scenarios)],
+                            args.interactions, args.timeout, args.seed)
+            for session_id in range(args.sessions)
+        ]
+        records = [record for future in futures for record in future.result()]
+
+    wall_time = time.time() - started
+    sampler.stop()
+
+    summary = summarize(records, wall_time)
+    print_report(summary, sampler.samples, started)
+
+    if args.json:
+        args.json.write_text(json.dumps({
+            'args': {key: str(value) for key, value in vars(args).items()},
+            'wall_time_s': wall_time,
+            'summary': summary,
+            'rss_mb': [(timestamp - started, rss) for timestamp, rss in sampler.samples],
+            'reruns': [(scenario, timestamp - started, latency, ok) for scenario, timestamp, latency, ok in records],
+        }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
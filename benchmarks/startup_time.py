@@ -0,0 +1,136 @@
+"""
+Import-time profile and cold-start budget for the app and its pages.
+
+For every entry script this collects its top-level imports, runs them in a
+fresh interpreter with `-X importtime`, and then times the first AppTest run
+of the script in another fresh interpreter. Results are checked against the
+budgets below and the script exits non-zero when one is exceeded.
+
+Usage (from the repository root):
+    python benchmarks/startup_time.py
+    python benchmarks/startup_time.py --top 15 --json startup.json
+"""
+import argparse
+import ast
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Budgets in milliseconds: imports of the script, and imports + first render.
+BUDGETS = {
+    'streamlit_app.py': {'imports_ms': 1500, 'cold_start_ms': None},
+    'homePage.py': {'imports_ms': 1500, 'cold_start_ms': 5000},
+    'pages/task1.py': {'imports_ms': 2000, 'cold_start_ms': 15000},
+    'pages/task2.py': {'imports_ms': 1500, 'cold_start_ms': 6000},
+    'pages/task3.py': {'imports_ms': 1500, 'cold_start_ms': 8000},
+}
+
+# Modules that should never be imported at page load
+FORBIDDEN_AT_IMPORT = ['scipy', 'matplotlib', 'plotly.figure_factory']
+
+COLD_START_SNIPPET = """
+import sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({script!r}, default_timeout=300).run()
+elapsed = time.perf_counter() - start
+print('COLD_START', elapsed, len(at.exception))
+"""
+
+
+def top_level_imports(script):
+    """Source of the import statements at module level of a script"""
+    tree = ast.parse((ROOT / script).read_text(encoding='utf-8'))
+    return "\n".join(ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom)))
+
+
+def profile_imports(script):
+    """
+    Run the script's imports under -X importtime. Returns the total time and
+    a {module: cumulative microseconds} mapping of every imported module.
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', top_level_imports(script)],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        name = name.rstrip()
+        # Top-level imports have no indentation; keep them separately for the total
+        modules[name.strip()] = (int(cumulative), not name.startswith('  '))
+    total_us = sum(cumulative for cumulative, top in modules.values() if top)
+    return total_us / 1000, {name: cumulative for name, (cumulative, _) in modules.items()}
+
+
+def cold_start(script):
+    """Time the first run of a page (imports, data loading and rendering) in a fresh interpreter"""
+    result = subprocess.run(
+        [sys.executable, '-c', COLD_START_SNIPPET.format(root=str(ROOT), script=str(ROOT / script))],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    for line in result.stdout.splitlines():
+        if line.startswith('COLD_START'):
+            _, elapsed, errors = line.split()
+            return float(elapsed) * 1000, int(errors)
+    raise RuntimeError(f"Cold start of {script} did not report a time:\n{result.stderr}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument('--scripts', nargs='+', default=list(BUDGETS), help='Entry scripts to measure')
+    parser.add_argument('--top', type=int, default=10, help='Slowest modules to list per script')
+    parser.add_argument('--skip-cold-start', action='store_true', help='Only profile imports')
+    parser.add_argument('--json', type=Path, help='Write the results to this JSON file')
+    args = parser.parse_args(argv)
+
+    results = {}
+    failures = []
+    for script in args.scripts:
+        imports_ms, modules = profile_imports(script)
+        budget = BUDGETS.get(script, {})
+        entry = {'imports_ms': imports_ms, 'slowest_modules_ms': {}}
+
+        print(f"\n{script}")
+        print(f"  imports: {imports_ms:8.1f} ms (budget {budget.get('imports_ms')})")
+        slowest = sorted(modules.items(), key=lambda item: item[1], reverse=True)[:args.top]
+        for name, cumulative_us in slowest:
+            print(f"    {cumulative_us / 1000:8.1f} ms  {name}")
+            entry['slowest_modules_ms'][name] = cumulative_us / 1000
+
+        if budget.get('imports_ms') and imports_ms > budget['imports_ms']:
+            failures.append(f"{script}: imports took {imports_ms:.0f} ms > {budget['imports_ms']} ms")
+        for forbidden in FORBIDDEN_AT_IMPORT:
+            if forbidden in modules:
+                failures.append(f"{script}: imports {forbidden} at module load")
+
+        if not args.skip_cold_start and budget.get('cold_start_ms'):
+            cold_start_ms, errors = cold_start(script)
+            entry['cold_start_ms'] = cold_start_ms
+            print(f"  cold start: {cold_start_ms:8.1f} ms (budget {budget['cold_start_ms']})")
+            if errors:
+                failures.append(f"{script}: first run raised {errors} exception(s)")
+            if cold_start_ms > budget['cold_start_ms']:
+                failures.append(f"{script}: cold start took {cold_start_ms:.0f} ms > {budget['cold_start_ms']} ms")
+        results[script] = entry
+
+    if args.json:
+        args.json.write_text(json.dumps({'results': results, 'failures': failures}, indent=2))
+
+    if failures:
+        print("\nBudget exceeded:")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    print("\nAll startup budgets met")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
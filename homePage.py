@@ -2,6 +2,11 @@ import streamlit as st
 import pandas as pd
 from pathlib import Path
 import plotly.express as px
+import plotly.graph_objects as go
+from utils.chunked import get_aggregates, is_out_of_core
+from utils.data import VEHICLE_WEAPON, dataset_version, get_raw_data, replace_value
+from utils.histograms import histogram_trace
+from utils.missingness import get_missingness
 
 hide_streamlit_style = """
             <style>
@@ -11,15 +16,16 @@ hide_streamlit_style = """
 st.markdown(hide_streamlit_style, unsafe_allow_html=True)
 
 # -----------------------------------------------------------------------------
-@st.cache_data
-def get_data():
+columns_names = ["iyear","imonth","iday","city","latitude","longitude","nperps","nkill","nwound","weaptype1_txt"]
+
+@st.cache_resource
+def get_data(version):
     """
-    Read the Terror Attacks data from the CSV file and convert negative values to null
+    Read the Terror Attacks data and convert negative values to null.
+    Cached as a resource: one copy per worker, shared by its sessions, so
+    callers must not modify it.
     """
-    DATA_FILENAME = Path(__file__).parent/'data/IL_data.csv'
-    data = pd.read_csv(DATA_FILENAME, encoding='ISO-8859-1')
-    columns_names = ["iyear","imonth","iday","city","latitude","longitude","nperps","nkill","nwound","weaptype1_txt"]
-
+    data = get_raw_data(version)
     data = data[columns_names]
 
     # Convert negative values to null in numeric columns
@@ -28,7 +34,7 @@ def get_data():
             data.loc[data[column] < 0, column] = pd.NA
 
     # Change weapon type colors for vehicle-related attacks
-    data.loc[data['weaptype1_txt'] == 'Vehicle (not to include vehicle-borne explosives, i.e., car or truck bombs)', 'weaptype1_txt'] = 'Vehicle'
+    data['weaptype1_txt'] = replace_value(data['weaptype1_txt'], VEHICLE_WEAPON, 'Vehicle')
     
     # Change type of columns
     cols_to_int = ['iyear', 'imonth', 'iday', 'nperps', 'nkill', 'nwound']
@@ -40,7 +46,7 @@ def get_data():
     data['weaptype1_txt'] = data['weaptype1_txt'].astype('category')
 
     # Change Sederot to Sderot
-    data.loc[data['city'] == 'Sederot', 'city'] = 'Sderot'
+    data['city'] = replace_value(data['city'], 'Sederot', 'Sderot')
         
     return data
 
@@ -104,10 +110,10 @@ def display_column_info(data):
     with col2:
         st.metric("Total Columns", f"{len(data.columns):,}")
     with col3:
-        st.metric("Missing Values", f"{data.isna().sum().sum():,}")
+        st.metric("Missing Values", f"{data.isna().sum().sum():,}", help="In the columns shown here; see the Missingness tab for all columns")
     
     # Create tabs for different views
-    tab1, tab2 = st.tabs(["📊 Column Overview", "🔍 Detailed Analysis"])
+    tab1, tab2, tab3 = st.tabs(["📊 Column Overview", "🔍 Detailed Analysis", "🧩 Missingness"])
     columns_decs = get_columns_desc()
     with tab1:
         # Create a summary table with color coding
@@ -172,12 +178,18 @@ def display_column_info(data):
             
             # Visualization based on data type
             if pd.api.types.is_numeric_dtype(data[selected_column]):
-                fig = px.histogram(
-                    data, 
-                    x=selected_column,
+                # Binned on the server, only the bin counts are sent to the browser
+                fig = go.Figure(
+                    histogram_trace(
+                        data[selected_column].to_numpy(dtype=float),
+                        hovertemplate=f'{display_name}: %{{customdata[0]:.4~g}} - %{{customdata[1]:.4~g}}<br>Count: %{{y}}<extra></extra>'
+                    )
+                )
+                fig.update_layout(
                     title=f"Distribution of {display_name}",
                     template="plotly_white",
-                    labels={selected_column: display_name, "Count": "Frequency", "y": "Count"}
+                    xaxis_title=display_name,
+                    yaxis_title="Count"
                 )
                 st.plotly_chart(fig, use_container_width=True)
             else:
@@ -233,10 +245,138 @@ def display_column_info(data):
             # Display statistics as metrics
             for stat, value in stats_dict.items():
                 st.metric(stat, value)
+
+    with tab3:
+        missingness_explorer()
             
 
-df = get_data()
+@st.fragment
+def missingness_explorer():
+    """
+    Which of all the dataset's columns are missing, missing together, and in
+    which years. Answered from per-column missingness bitmaps built once at
+    load, so changing the controls only reruns this section.
+    """
+    masks = get_missingness(dataset_version())
+
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        years = st.slider(
+            "Year Range",
+            min_value=masks.years[0],
+            max_value=masks.years[-1],
+            value=(masks.years[0], masks.years[-1]),
+            key='missingness_years'
+        )
+    with col2:
+        include_unknown = st.checkbox(
+            "Count unknown codes (-9 / -99) as missing",
+            key='missingness_unknown'
+        )
+
+    missing, rows = masks.missing_counts(years, include_unknown)
+    if rows == 0:
+        st.warning("No events in the selected year range")
+        return
+    missing_share = missing / rows
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Missing Cells (all columns)", f"{missing.sum():,}", f"{missing.sum() / (rows * len(missing)) * 100:.1f}% of cells", delta_color="off")
+    with col2:
+        st.metric("Complete Columns", f"{(missing == 0).sum()} / {len(missing)}")
+    with col3:
+        st.metric("Columns Mostly Missing (> 50%)", f"{(missing_share > 0.5).sum()}")
+
+    # Columns that are always or never missing carry no co-missingness information
+    partial = missing_share[(missing > 0) & (missing < rows)].sort_values().index
+
+    st.write("#### Co-Missingness")
+    st.caption("Correlation between the missing indicators of two columns: close to 1 when they are missing in the same events, negative when one is filled in where the other is missing. Columns ordered by their share of missing values.")
+    phi = masks.co_missingness(years, include_unknown).loc[partial, partial]
+    fig = go.Figure(go.Heatmap(
+        z=phi.values,
+        x=phi.columns,
+        y=phi.index,
+        zmin=-1,
+        zmax=1,
+        colorscale='RdBu_r',
+        hovertemplate='%{y} & %{x}<br>Correlation: %{z:.2f}<extra></extra>'
+    ))
+    fig.update_layout(
+        template="plotly_white",
+        height=max(400, 14 * len(partial) + 150),
+        yaxis=dict(autorange='reversed')
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
+    st.write("#### Completeness by Year")
+    completeness = masks.completeness(years, include_unknown).loc[partial] * 100
+    fig = go.Figure(go.Heatmap(
+        z=completeness.values,
+        x=completeness.columns,
+        y=completeness.index,
+        zmin=0,
+        zmax=100,
+        colorscale='YlGn',
+        colorbar=dict(title="Present (%)"),
+        hovertemplate='%{y}, %{x}<br>Present: %{z:.1f}%<extra></extra>'
+    ))
+    fig.update_layout(
+        template="plotly_white",
+        height=max(400, 14 * len(partial) + 150),
+        xaxis_title="Year",
+        yaxis=dict(autorange='reversed')
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
+
+# Function to display the column profile of a streamed (out-of-core) data file
+def display_column_profile(profile, rows):
+    """
+    The overview of display_column_info, computed chunk by chunk from the CSV
+    instead of from the loaded data (unique counts are approximate)
+    """
+    st.header("Dataset Explorer", divider="rainbow")
+    profile = profile.loc[columns_names]
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Total Rows", f"{rows:,}")
+    with col2:
+        st.metric("Total Columns", f"{len(profile):,}")
+    with col3:
+        st.metric("Missing Values", f"{profile['missing'].sum():,}")
+
+    columns_decs = get_columns_desc()
+    descriptions = columns_decs.set_index(columns_decs.columns[0])
+    summary_df = pd.DataFrame({
+        "Column": descriptions.loc[profile.index].iloc[:, 1].values,
+        "Type": profile['type'].values,
+        "Unique Values (approx.)": profile['unique'].values,
+        "Missing Values (%)": [f"{missing / rows * 100:.1f}%" for missing in profile['missing']],
+        "Min": [f"{value:,.2f}" if pd.notna(value) else "N/A" for value in profile['min']],
+        "Max": [f"{value:,.2f}" if pd.notna(value) else "N/A" for value in profile['max']],
+        "Mean": [f"{value:,.2f}" if pd.notna(value) else "N/A" for value in profile['mean']],
+        "Std Dev": [f"{value:,.2f}" if pd.notna(value) else "N/A" for value in profile['std']],
+        "Description": descriptions.loc[profile.index].iloc[:, 0].values,
+    }, index=range(1, len(profile) + 1))
+    st.dataframe(
+        summary_df.style.background_gradient(
+            subset=['Unique Values (approx.)'],
+            cmap='YlOrRd'
+        ),
+        use_container_width=True,
+        height=400
+    )
+    st.caption("Out-of-core mode: the data file is profiled in chunks without being loaded, so the detailed column analysis is not available.")
+
 
 # Display the enhanced column information
 st.divider()
-display_column_info(df)
+if is_out_of_core():
+    aggregates = get_aggregates(dataset_version())
+    display_column_profile(aggregates.profile.frame(), aggregates.profile.rows)
+else:
+    df = get_data(dataset_version())
+    display_column_info(df)
@@ -0,0 +1,159 @@
+import streamlit as st
+import numpy as np
+import plotly.express as px
+import plotly.graph_objects as go
+from utils.data import dataset_version
+from utils.filters import filter_mask, render_filter_sidebar
+from utils.network import centrality, get_group_network, period_evolution, spring_layout
+
+# -----------------------------------------------------------------------------
+
+st.markdown(
+    '''
+    <div style="text-align: right; direction: rtl;font-size: large;">
+    בעמוד זה מוצגת רשת הקשרים בין ארגוני הטרור:
+    <br>
+    <b>אילו ארגונים פעלו יחד, או נטלו אחריות משותפת על אותם פיגועים, וכיצד השתנו הקשרים לאורך השנים?</b>
+    </div>
+    ''',
+    unsafe_allow_html=True
+)
+
+st.markdown("<br>", unsafe_allow_html=True)
+
+col1, col2 = st.columns(2)
+
+with col1:
+    st.markdown(
+        '''
+        <div style="text-align: right; direction: rtl;">
+        <ul>
+            <li>כל עיגול מייצג ארגון, וגודלו מייצג את מספר האירועים בהם הארגון היה מעורב</li>
+            <li>קו בין שני ארגונים מייצג אירועים משותפים, ועוביו מייצג את מספר האירועים המשותפים</li>
+            <li>הצבע מייצג את מרכזיות הארגון ברשת (Eigenvector Centrality)</li>
+        </ul>
+        </div>
+        ''',
+        unsafe_allow_html=True
+    )
+
+with col2:
+    st.markdown(
+        '''
+        <div style="text-align: right; direction: rtl;">
+        אירועים משותפים הם אירועים בהם מספר ארגונים נטלו אחריות (gname, gname2, gname3),
+        או אירועים המקושרים זה לזה כחלק מאותה מתקפה (related).
+        <br>
+        ארגונים שזהותם אינה ידועה (Unknown) אינם מוצגים.
+        </div>
+        ''',
+        unsafe_allow_html=True
+    )
+
+# Create sidebar controls
+st.sidebar.header("Network Controls")
+max_groups = st.sidebar.slider("Groups Shown", min_value=10, max_value=100, value=40, step=5,
+                               help="The groups with the most shared incidents")
+min_shared = st.sidebar.slider("Minimum Shared Incidents", min_value=1, max_value=10, value=1)
+period_years = st.sidebar.selectbox("Evolution Period (years)", [5, 10], index=1)
+
+# Filters shared with the other pages
+render_filter_sidebar()
+
+network = get_group_network(dataset_version())
+event_mask = filter_mask()
+cooccurrence = network.cooccurrence(network.incident_mask(event_mask))
+metrics = centrality(cooccurrence)
+metrics.index = network.groups
+
+# Keep the most connected groups (then the most active ones)
+shown = metrics[metrics['incidents'] > 0].sort_values(['weighted_degree', 'incidents'], ascending=False).head(max_groups)
+if shown.empty:
+    st.warning("No perpetrator groups match the selected filters")
+    st.stop()
+
+positions_in_matrix = network.groups.get_indexer(shown.index)
+adjacency = cooccurrence[positions_in_matrix][:, positions_in_matrix].toarray().astype(float)
+np.fill_diagonal(adjacency, 0)
+adjacency[adjacency < min_shared] = 0
+layout = spring_layout(adjacency)
+
+# Edges: one trace per width class keeps the payload small
+fig = go.Figure()
+sources, targets = np.nonzero(np.triu(adjacency))
+edge_weights = adjacency[sources, targets]
+for low, high, width in [(1, 2, 1), (2, 5, 2.5), (5, np.inf, 5)]:
+    in_class = (edge_weights >= low) & (edge_weights < high)
+    if not in_class.any():
+        continue
+    xs = np.column_stack([layout[sources[in_class], 0], layout[targets[in_class], 0], np.full(in_class.sum(), np.nan)]).ravel()
+    ys = np.column_stack([layout[sources[in_class], 1], layout[targets[in_class], 1], np.full(in_class.sum(), np.nan)]).ravel()
+    fig.add_trace(go.Scatter(
+        x=xs, y=ys, mode='lines', line=dict(width=width, color='rgba(128, 128, 128, 0.5)'),
+        hoverinfo='skip', showlegend=False
+    ))
+
+fig.add_trace(go.Scatter(
+    x=layout[:, 0],
+    y=layout[:, 1],
+    mode='markers+text',
+    text=[name if len(name) <= 30 else name[:28] + '…' for name in shown.index],
+    textposition='top center',
+    marker=dict(
+        size=10 + 40 * np.sqrt(shown['incidents'] / shown['incidents'].max()),
+        color=shown['eigenvector'],
+        colorscale='Viridis',
+        showscale=True,
+        colorbar=dict(title='Centrality'),
+        line=dict(width=1, color='white')
+    ),
+    customdata=shown[['incidents', 'degree', 'weighted_degree']].to_numpy(),
+    hovertext=shown.index,
+    hovertemplate='<span style="font-size: 14px;"><b>%{hovertext}</b><br>'
+                  'Incidents: %{customdata[0]}<br>Partner Groups: %{customdata[1]}<br>'
+                  'Shared Incidents: %{customdata[2]}<br>Centrality: %{marker.color:.2f}</span><extra></extra>',
+    showlegend=False
+))
+fig.update_layout(
+    height=750,
+    title={'text': 'Perpetrator Groups Co-occurrence Network', 'font': {'size': 24}},
+    xaxis=dict(visible=False),
+    yaxis=dict(visible=False),
+    plot_bgcolor='white'
+)
+st.plotly_chart(fig, use_container_width=True)
+
+# Centrality metrics
+st.sidebar.markdown("### Most Central Groups")
+st.sidebar.dataframe(
+    shown.sort_values('eigenvector', ascending=False)[['incidents', 'degree', 'eigenvector']].rename(
+        columns={'incidents': 'Incidents', 'degree': 'Partners', 'eigenvector': 'Centrality'}
+    ).style.format({'Centrality': '{:.2f}'}),
+    use_container_width=True
+)
+
+# Evolution of the network per period
+st.markdown("### Network Evolution")
+summary, degrees = period_evolution(network, event_mask, period_years)
+evolution_col, degree_col = st.columns(2)
+with evolution_col:
+    fig = px.line(
+        summary.melt(id_vars='period', var_name='metric', value_name='count'),
+        x='period',
+        y='count',
+        color='metric',
+        markers=True,
+        labels={'period': 'Period', 'count': 'Count', 'metric': ''},
+        title='Active Groups, Connected Groups and Links per Period'
+    )
+    st.plotly_chart(fig, use_container_width=True)
+with degree_col:
+    top_groups = degrees.loc[shown.index[:8]]
+    fig = px.imshow(
+        top_groups,
+        color_continuous_scale='Blues',
+        labels={'x': 'Period', 'y': 'Group', 'color': 'Partner Groups'},
+        title='Partner Groups per Period (most connected groups)',
+        aspect='auto'
+    )
+    st.plotly_chart(fig, use_container_width=True)
@@ -0,0 +1,115 @@
+import streamlit as st
+import time
+import plotly.express as px
+from utils.cube import DIMENSIONS, MEASURES, TIME_LEVELS, drill_down, get_cube, roll_up
+from utils.data import dataset_version
+from utils.filters import get_selection, render_filter_sidebar
+
+# -----------------------------------------------------------------------------
+
+st.markdown(
+    '''
+    <div style="text-align: right; direction: rtl;font-size: large;">
+    בעמוד זה ניתן לחקור את הנתונים באופן חופשי לפי כל שילוב של שני מאפיינים:
+    <br>
+    <b>סוג נשק, סוג מטרה, שיטת תקיפה, אזור, הצלחת הפיגוע, פיגוע התאבדות וזמן.</b>
+    <br>
+    הנתונים מחושבים מראש בקוביית נתונים (OLAP Cube), כך שכל שינוי בבחירה מוצג באופן מיידי.
+    ניתן לעבור בין רמות הזמן (עשור, שנה, חודש) בעזרת הכפתורים.
+    </div>
+    ''',
+    unsafe_allow_html=True
+)
+
+st.markdown("<br>", unsafe_allow_html=True)
+
+NON_TIME_DIMENSIONS = [dim for dim in DIMENSIONS if dim not in TIME_LEVELS]
+NONE = "None"
+
+if 'time_level' not in st.session_state:
+    st.session_state['time_level'] = 'year'
+
+
+def _label(dim):
+    # Kept independent of the time level so drilling does not reset the selection
+    return 'Time' if dim == 'time' else DIMENSIONS.get(dim, dim)
+
+
+# Create sidebar controls
+st.sidebar.header("Pivot Controls")
+row_dim = st.sidebar.selectbox("Rows", ['time'] + NON_TIME_DIMENSIONS, index=1, format_func=_label)
+column_dim = st.sidebar.selectbox(
+    "Columns",
+    [NONE] + [dim for dim in ['time'] + NON_TIME_DIMENSIONS if dim != row_dim],
+    index=1,
+    format_func=lambda dim: dim if dim == NONE else _label(dim)
+)
+measure = st.sidebar.radio("Measure", list(MEASURES), format_func=MEASURES.get)
+regions = st.sidebar.multiselect("Region", get_cube(dataset_version()).labels['region'], placeholder="All")
+
+# Drill-down / roll-up along the time hierarchy
+if 'time' in (row_dim, column_dim):
+    up_col, down_col = st.sidebar.columns(2)
+    level = st.session_state['time_level']
+    st.sidebar.caption(f"Time level: {DIMENSIONS[level]}")
+    if up_col.button("⬆ Roll up", disabled=level == TIME_LEVELS[0], use_container_width=True):
+        st.session_state['time_level'] = roll_up(level)
+        st.rerun()
+    if down_col.button("⬇ Drill down", disabled=level == TIME_LEVELS[-1], use_container_width=True):
+        st.session_state['time_level'] = drill_down(level)
+        st.rerun()
+
+# Weapon, target, attack type and year filters shared with the other pages
+render_filter_sidebar(dims=('year', 'weapon', 'target', 'attack'))
+
+selection = get_selection()
+cube = get_cube(dataset_version())
+dice = {
+    'weapon': selection['weapon'] or None,
+    'target': selection['target'] or None,
+    'attack': selection['attack'] or None,
+    'region': regions or None,
+    'year': list(range(selection['year'][0], selection['year'][1] + 1)) if selection['year'] else None,
+}
+if selection['city']:
+    st.info("The city filter is not a dimension of the cube and is not applied on this page")
+
+dims = [st.session_state['time_level'] if dim == 'time' else dim for dim in (row_dim, column_dim) if dim != NONE]
+start = time.perf_counter()
+result = cube.aggregate(dims, dice)
+elapsed_ms = (time.perf_counter() - start) * 1000
+st.caption(
+    f"Answered in {elapsed_ms:.1f} ms from the cuboid ({', '.join(DIMENSIONS[dim] for dim in result.attrs['source'])}) "
+    f"with {result.attrs['source_cells']:,} cells"
+)
+
+if result.empty:
+    st.warning("No events match the selected filters")
+    st.stop()
+
+labels = {dim: DIMENSIONS[dim] for dim in dims}
+labels.update(MEASURES)
+if len(dims) == 1:
+    fig = px.bar(
+        result,
+        x=dims[0],
+        y=measure,
+        labels=labels,
+        title=f"{MEASURES[measure]} by {DIMENSIONS[dims[0]]}",
+        template="plotly_white"
+    )
+    table = result.set_index(dims[0]).rename(columns=MEASURES)
+else:
+    table = result.pivot(index=dims[0], columns=dims[1], values=measure).fillna(0).astype(int)
+    fig = px.imshow(
+        table,
+        color_continuous_scale='YlOrRd',
+        labels={'x': DIMENSIONS[dims[1]], 'y': DIMENSIONS[dims[0]], 'color': MEASURES[measure]},
+        title=f"{MEASURES[measure]} by {DIMENSIONS[dims[0]]} and {DIMENSIONS[dims[1]]}",
+        text_auto=len(table.index) * len(table.columns) <= 400,
+        aspect='auto'
+    )
+fig.update_layout(height=max(500, 22 * len(table.index)), title_font=dict(size=20))
+st.plotly_chart(fig, use_container_width=True)
+
+st.dataframe(table, use_container_width=True)
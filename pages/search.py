@@ -0,0 +1,105 @@
+import streamlit as st
+import pandas as pd
+import time
+from utils.data import VEHICLE_WEAPON, dataset_version, get_raw_data, replace_value
+from utils.filters import filter_mask, render_filter_sidebar
+from utils.search import get_search_index
+
+# -----------------------------------------------------------------------------
+
+st.markdown(
+    '''
+    <div style="text-align: right; direction: rtl;font-size: large;">
+    בעמוד זה ניתן לחפש אירועי טרור לפי הטקסט החופשי במאגר (תיאור האירוע, מיקום, מניע, פרטי הנשק והערות).
+    <br>
+    ניתן לחפש מילים בודדות או ביטוי מדויק בתוך מרכאות, למשל: <b>"suicide bomber" bus</b>
+    <br>
+    החיפוש מזהה גם איותים שונים של שמות מקומות (למשל Sderot / Sederot או Petah Tikva / Petah Tiqwa).
+    </div>
+    ''',
+    unsafe_allow_html=True
+)
+
+st.markdown("<br>", unsafe_allow_html=True)
+
+
+@st.cache_resource
+def get_data(version):
+    """
+    Read the columns shown for each search hit.
+    Cached as a resource: one copy per worker, shared by its sessions, so
+    callers must not modify it.
+    """
+    df = get_raw_data(version)
+    columns_names = ["iyear", "imonth", "iday", "city", "latitude", "longitude", "nkill", "nwound",
+                     "weaptype1_txt", "gname", "summary"]
+    df = df[columns_names].copy()
+    df['weaptype1_txt'] = replace_value(df['weaptype1_txt'], VEHICLE_WEAPON, 'Vehicle')
+    df['date'] = (
+        df['iyear'].astype(str) + '-' + df['imonth'].astype(str).str.zfill(2) + '-' + df['iday'].astype(str).str.zfill(2)
+    )
+    return df
+
+
+# Year and weapon filters are shared with the other pages (the others do not apply here)
+SEARCH_FILTERS = ('year', 'weapon')
+render_filter_sidebar(dims=SEARCH_FILTERS)
+
+query = st.text_input("Search events", placeholder='e.g. "bus station" Hamas')
+limit = st.sidebar.slider("Maximum Results", min_value=10, max_value=500, value=100, step=10)
+
+if not query:
+    st.stop()
+
+index = get_search_index(dataset_version())
+start = time.perf_counter()
+hits, scores = index.search(query, mask=filter_mask(SEARCH_FILTERS), limit=limit)
+elapsed_ms = (time.perf_counter() - start) * 1000
+
+st.caption(f"{len(hits):,} results in {elapsed_ms:.1f} ms")
+if len(hits) == 0:
+    st.info("No events match the query")
+    st.stop()
+
+data = get_data(dataset_version())
+results = data.iloc[hits].assign(score=scores)
+results = results[['score', 'date', 'city', 'weaptype1_txt', 'gname', 'nkill', 'nwound', 'summary']].rename(
+    columns={
+        'score': 'Score',
+        'date': 'Date',
+        'city': 'City',
+        'weaptype1_txt': 'Weapon Type',
+        'gname': 'Group',
+        'nkill': 'Deaths',
+        'nwound': 'Injuries',
+        'summary': 'Summary'
+    }
+)
+
+selection = st.dataframe(
+    results,
+    use_container_width=True,
+    hide_index=True,
+    on_select="rerun",
+    selection_mode="single-row",
+    column_config={
+        'Score': st.column_config.NumberColumn(format="%.2f"),
+        'Summary': st.column_config.TextColumn(width="large"),
+    }
+)
+
+selected_rows = selection.selection.rows
+if selected_rows:
+    row = hits[selected_rows[0]]
+    event = data.iloc[row]
+    if pd.isna(event['latitude']) or pd.isna(event['longitude']):
+        st.warning("This event has no coordinates")
+    elif st.button(f"Show on map: {event['city']} ({event['date']})"):
+        # The task1 page centers its map on this event and opens its popup
+        st.session_state['map_focus'] = {
+            'row': int(row),
+            'lat': float(event['latitude']),
+            'lon': float(event['longitude']),
+            'label': f"{event['city']} ({event['date']})"
+        }
+        st.switch_page("pages/task1.py")
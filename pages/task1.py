@@ -1,9 +1,18 @@
 import streamlit as st
 import pandas as pd
-from folium.plugins import MarkerCluster
+import numpy as np
+from folium.plugins import MarkerCluster, HeatMapWithTime
 import folium
 from pathlib import Path
 import streamlit.components.v1 as components
+import time
+from utils.data import dataset_version, get_raw_data
+from utils.districts import DistrictChoropleth, district_aggregates, load_outlines
+from utils.export import export_buttons
+from utils.filters import apply_filters, filter_mask, render_filter_sidebar
+from utils.kde import GRID_BOUNDS, to_rgba, weighted_kde
+from utils.scan import get_space_time_clusters
+from utils.spatial import get_spatial_index
 
 # Add this helper function at the top of your file
 def get_image_base64(image_path):
@@ -15,24 +24,88 @@ def get_image_base64(image_path):
 # Get the absolute path to the icons directory
 ICONS_PATH = Path(__file__).parent.parent / 'data/icons/location.png'
 
+# Heat map weight options -> columns summed per event (no columns: every event weighs 1)
+HEAT_WEIGHTS = {
+    "Casualties (killed + wounded)": ['nkill', 'nwound'],
+    "Deaths": ['nkill'],
+    "Injuries": ['nwound'],
+    "Events": [],
+}
+
 # -----------------------------------------------------------------------------
 
 
-@st.cache_data
-def get_data():
+@st.cache_resource
+def get_data(version):
     """
-    Read the Terror Attacks data from the CSV file.
+    Read the Terror Attacks data.
+    Cached as a resource: one copy per worker, shared by its sessions, so
+    callers must not modify it.
     """
-    DATA_FILENAME = Path(__file__).parent.parent / 'data/IL_data.csv'
-    df = pd.read_csv(DATA_FILENAME, encoding='ISO-8859-1')
+    df = get_raw_data(version)
     columns_names = ["eventid","iyear","imonth","iday","country","city","latitude","longitude","nperps","nkill","nwound",
-        "location","success","attacktype1","suicide","targtype1","weaptype1_txt","gname","extended"]
+        "location","success","attacktype1","suicide","targtype1","weaptype1_txt","gname","extended","provstate"]
 
     df = df[df["latitude"].notna() & df["longitude"].notna()]
     df = df[columns_names]
 
     return df
 
+@st.cache_data
+def get_period_frames(data, time_step):
+    """
+    Aggregate the events per time period and location once, so the animated
+    map only swaps a small frame of [lat, lon, weight] rows on each step.
+    """
+    first_year = int(data['iyear'].min())
+    last_year = int(data['iyear'].max())
+    years = data['iyear'].to_numpy() - first_year
+    if time_step == "Month":
+        # Unknown months (0) are counted in January
+        months = data['imonth'].clip(lower=1).to_numpy() - 1
+        period_codes = years * 12 + months
+        periods = [f"{year}-{month:02d}" for year in range(first_year, last_year + 1) for month in range(1, 13)]
+    else:
+        period_codes = years
+        periods = [str(year) for year in range(first_year, last_year + 1)]
+
+    # Locations rounded to ~100m so nearby events share one point
+    coords = data[['latitude', 'longitude']].round(3)
+    location_codes, locations = pd.MultiIndex.from_frame(coords).factorize()
+    latitudes = locations.get_level_values(0).to_numpy()
+    longitudes = locations.get_level_values(1).to_numpy()
+
+    # Sparse (period, location) counts, sorted by period
+    keys, counts = np.unique(period_codes * len(locations) + location_codes, return_counts=True)
+    key_periods = keys // len(locations)
+    key_locations = keys % len(locations)
+    weights = counts / counts.max()
+    bounds = np.searchsorted(key_periods, np.arange(len(periods) + 1))
+
+    frames = [
+        np.column_stack([
+            latitudes[key_locations[start:end]],
+            longitudes[key_locations[start:end]],
+            weights[start:end].round(3)
+        ]).tolist()
+        for start, end in zip(bounds[:-1], bounds[1:])
+    ]
+    return periods, frames
+
+@st.cache_data
+def get_heat_overlay(data, weight, bandwidth_km):
+    """
+    Kernel density of the chosen weight on a fixed grid (binning + FFT
+    convolution), colored into a single RGBA image for the map overlay.
+    """
+    columns = HEAT_WEIGHTS[weight]
+    if columns:
+        weights = data[columns].clip(lower=0).fillna(0).sum(axis=1).to_numpy()
+    else:
+        weights = np.ones(len(data))
+    density = weighted_kde(data['latitude'].to_numpy(), data['longitude'].to_numpy(), weights, bandwidth_km)
+    return to_rgba(density)
+
 st.markdown(
     '''
     <div style="text-align: right; direction: rtl;font-size: large;">
@@ -83,76 +156,171 @@ with col2:
         unsafe_allow_html=True
     )
 
+# Map controls
+st.sidebar.header("Map Controls")
+map_mode = st.sidebar.radio(
+    "Map Mode",
+    ["Clusters", "Over Time", "Casualty Heat", "Districts"],
+    help="Clusters shows all years at once, Over Time animates the attack locations per period, "
+         "Casualty Heat shows a density of attacks weighted by their casualties, "
+         "Districts colors every district by its events, deaths or injuries (per year or per capita)"
+)
+time_step = st.sidebar.selectbox("Time Step", ["Year", "Month"], disabled=map_mode != "Over Time")
+heat_weight = st.sidebar.selectbox("Heat Weight", list(HEAT_WEIGHTS), disabled=map_mode != "Casualty Heat")
+bandwidth_km = st.sidebar.slider(
+    "Bandwidth (km)",
+    min_value=1,
+    max_value=20,
+    value=5,
+    disabled=map_mode != "Casualty Heat",
+    help="Smoothing radius of the heat map"
+)
+show_clusters = st.sidebar.checkbox(
+    "Space-Time Clusters",
+    value=False,
+    help="Highlight the most likely space-time clusters of attacks (space-time permutation scan statistic "
+         "with Monte Carlo p-values) over all located events. The first run takes a while"
+)
+
+# Filters shared with the other pages (select cities here to filter task2/task3)
+render_filter_sidebar()
+events = get_data(dataset_version())
+filtered_events = apply_filters(events)
+st.sidebar.markdown(f"Showing **{len(filtered_events):,}** of {len(events):,} events")
+
+# Export the map points (with the shared filters applied)
+st.sidebar.markdown("### Export Map Points")
+export_buttons(
+    filtered_events[['iyear', 'imonth', 'iday', 'city', 'latitude', 'longitude', 'nkill', 'nwound']].rename(
+        columns={'iyear': 'Year', 'imonth': 'Month', 'iday': 'Day', 'city': 'City', 'latitude': 'Latitude',
+                 'longitude': 'Longitude', 'nkill': 'Deaths', 'nwound': 'Injuries'}
+    ),
+    'map_points'
+)
+
+# Define a list of specific cities with their latitudes, longitudes, and labels
+city_labels = [{'name': 'Jerusalem', 'lat': 31.772180600401597, 'lon': 35.20426017469879},
+{'name': 'Tel Aviv', 'lat': 32.082969999999996, 'lon': 34.81188600000001},
+{'name': 'Ashkelon', 'lat': 31.665745571428566, 'lon': 34.57345348214286},
+{'name': 'Sderot', 'lat': 31.528199999999995, 'lon': 34.596382000000006},
+{'name': 'Eshkol regional council',
+'lat': 31.213881746268658,
+'lon': 34.460347388059695},
+{'name': 'Ashdod', 'lat': 31.819970431372543, 'lon': 34.66481956862746},
+{'name': 'Beersheba', 'lat': 31.258944624999998, 'lon': 34.786781},
+{'name': 'Haifa', 'lat': 32.79357451219513, 'lon': 34.990603195121956},
+{'name': 'Shaar HaNegev regional council',
+'lat': 31.51099376923077,
+'lon': 34.62375746153846},
+{'name': 'Petah Tiqwa', 'lat': 32.089161, 'lon': 34.88382},
+{'name': 'Netanya', 'lat': 32.32518116, 'lon': 34.85378992},
+{'name': 'Sdot Negev regional council',
+'lat': 31.41276371428572,
+'lon': 34.580247190476186},
+{'name': 'Kissufim', 'lat': 31.373840000000005, 'lon': 34.39836371428571}]
+
+map_col, panel_col = st.columns([3, 1])
+
+# Controls of the nearby events query, in a side panel next to the map
+with panel_col:
+    st.markdown("#### Nearby Events")
+    center_name = st.selectbox(
+        "Center",
+        ["Custom"] + [city['name'] for city in city_labels],
+        index=1,
+        help="Choose Custom to enter any point. Clicking the map shows the coordinates of the clicked point"
+    )
+    center_city = next((city for city in city_labels if city['name'] == center_name), None)
+    center_lat = st.number_input(
+        "Latitude", value=center_city['lat'] if center_city else 31.5, format="%.5f", disabled=center_city is not None
+    )
+    center_lon = st.number_input(
+        "Longitude", value=center_city['lon'] if center_city else 34.8, format="%.5f", disabled=center_city is not None
+    )
+    radius_km = st.slider("Radius (km)", min_value=0.5, max_value=50.0, value=5.0, step=0.5)
+    k_nearest = st.number_input("Nearest Events", min_value=1, max_value=100, value=10)
+
 # Add loading spinner while generating the map
 with st.spinner('Loading map...'):
     # Create progress bar
     progress_bar = st.progress(0)
-    data = get_data()
-
-    # Define a list of specific cities with their latitudes, longitudes, and labels
-    city_labels = [{'name': 'Jerusalem', 'lat': 31.772180600401597, 'lon': 35.20426017469879},
-    {'name': 'Tel Aviv', 'lat': 32.082969999999996, 'lon': 34.81188600000001},
-    {'name': 'Ashkelon', 'lat': 31.665745571428566, 'lon': 34.57345348214286},
-    {'name': 'Sderot', 'lat': 31.528199999999995, 'lon': 34.596382000000006},
-    {'name': 'Eshkol regional council',
-    'lat': 31.213881746268658,
-    'lon': 34.460347388059695},
-    {'name': 'Ashdod', 'lat': 31.819970431372543, 'lon': 34.66481956862746},
-    {'name': 'Beersheba', 'lat': 31.258944624999998, 'lon': 34.786781},
-    {'name': 'Haifa', 'lat': 32.79357451219513, 'lon': 34.990603195121956},
-    {'name': 'Shaar HaNegev regional council',
-    'lat': 31.51099376923077,
-    'lon': 34.62375746153846},
-    {'name': 'Petah Tiqwa', 'lat': 32.089161, 'lon': 34.88382},
-    {'name': 'Netanya', 'lat': 32.32518116, 'lon': 34.85378992},
-    {'name': 'Sdot Negev regional council',
-    'lat': 31.41276371428572,
-    'lon': 34.580247190476186},
-    {'name': 'Kissufim', 'lat': 31.373840000000005, 'lon': 34.39836371428571}]
-    # Create a base map centered on Israel
+    data = filtered_events
+
+    # An event picked on the search page to jump to (shown once)
+    map_focus = st.session_state.pop('map_focus', None)
+
+    # Create a base map centered on Israel (or on the focused event)
     label_map = folium.Map(
-        location=[31.5, 34.8],  # Center of Israel
-        zoom_start=8,           # Appropriate zoom level for full coverage
+        location=[map_focus['lat'], map_focus['lon']] if map_focus else [31.5, 34.8],  # Center of Israel
+        zoom_start=14 if map_focus else 8,  # Appropriate zoom level for full coverage
         tiles="CartoDB positron",
         control_scale=True
     )
     
     progress_bar.progress(25)
     
-    # Add a Marker Cluster for ALL points
-    marker_cluster = MarkerCluster(
-        options={
-            'spiderfyOnMaxZoom': True,
-            'disableClusteringAtZoom': 11,
-            'maxClusterRadius': 40,
-            'showCoverageOnHover': True
-        }
-    ).add_to(label_map)
+    if map_mode == "Over Time" and not data.empty:
+        # Animated density of attack locations, one precomputed frame per period
+        periods, frames = get_period_frames(data, time_step)
+        progress_bar.progress(50)
+        HeatMapWithTime(
+            frames,
+            index=periods,
+            radius=25,
+            min_opacity=0.3,
+            max_opacity=0.8,
+            auto_play=False,
+            use_local_extrema=False,
+            position='bottomleft'
+        ).add_to(label_map)
+    elif map_mode == "Casualty Heat" and not data.empty:
+        # One precomputed image instead of a vector marker per event
+        south, west, north, east = GRID_BOUNDS
+        folium.raster_layers.ImageOverlay(
+            image=get_heat_overlay(data, heat_weight, bandwidth_km),
+            bounds=[[south, west], [north, east]],
+            name=heat_weight
+        ).add_to(label_map)
+        progress_bar.progress(50)
+    elif map_mode == "Districts" and not data.empty:
+        # Bundled outlines and precomputed aggregates; the map's own controls only recolor them
+        DistrictChoropleth(load_outlines(), district_aggregates(data)).add_to(label_map)
+        progress_bar.progress(50)
+    else:
+        # Add a Marker Cluster for ALL points
+        marker_cluster = MarkerCluster(
+            options={
+                'spiderfyOnMaxZoom': True,
+                'disableClusteringAtZoom': 11,
+                'maxClusterRadius': 40,
+                'showCoverageOnHover': True
+            }
+        ).add_to(label_map)
     
-    progress_bar.progress(50)
+        progress_bar.progress(50)
     
-    # Add ALL points to the cluster
-    for idx, row in data.iterrows():
-        # Calculate casualties with NaN handling
-        nkill = 0 if pd.isna(row['nkill']) else int(row['nkill'])
-        nwound = 0 if pd.isna(row['nwound']) else int(row['nwound'])
-        casualties = nkill + nwound
+        # Add ALL points to the cluster
+        for idx, row in data.iterrows():
+            # Calculate casualties with NaN handling
+            nkill = 0 if pd.isna(row['nkill']) else int(row['nkill'])
+            nwound = 0 if pd.isna(row['nwound']) else int(row['nwound'])
+            casualties = nkill + nwound
         
-        folium.CircleMarker(
-            location=[row['latitude'], row['longitude']],
-            radius=6,
-            color='blue',
-            fill=True,
-            fill_color='blue',
-            fill_opacity=0.7,
-            popup=(
-            '<div style="font-size: 14px;">'
-            f"<b>City:</b> {row['city']}<br>"
-            f"<b>Casualties:</b> {casualties}<br>"
-            f"<b>Year:</b> {row['iyear']}"
-            '</div>'
-            )
-        ).add_to(marker_cluster)
+            folium.CircleMarker(
+                location=[row['latitude'], row['longitude']],
+                radius=6,
+                color='blue',
+                fill=True,
+                fill_color='blue',
+                fill_opacity=0.7,
+                popup=(
+                '<div style="font-size: 14px;">'
+                f"<b>City:</b> {row['city']}<br>"
+                f"<b>Casualties:</b> {casualties}<br>"
+                f"<b>Year:</b> {row['iyear']}"
+                '</div>'
+                )
+            ).add_to(marker_cluster)
     
     progress_bar.progress(75)
     
@@ -164,6 +332,45 @@ with st.spinner('Loading map...'):
             popup=city["name"],
             tooltip=city["name"]
         ).add_to(label_map)
+
+    # Area of the nearby events query
+    folium.Circle(
+        location=[center_lat, center_lon],
+        radius=radius_km * 1000,
+        color='crimson',
+        fill=True,
+        fill_opacity=0.05,
+        tooltip=f"{radius_km:g} km around {center_name}"
+    ).add_to(label_map)
+    # Most likely space-time clusters (significant ones in red)
+    if show_clusters:
+        space_time_clusters = get_space_time_clusters(dataset_version())
+        for cluster in space_time_clusters.itertuples():
+            significant = cluster.p_value <= 0.05
+            folium.Circle(
+                location=[cluster.lat, cluster.lon],
+                radius=max(cluster.radius_km, 0.5) * 1000,
+                color='red' if significant else 'gray',
+                weight=3 if significant else 1,
+                fill=True,
+                fill_opacity=0.25 if significant else 0.1,
+                tooltip=(
+                    f"{cluster.city}: {cluster.start_month} to {cluster.end_month}<br>"
+                    f"{cluster.cases} attacks ({cluster.expected:.1f} expected), p = {cluster.p_value:.2f}"
+                )
+            ).add_to(label_map)
+
+    # Show the coordinates of any clicked point, to use as a custom center
+    folium.LatLngPopup().add_to(label_map)
+
+    # Highlight the focused search hit with its popup open
+    if map_focus:
+        folium.Marker(
+            location=[map_focus['lat'], map_focus['lon']],
+            icon=folium.Icon(color='red', icon='info-sign'),
+            popup=folium.Popup(map_focus['label'], show=True),
+            tooltip=map_focus['label']
+        ).add_to(label_map)
     
     progress_bar.progress(100)
     
@@ -171,9 +378,94 @@ with st.spinner('Loading map...'):
     label_map.save("labeled_israel_map.html")
 
 # Display the map
-map_container = st.empty()
-with map_container:
+with map_col:
     components.html(label_map._repr_html_(), height=700)
 
+# Radius and k-nearest queries on the haversine index, restricted to the shared filters
+with panel_col:
+    spatial_index = get_spatial_index(dataset_version())
+    mask = filter_mask()
+    start = time.perf_counter()
+    nearby_rows, _ = spatial_index.radius(center_lat, center_lon, radius_km)
+    nearby_rows = nearby_rows[mask[nearby_rows]]
+    nearest_rows, nearest_distances = spatial_index.nearest(center_lat, center_lon, int(k_nearest), mask)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    nearby = events.loc[nearby_rows]
+    st.metric(f"Attacks within {radius_km:g} km", f"{len(nearby):,}")
+    deaths_col, injuries_col = st.columns(2)
+    deaths_col.metric("Deaths", f"{int(nearby['nkill'].sum()):,}")
+    injuries_col.metric("Injuries", f"{int(nearby['nwound'].sum()):,}")
+    st.caption(f"Queried in {elapsed_ms:.2f} ms")
+    if not nearby.empty:
+        st.bar_chart(nearby.groupby('iyear').size().rename("Attacks"), height=200)
+
+    nearest = events.loc[nearest_rows, ['city', 'iyear', 'nkill', 'nwound']].assign(distance=nearest_distances)
+    st.dataframe(
+        nearest.rename(columns={
+            'city': 'City', 'iyear': 'Year', 'nkill': 'Deaths', 'nwound': 'Injuries', 'distance': 'Distance (km)'
+        }),
+        use_container_width=True,
+        hide_index=True,
+        column_config={'Distance (km)': st.column_config.NumberColumn(format="%.2f")}
+    )
+
+if show_clusters:
+    st.markdown("#### Space-Time Clusters")
+    st.markdown(
+        '''
+        <div style="text-align: right; direction: rtl;">
+        העיגולים על המפה מסמנים אזורים ותקופות שבהם התרחשו יותר מתקפות מהצפוי לפי ההתפלגות הכללית במקום ובזמן (סטטיסטי סריקה מרחבי-זמני).
+        אשכולות מובהקים (p ≤ 0.05, לפי סימולציית מונטה קרלו) מסומנים באדום.
+        </div>
+        ''',
+        unsafe_allow_html=True
+    )
+    st.dataframe(
+        space_time_clusters[['city', 'start_month', 'end_month', 'radius_km', 'cases', 'expected', 'p_value']].rename(
+            columns={'city': 'Area', 'start_month': 'From', 'end_month': 'To', 'radius_km': 'Radius (km)',
+                     'cases': 'Attacks', 'expected': 'Expected', 'p_value': 'p-value'}
+        ),
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            'Radius (km)': st.column_config.NumberColumn(format="%.1f"),
+            'Expected': st.column_config.NumberColumn(format="%.1f"),
+            'p-value': st.column_config.NumberColumn(format="%.2f"),
+        }
+    )
+
+if map_mode == "Casualty Heat":
+    st.markdown(
+        '''
+        <div style="text-align: right; direction: rtl;">
+        במצב זה המפה מציגה מפת חום של אירועי הטרור, משוקללת לפי מספר הנפגעים (או המדד שנבחר). צבע אדום כהה מייצג ריכוז גבוה של נפגעים.
+        </div>
+        ''',
+        unsafe_allow_html=True
+    )
+elif map_mode == "Districts":
+    st.markdown(
+        '''
+        <div style="text-align: right; direction: rtl;">
+        במצב זה כל מחוז נצבע לפי מספר האירועים, ההרוגים או הפצועים בו. ניתן לבחור מדד ושנה, או להציג את הערכים ביחס ל-100,000 תושבים, באמצעות הפקדים בפינת המפה.
+        </div>
+        ''',
+        unsafe_allow_html=True
+    )
+    st.caption(
+        "District outlines are approximate: the dataset has no boundaries, so they are derived from the locations "
+        "of the events in each district. Populations are approximate 2017 figures"
+    )
+elif map_mode == "Over Time":
+    st.markdown(
+        '''
+        <div style="text-align: right; direction: rtl;">
+        במצב זה המפה מציגה את צפיפות אירועי הטרור בכל תקופה. ניתן לנווט בין התקופות או להפעיל אנימציה באמצעות פס הזמן בתחתית המפה.
+        </div>
+        ''',
+        unsafe_allow_html=True
+    )
+
 # Remove progress bar after loading
 progress_bar.empty()
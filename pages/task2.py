@@ -1,12 +1,15 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
 import plotly.graph_objects as go
-import plotly.figure_factory as ff
 from plotly.subplots import make_subplots
-from pathlib import Path
 import numpy as np
-from scipy import stats
+from utils.chunked import get_aggregates, is_out_of_core
+from utils.figures import plotly_chart
+from utils.data import dataset_version, get_raw_data
+from utils.export import export_buttons
+from utils.filters import apply_filters, render_filter_sidebar, year_range_slider
+from utils.histograms import histogram_trace
+from utils.recompute import run_latest
 
 
 # -----------------------------------------------------------------------------
@@ -60,13 +63,14 @@ with col2:
     )
 
 
-@st.cache_data
-def get_data():
+@st.cache_resource
+def get_data(version):
     """
-    Read the Terror Attacks data from the CSV file.
+    Read the Terror Attacks data.
+    Cached as a resource: one copy per worker, shared by its sessions, so
+    callers must not modify it.
     """
-    DATA_FILENAME = Path(__file__).parent.parent / 'data/IL_data.csv'
-    df = pd.read_csv(DATA_FILENAME, encoding='ISO-8859-1')
+    df = get_raw_data(version)
     columns_names = ["eventid","iyear","imonth","iday","country","city","latitude","longitude","nperps","nkill","nwound",
         "location","success","attacktype1","suicide","targtype1","weaptype1_txt","gname","extended"]
     features = ['nperps', 'nkill', 'nwound']
@@ -75,7 +79,6 @@ def get_data():
 
     return df
 
-df = get_data()
 
 # Add color mapping at the start of the script
 PAIR_COLORS = {
@@ -87,19 +90,6 @@ PAIR_COLORS = {
     ('nkill', 'nwound'): '#ff7f0e',      # Orange
 }
 
-# Add date range filter
-min_year = 1971
-max_year = int(df['iyear'].max())
-selected_years = st.slider(
-    'Select Year Range',
-    min_value=min_year,
-    max_value=max_year,
-    value=(min_year, max_year)
-)
-
-# Filter dataframe based on selected years
-df_filtered = df[(df['iyear'] >= selected_years[0]) & (df['iyear'] <= selected_years[1])]
-
 features = ['nperps', 'nkill', 'nwound']
 labels = {
     'nperps': 'Terorists Involved',
@@ -107,181 +97,189 @@ labels = {
     'nwound': 'Injuries'
 }
 
-try:
-    # Check if we have valid data
-    if df_filtered.empty or df_filtered[features].sum().sum() == 0:
-        raise ValueError("No valid data in selected range")
+
+@st.cache_data(show_spinner=False)
+def build_matrix(_token, df_filtered, selected_years):
+    """
+    The correlation matrix figure and table of the filtered events, and
+    whether there was any data. Runs on a worker thread (see run_latest),
+    so it does not call Streamlit.
+    """
+    try:
+        # Check if we have valid data
+        if df_filtered.empty or df_filtered[features].sum().sum() == 0:
+            raise ValueError("No valid data in selected range")
         
-    # Create subplot figure with filtered data
-    fig = make_subplots(
-        rows=3, 
-        cols=3,
-        subplot_titles=[f"{labels[feat1]} vs {labels[feat2]}" 
-                       if i != j else f"{labels[feat1]} Distribution"
-                       for i, feat1 in enumerate(features)
-                       for j, feat2 in enumerate(features)]
-    )
-    fig.update_annotations(font_size=16)  # Set the font size for subplot titles
+        # Create subplot figure with filtered data
+        fig = make_subplots(
+            rows=3, 
+            cols=3,
+            subplot_titles=[f"{labels[feat1]} vs {labels[feat2]}" 
+                           if i != j else f"{labels[feat1]} Distribution"
+                           for i, feat1 in enumerate(features)
+                           for j, feat2 in enumerate(features)]
+        )
+        fig.update_annotations(font_size=16)  # Set the font size for subplot titles
 
-    # Add traces for each combination
-    for i, feat1 in enumerate(features):
-        for j, feat2 in enumerate(features):
-            # If on diagonal, create distribution plot
-            if i == j:
-                # Create distribution plot
-                hist_data = [df_filtered[feat1].dropna()]
-                group_labels = [labels[feat1]]
-                dist_fig = ff.create_distplot(hist_data, group_labels, show_rug=False)
-                # Add distribution trace
-                fig.add_trace(
-                    go.Histogram(
-                        x=df_filtered[feat1],
-                        name=f'{labels[feat1]} Distribution',
-                        marker_color=PAIR_COLORS[(feat1, feat1)],
-                        showlegend=False,
-                        hovertemplate='<span style="font-size: 14px;">' +
-                                    f'{labels[feat1]}: %{{x}}<br>Count: %{{y}}' +
-                                    '</span><extra></extra>',
-                        nbinsx=30
-                    ),
-                    row=j+1, col=i+1
-                )
-            else:
-                # Calculate trend line
-                slope, intercept, r_value, _, _ = stats.linregress(df_filtered[feat1], df_filtered[feat2])
+        # Add traces for each combination
+        for i, feat1 in enumerate(features):
+            for j, feat2 in enumerate(features):
+                # Stop here if a newer year range superseded this one
+                _token.check()
+                # If on diagonal, create distribution plot
+                if i == j:
+                    # Add distribution trace (binned on the server)
+                    fig.add_trace(
+                        histogram_trace(
+                            df_filtered[feat1].to_numpy(dtype=float),
+                            nbins=30,
+                            name=f'{labels[feat1]} Distribution',
+                            marker_color=PAIR_COLORS[(feat1, feat1)],
+                            showlegend=False,
+                            hovertemplate='<span style="font-size: 14px;">' +
+                                        f'{labels[feat1]}: %{{customdata[0]:.4~g}} - %{{customdata[1]:.4~g}}<br>Count: %{{y}}' +
+                                        '</span><extra></extra>'
+                        ),
+                        row=j+1, col=i+1
+                    )
+                else:
+                    # Calculate trend line (least squares fit, same as scipy.stats.linregress)
+                    slope, intercept = np.polyfit(df_filtered[feat1], df_filtered[feat2], 1)
                 
-                # Create extended range for trend line
-                x_min = df_filtered[feat1].min()
-                x_max = df_filtered[feat1].max()
-                x_range = x_max - x_min
-                x_trend = np.array([x_min - x_range * 0.1, x_max + x_range * 0.1])
-                y_trend = slope * x_trend + intercept
-
-                # Add scatter plot first
-                fig.add_trace(
-                    go.Scatter(
-                        x=df_filtered[feat1],
-                        y=df_filtered[feat2],
-                        mode='markers',
-                        marker=dict(
-                            color=PAIR_COLORS.get((feat1, feat2)) or PAIR_COLORS.get((feat2, feat1)),
-                            size=5,
-                            opacity=0.6
+                    # Create extended range for trend line
+                    x_min = df_filtered[feat1].min()
+                    x_max = df_filtered[feat1].max()
+                    x_range = x_max - x_min
+                    x_trend = np.array([x_min - x_range * 0.1, x_max + x_range * 0.1])
+                    y_trend = slope * x_trend + intercept
+
+                    # Add scatter plot first
+                    fig.add_trace(
+                        go.Scatter(
+                            x=df_filtered[feat1],
+                            y=df_filtered[feat2],
+                            mode='markers',
+                            marker=dict(
+                                color=PAIR_COLORS.get((feat1, feat2)) or PAIR_COLORS.get((feat2, feat1)),
+                                size=5,
+                                opacity=0.6
+                            ),
+                            name=f'{labels[feat1]} vs {labels[feat2]}',
+                            showlegend=False,
+                            hovertemplate=
+                            '<span style="font-size: 14px;">' +
+                            '<br>'.join([
+                                f'{labels[feat1]}: %{{x}}',
+                                f'{labels[feat2]}: %{{y}}',
+                                'Year: %{customdata[0]}',
+                                'City: %{customdata[1]}'
+                            ]) + '</span><extra></extra>',
+                            customdata=df_filtered[['iyear', 'city']].values
                         ),
-                        name=f'{labels[feat1]} vs {labels[feat2]}',
-                        showlegend=False,
-                        hovertemplate=
-                        '<span style="font-size: 14px;">' +
-                        '<br>'.join([
-                            f'{labels[feat1]}: %{{x}}',
-                            f'{labels[feat2]}: %{{y}}',
-                            'Year: %{customdata[0]}',
-                            'City: %{customdata[1]}'
-                        ]) + '</span><extra></extra>',
-                        customdata=df_filtered[['iyear', 'city']].values
-                    ),
-                    row=j+1, col=i+1
-                )
+                        row=j+1, col=i+1
+                    )
+
+                    # Add trend line without hover and with solid line
+                    fig.add_trace(
+                        go.Scatter(
+                            x=x_trend,
+                            y=y_trend,
+                            mode='lines',
+                            line=dict(
+                                color='rgba(255, 0, 0, 0.8)',
+                                width=2
+                            ),
+                            name=f'Trend',
+                            showlegend=False,
+                            hoverinfo='skip'
+                        ),
+                        row=j+1, col=i+1
+                    )
 
-                # Add trend line without hover and with solid line
+        corr_matrix = df_filtered[features].corr()
+        has_data = True
+    except ValueError as e:
+        # Create empty subplot figure
+        fig = make_subplots(
+            rows=3, 
+            cols=3,
+            subplot_titles=[f"No data available" 
+                           for i, feat1 in enumerate(features)
+                           for j, feat2 in enumerate(features)]
+        )
+
+        # Add empty plots with "No data" message
+        for i, feat1 in enumerate(features):
+            for j, feat2 in enumerate(features):
                 fig.add_trace(
                     go.Scatter(
-                        x=x_trend,
-                        y=y_trend,
-                        mode='lines',
-                        line=dict(
-                            color='rgba(255, 0, 0, 0.8)',
-                            width=2
-                        ),
-                        name=f'Trend',
+                        x=[],
+                        y=[],
+                        name="No data",
                         showlegend=False,
-                        hoverinfo='skip'
                     ),
                     row=j+1, col=i+1
                 )
 
-    corr_matrix = df_filtered[features].corr()
-except ValueError as e:
-    # Create empty subplot figure
-    fig = make_subplots(
-        rows=3, 
-        cols=3,
-        subplot_titles=[f"No data available" 
-                       for i, feat1 in enumerate(features)
-                       for j, feat2 in enumerate(features)]
+        # Create empty correlation matrix
+        corr_matrix = pd.DataFrame(0, index=features, columns=features)
+
+        has_data = False
+
+    # Update layout
+    fig.update_layout(
+        height=900,
+        width=900,
+        showlegend=False,
+        title={
+            'text': f'Correlation Matrix with Distributions {selected_years[0]}-{selected_years[1]}',
+            'font': {'size': 30},
+            'y': 0.95,
+            'x': 0.5,
+            'xanchor': 'center',
+            'yanchor': 'top'
+        }
     )
-    
-    # Add empty plots with "No data" message
+
+    # Update axes labels and add grid lines
     for i, feat1 in enumerate(features):
         for j, feat2 in enumerate(features):
-            fig.add_trace(
-                go.Scatter(
-                    x=[],
-                    y=[],
-                    name="No data",
-                    showlegend=False,
-                ),
-                row=j+1, col=i+1
-            )
-    
-    # Create empty correlation matrix
-    corr_matrix = pd.DataFrame(0, index=features, columns=features)
-    
-    # Show warning message
-    st.warning(f"No valid data found for the selected year range ({selected_years[0]}-{selected_years[1]})")
-
-# Update layout
-fig.update_layout(
-    height=900,
-    width=900,
-    showlegend=False,
-    title={
-        'text': f'Correlation Matrix with Distributions {selected_years[0]}-{selected_years[1]}',
-        'font': {'size': 30},
-        'y': 0.95,
-        'x': 0.5,
-        'xanchor': 'center',
-        'yanchor': 'top'
-    }
-)
+            if i == j:
+                # Distribution plots
+                fig.update_yaxes(title_text="Count", title_font=dict(size=16), row=j+1, col=i+1)
+                fig.update_xaxes(
+                    title_text=labels[feat1], 
+                    title_font=dict(size=16), 
+                    row=j+1, 
+                    col=i+1,
+                    showgrid=True,
+                    gridwidth=1,
+                    gridcolor='rgba(128, 128, 128, 0.2)',
+                )
+            else:
+                fig.update_xaxes(
+                    title_text=labels[feat1], 
+                    title_font=dict(size=16), 
+                    row=j+1, 
+                    col=i+1,
+                    showgrid=True,
+                    gridwidth=1,
+                    gridcolor='rgba(128, 128, 128, 0.2)',
+                )
+                fig.update_yaxes(title_text=labels[feat2], title_font=dict(size=16), row=j+1, col=i+1)
+
+    return fig, corr_matrix, has_data
 
-# Update axes labels and add grid lines
-for i, feat1 in enumerate(features):
-    for j, feat2 in enumerate(features):
-        if i == j:
-            # Distribution plots
-            fig.update_yaxes(title_text="Count", title_font=dict(size=16), row=j+1, col=i+1)
-            fig.update_xaxes(
-                title_text=labels[feat1], 
-                title_font=dict(size=16), 
-                row=j+1, 
-                col=i+1,
-                showgrid=True,
-                gridwidth=1,
-                gridcolor='rgba(128, 128, 128, 0.2)',
-            )
-        else:
-            fig.update_xaxes(
-                title_text=labels[feat1], 
-                title_font=dict(size=16), 
-                row=j+1, 
-                col=i+1,
-                showgrid=True,
-                gridwidth=1,
-                gridcolor='rgba(128, 128, 128, 0.2)',
-            )
-            fig.update_yaxes(title_text=labels[feat2], title_font=dict(size=16), row=j+1, col=i+1)
-
-# Display plot
-st.plotly_chart(fig, use_container_width=True)
-
-custom_names = ['Terrorists', 'Deaths', 'Injuries']
-corr_matrix.columns = custom_names
-corr_matrix.index = custom_names
-
-# Create sidebar controls
+
+# Filters shared with the other pages (the year range is set next to the matrix)
+if is_out_of_core():
+    st.sidebar.caption("Out-of-core mode: only the year range filters this page")
+else:
+    render_filter_sidebar(dims=('weapon', 'city', 'target', 'attack'))
+
+# Sidebar slot of the correlation table, refilled by the matrix section
 st.sidebar.header("Correlation Matrix")
-st.sidebar.dataframe(corr_matrix.style.format("{:.3f}"))
+corr_placeholder = st.sidebar.empty()
 st.sidebar.markdown(
     '''
     <div>
@@ -294,3 +292,72 @@ st.sidebar.markdown(
 ''',
 unsafe_allow_html=True
 )
+
+
+@st.fragment
+def correlation_section():
+    """
+    The year range slider and everything it drives. Moving the slider only
+    reruns this section, and the matrix is rebuilt on a worker thread once
+    the slider stops (a superseded rebuild is cancelled).
+    """
+    # Add date range filter (shared with the other pages)
+    selected_years = year_range_slider('Select Year Range')
+
+    # Filter dataframe based on the shared selection (years, weapons, cities, ...)
+    df_filtered = apply_filters(df)
+
+    fig, corr_matrix, has_data = run_latest(
+        'correlation_matrix', build_matrix, df_filtered, selected_years, message="Updating the matrix"
+    )
+    if not has_data:
+        # Show warning message
+        st.warning(f"No valid data found for the selected year range ({selected_years[0]}-{selected_years[1]})")
+
+    # Display plot
+    plotly_chart(fig, use_container_width=True)
+
+    corr_matrix = corr_matrix.copy()
+    custom_names = ['Terrorists', 'Deaths', 'Injuries']
+    corr_matrix.columns = custom_names
+    corr_matrix.index = custom_names
+    corr_placeholder.dataframe(corr_matrix.style.format("{:.3f}"))
+
+    # Export the events shown in the matrix (widgets of a fragment stay in its own body)
+    _, export_col = st.columns([3, 1])
+    export_col.markdown("### Export Events")
+    export_buttons(
+        df_filtered[['iyear', 'city'] + features].rename(columns={'iyear': 'Year', 'city': 'City', **labels}),
+        f'events_{selected_years[0]}_{selected_years[1]}',
+        container=export_col
+    )
+
+
+
+@st.fragment
+def moments_section():
+    """
+    Out-of-core: the correlation table of the year range from the per-year
+    moments of the streamed file. The scatter plots need every event, so
+    they are not drawn.
+    """
+    moments = get_aggregates(dataset_version()).moments
+    selected_years = year_range_slider('Select Year Range', years=moments.table.index.tolist())
+    if moments.table.loc[selected_years[0]:selected_years[1], 'n'].sum() < 2:
+        st.warning(f"No valid data found for the selected year range ({selected_years[0]}-{selected_years[1]})")
+        corr_matrix = pd.DataFrame(0, index=features, columns=features)
+    else:
+        corr_matrix = moments.correlation(selected_years)
+    st.info("Out-of-core mode: the data file is aggregated in chunks without being loaded, so only the correlation table (in the sidebar) is available.")
+
+    custom_names = ['Terrorists', 'Deaths', 'Injuries']
+    corr_matrix.columns = custom_names
+    corr_matrix.index = custom_names
+    corr_placeholder.dataframe(corr_matrix.style.format("{:.3f}"))
+
+
+if is_out_of_core():
+    moments_section()
+else:
+    df = get_data(dataset_version())
+    correlation_section()
@@ -1,9 +1,17 @@
 import streamlit as st
 import pandas as pd
-from pathlib import Path
-import matplotlib.pyplot as plt
 import numpy as np
 import plotly.express as px
+import plotly.graph_objects as go
+from utils.chunked import get_aggregates, is_out_of_core
+from utils.changepoints import METRICS, OVERALL, detect_change_points, monthly_series
+from utils.figures import plotly_chart
+from utils.forecast import forecast_series
+from utils.data import VEHICLE_WEAPON, dataset_version, get_raw_data, replace_value
+from utils.export import export_buttons
+from utils.filters import apply_filters, render_filter_sidebar
+from utils.recompute import run_latest
+from utils.sketch import QuantileSketches
 
 # -----------------------------------------------------------------------------
 
@@ -67,13 +75,14 @@ with col2:
     )
 
 
-@st.cache_data
-def get_data():
+@st.cache_resource
+def get_data(version):
     """
-    Read the Terror Attacks data from the CSV file.
+    Read the Terror Attacks data.
+    Cached as a resource: one copy per worker, shared by its sessions, so
+    callers must not modify it.
     """
-    DATA_FILENAME = Path(__file__).parent.parent / 'data/IL_data.csv'
-    df = pd.read_csv(DATA_FILENAME, encoding='ISO-8859-1')
+    df = get_raw_data(version)
     columns_names = ['eventid', 'iyear', 'imonth', 'iday', 'country_txt', 'provstate',
                                    'targtype1_txt', 'weaptype1_txt', 'nkill', 'nwound']
 
@@ -109,41 +118,64 @@ def get_data():
         terror_data[['year', 'month', 'day']].assign(day=1)
     )
     # Simplify weapon types
-    terror_data['weapon'] = terror_data['weapon'].replace(
-        'Vehicle (not to include vehicle-borne explosives, i.e., car or truck bombs)', 'Vehicle'
-    )
+    terror_data['weapon'] = replace_value(terror_data['weapon'], VEHICLE_WEAPON, 'Vehicle')
 
     return terror_data
 
-terror_data = get_data()
-
-# Create sidebar controls
-st.sidebar.header("Visualization Controls")
-
-# Create columns in sidebar
-time_col, scheme_col = st.sidebar.columns(2)
+@st.cache_data
+def get_monthly_sums(version):
+    """
+    Out-of-core: incidents, fatalities and injuries per month and weapon
+    type of the streamed data file, in the columns of get_data.
+    """
+    sums = get_aggregates(version).time_weapon.frame()
+    # Unknown months (0) are counted in January
+    sums['month'] = sums['month'].clip(lower=1)
+    sums['full_date'] = pd.to_datetime(sums[['year', 'month']].assign(day=1))
+    return sums
 
-# Time aggregation selector
-with time_col:
-    time_group = st.selectbox(
-        "Time Grouping",
-        ["Month", "Year"],
-        index=1,
-        label_visibility="visible",
-        key="time_group",
-        help="Select time aggregation level"
+@st.cache_data
+def get_casualty_sketches(data):
+    """
+    Quantile sketches of the casualties (deaths + injuries) per attack of
+    every month x weapon type. Coarser periods merge these sketches.
+    """
+    month_codes, months = pd.factorize(data['full_date'].dt.strftime('%Y-%m'), sort=True)
+    weapon_codes, weapons = pd.factorize(data['weapon'], sort=True)
+    sketches = QuantileSketches.from_values(
+        (data['fatalities'] + data['injuries']).to_numpy(),
+        month_codes * len(weapons) + weapon_codes,
+        len(months) * len(weapons)
     )
+    return sketches, list(months), list(weapons)
+
 
-# Add color scheme selector 
-with scheme_col:
-    color_scheme = st.radio(
-        "Color Palette",
-        ["Custom", "Viridis"],
-        key="color_scheme"
+def severity_bands(sketches, months, weapons, time_group):
+    """
+    Median, p90 and p99 casualties per attack of every period x weapon type
+    (merged from the monthly sketches), and of every weapon type overall.
+    Casualties are counts, so the estimates are rounded to whole numbers.
+    """
+    periods = [month if time_group == "Month" else month[:4] for month in months]
+    period_codes, period_labels = pd.factorize(pd.Series(periods), sort=True)
+    weapon_codes = np.tile(np.arange(len(weapons)), len(months))
+    per_period = sketches.roll_up(np.repeat(period_codes, len(weapons)) * len(weapons) + weapon_codes,
+                                  len(period_labels) * len(weapons))
+    bands = pd.DataFrame(per_period.quantiles([0.5, 0.9, 0.99]).round(), columns=['median', 'p90', 'p99'])
+    bands['time_period'] = np.repeat(period_labels, len(weapons))
+    bands['weapon'] = np.tile(weapons, len(period_labels))
+    overall = pd.DataFrame(
+        sketches.roll_up(weapon_codes, len(weapons)).quantiles([0.5, 0.9, 0.99]).round(),
+        index=weapons,
+        columns=['Median', 'P90', 'P99']
     )
+    return bands.dropna(), overall
 
-# Add log scale toggle
-use_log_scale = st.sidebar.checkbox("Use Log Scale", value=True, help="Toggle between linear and logarithmic scales")
+if is_out_of_core():
+    # Per-month sums of the streamed file: enough for the timeline and the change points
+    terror_data = get_monthly_sums(dataset_version())
+else:
+    terror_data = apply_filters(get_data(dataset_version()))
 
 st.markdown(
     """
@@ -156,266 +188,294 @@ st.markdown(
     unsafe_allow_html=True
 )
 
-# Minimum incidents threshold
-min_incidents = st.sidebar.slider(
-    "Minimum Incidents per Weapon Type",
-    min_value=1,
-    max_value=50,
-    value=5
-)
-
-# Prepare time grouping and ensure proper sorting
-if time_group == "Month":
-    # Format as YYYY-MM for proper chronological sorting
-    terror_data['time_period'] = terror_data['full_date'].dt.strftime('%Y-%m')
-elif time_group == "Quarter":
-    # Format as YYYY-Q# for proper chronological sorting
-    terror_data['time_period'] = terror_data['full_date'].dt.strftime('%Y-Q%q')
+# Filters shared with the other pages
+if is_out_of_core():
+    st.sidebar.caption("Out-of-core mode: the shared filters are not available on this page")
 else:
-    # Ensure year is padded with zeros for proper sorting
-    terror_data['time_period'] = terror_data['year'].astype(str).str.zfill(4)
-
-# Create time-series aggregation with weapon types
-time_weapon_data = (
-    terror_data.groupby(['time_period', 'weapon'])
-    .agg({
-        'id': 'count',
-        'fatalities': 'sum',
-        'injuries': 'sum'
-    })
-    .reset_index()
-)
+    render_filter_sidebar()
 
-# Filter weapons based on total incidents across all time periods
-weapon_counts = time_weapon_data.groupby('weapon')['id'].sum()
-weapons_to_include = weapon_counts[weapon_counts >= min_incidents].index
-time_weapon_data = time_weapon_data[time_weapon_data['weapon'].isin(weapons_to_include)]
-
-# Calculate cumulative totals for each weapon type
-time_weapon_data['cumulative_incidents'] = time_weapon_data.groupby('weapon')['id'].cumsum()
-time_weapon_data['cumulative_fatalities'] = time_weapon_data.groupby('weapon')['fatalities'].cumsum()
-time_weapon_data['cumulative_injuries'] = time_weapon_data.groupby('weapon')['injuries'].cumsum()
-
-# Ensure minimum values of 1 for log scale (do this AFTER calculating cumulative totals)
-time_weapon_data['cumulative_fatalities'] = time_weapon_data['cumulative_fatalities'].clip(lower=1)
-time_weapon_data['cumulative_injuries'] = time_weapon_data['cumulative_injuries'].clip(lower=1)
-
-# Sort by time_period and weapon
-time_weapon_data = time_weapon_data.sort_values(['time_period', 'weapon'])
-
-# Debug print to verify data
-st.sidebar.write("Weapon types in visualization:", time_weapon_data['weapon'].nunique())
-
-# Before creating the plot, ensure we have complete data for each time period
-time_periods = sorted(time_weapon_data['time_period'].unique())
-weapons = sorted(time_weapon_data['weapon'].unique())
-
-# Create a complete DataFrame with all combinations
-index = pd.MultiIndex.from_product([time_periods, weapons], names=['time_period', 'weapon'])
-complete_data = pd.DataFrame(index=index).reset_index()
-
-# Merge with existing data
-time_weapon_data = pd.merge(
-    complete_data,
-    time_weapon_data,
-    on=['time_period', 'weapon'],
-    how='left'
-).fillna(0)
-
-# Recalculate cumulative totals
-for weapon in weapons:
-    mask = time_weapon_data['weapon'] == weapon
-    time_weapon_data.loc[mask, 'cumulative_incidents'] = time_weapon_data.loc[mask, 'id'].cumsum()
-    time_weapon_data.loc[mask, 'cumulative_fatalities'] = time_weapon_data.loc[mask, 'fatalities'].cumsum()
-    time_weapon_data.loc[mask, 'cumulative_injuries'] = time_weapon_data.loc[mask, 'injuries'].cumsum()
-
-# Ensure minimum values for log scale
-time_weapon_data['cumulative_fatalities'] = time_weapon_data['cumulative_fatalities'].clip(lower=1)
-time_weapon_data['cumulative_injuries'] = time_weapon_data['cumulative_injuries'].clip(lower=1)
-
-time_weapon_data['bubble_size'] = (
-    time_weapon_data['cumulative_incidents'] + 10
-)
+if terror_data.empty:
+    st.warning("No events match the selected filters")
+    st.stop()
 
-# Set color scheme for weapon types
-weapon_colors = {
-    'Explosives': '#e31a1c',          # Red
-    'Firearms': '#1f78b4',            # Blue
-    'Melee': '#33a02c',              # Green
-    'Incendiary': '#ff7f00',         # Orange
-    'Vehicle': '#6a3d9a',            # Purple
-    'Unknown': '#666666',            # Gray
-    'Chemical': '#b15928',           # Brown
-    "Biological": '#20b2aa',         # Light Sea Green
-    'Other': '#a6cee3'               # Light Blue
-}
-
-# Define viridis color mapping
-viridis_colors = px.colors.sequential.Viridis
-weapon_categories = sorted(time_weapon_data['weapon'].unique())
-viridis_mapping = {
-    weapon: viridis_colors[i] 
-    for i, weapon in enumerate(weapon_categories)
-}
-
-# Create scatter plot with explicit category orders
-weapon_categories = sorted(time_weapon_data['weapon'].unique())
-fig = px.scatter(
-    time_weapon_data,
-    x='cumulative_injuries',
-    y='cumulative_fatalities',
-    animation_frame='time_period',
-    animation_group='weapon',
-    size='bubble_size',
-    color='weapon',
-    color_discrete_map=viridis_mapping if color_scheme == "Viridis" else weapon_colors,
-    hover_name='weapon',
-    category_orders={'weapon': weapon_categories},
-    log_x=use_log_scale,
-    log_y=use_log_scale,
-    size_max=60,
-    range_x=[0.9 if use_log_scale else 0, time_weapon_data['cumulative_injuries'].max() * (3 if use_log_scale else 1.1)],
-    range_y=[0.9 if use_log_scale else 0, time_weapon_data['cumulative_fatalities'].max() * (3 if use_log_scale else 1.1)],
-    labels={
-        'cumulative_injuries': 'Cumulative Number of Injuries',
-        'cumulative_fatalities': 'Cumulative Number of Deaths',
-        'cumulative_incidents': 'Cumulative Number of Incidents',
-        'weapon': 'Weapon Type',
-        'time_period': 'Time Period'
-    },
-    title=f'Evolution of Terror Attacks by Weapon Type ({time_group}ly)',
-    hover_data={
-        'weapon': False,
-        'cumulative_incidents': True,
-        'cumulative_fatalities': ':,.0f',
-        'cumulative_injuries': ':,.0f',
-        'time_period': True,
-        'bubble_size': False
-    }
-)
+# Sidebar slots of the statistics and export, refilled by the weapon sections
+weapon_count_placeholder = st.sidebar.empty()
+st.sidebar.markdown("### Current Statistics")
+stats_placeholder = st.sidebar.empty()
+st.sidebar.markdown("### Export Data")
+export_placeholder = st.sidebar.empty()
 
-# Update text sizes
-fig.update_traces(
-    hoverlabel=dict(font_size=15)
-)
+# Monthly series of the change points and forecast, overall and per weapon type
+series = monthly_series(terror_data)
+
+# Casualty quantile sketches of the severity bands (they need every event)
+if not is_out_of_core():
+    sketches, sketch_months, sketch_weapons = get_casualty_sketches(terror_data)
 
-# Update title styling
-fig.update_layout(
-    title={
-        'text': f'Evolution of Terror Attacks by Weapon Type ({time_group}ly)',
-        'y':0.95,
-        'x':0.5,
-        'xanchor': 'center',
-        'yanchor': 'top',
-        'font': {'size': 24}
+
+def weapon_time_data(terror_data, time_group, min_incidents):
+    """
+    Incidents, deaths and injuries and their cumulative totals per time
+    period and weapon type (weapon types with at least min_incidents), with
+    every period present for every weapon type.
+    """
+    # Prepare time grouping and ensure proper sorting
+    if time_group == "Month":
+        # Format as YYYY-MM for proper chronological sorting
+        time_period = terror_data['full_date'].dt.strftime('%Y-%m')
+    elif time_group == "Quarter":
+        # Format as YYYY-Q# for proper chronological sorting
+        time_period = terror_data['full_date'].dt.strftime('%Y-Q%q')
+    else:
+        # Ensure year is padded with zeros for proper sorting
+        time_period = terror_data['year'].astype(str).str.zfill(4)
+
+    # Create time-series aggregation with weapon types (out-of-core rows are already counts)
+    time_weapon_data = (
+        terror_data.assign(time_period=time_period).groupby(['time_period', 'weapon'])
+        .agg(
+            id=('incidents', 'sum') if is_out_of_core() else ('id', 'count'),
+            fatalities=('fatalities', 'sum'),
+            injuries=('injuries', 'sum')
+        )
+        .reset_index()
+    )
+
+    # Filter weapons based on total incidents across all time periods
+    weapon_counts = time_weapon_data.groupby('weapon')['id'].sum()
+    weapons_to_include = weapon_counts[weapon_counts >= min_incidents].index
+    time_weapon_data = time_weapon_data[time_weapon_data['weapon'].isin(weapons_to_include)]
+
+    # Calculate cumulative totals for each weapon type
+    time_weapon_data['cumulative_incidents'] = time_weapon_data.groupby('weapon')['id'].cumsum()
+    time_weapon_data['cumulative_fatalities'] = time_weapon_data.groupby('weapon')['fatalities'].cumsum()
+    time_weapon_data['cumulative_injuries'] = time_weapon_data.groupby('weapon')['injuries'].cumsum()
+
+    # Ensure minimum values of 1 for log scale (do this AFTER calculating cumulative totals)
+    time_weapon_data['cumulative_fatalities'] = time_weapon_data['cumulative_fatalities'].clip(lower=1)
+    time_weapon_data['cumulative_injuries'] = time_weapon_data['cumulative_injuries'].clip(lower=1)
+
+    # Sort by time_period and weapon
+    time_weapon_data = time_weapon_data.sort_values(['time_period', 'weapon'])
+
+    # Before creating the plot, ensure we have complete data for each time period
+    time_periods = sorted(time_weapon_data['time_period'].unique())
+    weapons = sorted(time_weapon_data['weapon'].unique())
+
+    # Create a complete DataFrame with all combinations
+    index = pd.MultiIndex.from_product([time_periods, weapons], names=['time_period', 'weapon'])
+    complete_data = pd.DataFrame(index=index).reset_index()
+
+    # Merge with existing data
+    time_weapon_data = pd.merge(
+        complete_data,
+        time_weapon_data,
+        on=['time_period', 'weapon'],
+        how='left'
+    ).fillna(0)
+
+    # Recalculate cumulative totals
+    for weapon in weapons:
+        mask = time_weapon_data['weapon'] == weapon
+        time_weapon_data.loc[mask, 'cumulative_incidents'] = time_weapon_data.loc[mask, 'id'].cumsum()
+        time_weapon_data.loc[mask, 'cumulative_fatalities'] = time_weapon_data.loc[mask, 'fatalities'].cumsum()
+        time_weapon_data.loc[mask, 'cumulative_injuries'] = time_weapon_data.loc[mask, 'injuries'].cumsum()
+
+    # Ensure minimum values for log scale
+    time_weapon_data['cumulative_fatalities'] = time_weapon_data['cumulative_fatalities'].clip(lower=1)
+    time_weapon_data['cumulative_injuries'] = time_weapon_data['cumulative_injuries'].clip(lower=1)
+
+    time_weapon_data['bubble_size'] = (
+        time_weapon_data['cumulative_incidents'] + 10
+    )
+
+    return time_weapon_data
+
+
+@st.cache_data(show_spinner=False)
+def build_bubble_chart(_token, time_weapon_data, change_points, time_group, color_scheme, use_log_scale):
+    """
+    The animated bubble chart, with the change points of each period
+    annotated on its frame. Runs on a worker thread (see run_latest), so it
+    does not call Streamlit.
+    """
+    # Set color scheme for weapon types
+    weapon_colors = {
+        'Explosives': '#e31a1c',          # Red
+        'Firearms': '#1f78b4',            # Blue
+        'Melee': '#33a02c',              # Green
+        'Incendiary': '#ff7f00',         # Orange
+        'Vehicle': '#6a3d9a',            # Purple
+        'Unknown': '#666666',            # Gray
+        'Chemical': '#b15928',           # Brown
+        "Biological": '#20b2aa',         # Light Sea Green
+        'Other': '#a6cee3'               # Light Blue
     }
-)
 
-# Update layout with proper scale formatting and vertical lines
-fig.update_layout(
-    height=700,
-    showlegend=True,
-    hovermode='closest',
-    legend=dict(
-        yanchor="top",
-        y=0.99,
-        xanchor="left",
-        x=1.02,
-        title="Weapon Types",
-        itemsizing='constant',
-        font=dict(size=14),
-        title_font=dict(size=16)
-    ),
-    # Add vertical lines for both log and linear scales
-    shapes=[
-        dict(
-            type='line',
-            x0=x,
-            x1=x,
-            y0=0,
-            y1=time_weapon_data['cumulative_fatalities'].max() * (3 if use_log_scale else 1.1),
-            yref='y',
-            xref='x',
-            line=dict(
-                color='gray',
-                width=1
+    # Define viridis color mapping
+    viridis_colors = px.colors.sequential.Viridis
+    weapon_categories = sorted(time_weapon_data['weapon'].unique())
+    viridis_mapping = {
+        weapon: viridis_colors[i] 
+        for i, weapon in enumerate(weapon_categories)
+    }
+
+    # Create scatter plot with explicit category orders
+    weapon_categories = sorted(time_weapon_data['weapon'].unique())
+    fig = px.scatter(
+        time_weapon_data,
+        x='cumulative_injuries',
+        y='cumulative_fatalities',
+        animation_frame='time_period',
+        animation_group='weapon',
+        size='bubble_size',
+        color='weapon',
+        color_discrete_map=viridis_mapping if color_scheme == "Viridis" else weapon_colors,
+        hover_name='weapon',
+        category_orders={'weapon': weapon_categories},
+        log_x=use_log_scale,
+        log_y=use_log_scale,
+        size_max=60,
+        range_x=[0.9 if use_log_scale else 0, time_weapon_data['cumulative_injuries'].max() * (3 if use_log_scale else 1.1)],
+        range_y=[0.9 if use_log_scale else 0, time_weapon_data['cumulative_fatalities'].max() * (3 if use_log_scale else 1.1)],
+        labels={
+            'cumulative_injuries': 'Cumulative Number of Injuries',
+            'cumulative_fatalities': 'Cumulative Number of Deaths',
+            'cumulative_incidents': 'Cumulative Number of Incidents',
+            'weapon': 'Weapon Type',
+            'time_period': 'Time Period'
+        },
+        title=f'Evolution of Terror Attacks by Weapon Type ({time_group}ly)',
+        hover_data={
+            'weapon': False,
+            'cumulative_incidents': True,
+            'cumulative_fatalities': ':,.0f',
+            'cumulative_injuries': ':,.0f',
+            'time_period': True,
+            'bubble_size': False
+        }
+    )
+
+    # Update text sizes
+    fig.update_traces(
+        hoverlabel=dict(font_size=15)
+    )
+
+    # Update title styling
+    fig.update_layout(
+        title={
+            'text': f'Evolution of Terror Attacks by Weapon Type ({time_group}ly)',
+            'y':0.95,
+            'x':0.5,
+            'xanchor': 'center',
+            'yanchor': 'top',
+            'font': {'size': 24}
+        }
+    )
+
+    # Update layout with proper scale formatting and vertical lines
+    fig.update_layout(
+        height=700,
+        showlegend=True,
+        hovermode='closest',
+        legend=dict(
+            yanchor="top",
+            y=0.99,
+            xanchor="left",
+            x=1.02,
+            title="Weapon Types",
+            itemsizing='constant',
+            font=dict(size=14),
+            title_font=dict(size=16)
+        ),
+        # Add vertical lines for both log and linear scales
+        shapes=[
+            dict(
+                type='line',
+                x0=x,
+                x1=x,
+                y0=0,
+                y1=time_weapon_data['cumulative_fatalities'].max() * (3 if use_log_scale else 1.1),
+                yref='y',
+                xref='x',
+                line=dict(
+                    color='gray',
+                    width=1
+                )
             )
-        )
-        for x in ([1, 10, 100, 1000, 10000] if use_log_scale else 
-                    range(1000, 8000, 1000))
-    ],
-    xaxis=dict(
-        type='log' if use_log_scale else 'linear',
-        tickmode='array' if use_log_scale else 'auto',
-        ticktext=[1, 10, 100, 1000, 10000] if use_log_scale else None,
-        tickvals=[1, 10, 100, 1000, 10000] if use_log_scale else None,
-        title_text=f'Cumulative Number of Injuries ({("log" if use_log_scale else "linear")} scale)',
-        title_font=dict(size=18),
-        tickfont=dict(size=14),
-        showgrid=True,
-        gridwidth=1,
-        gridcolor='rgba(128, 128, 128, 0.2)',
-    ),
-    yaxis=dict(
-        type='log' if use_log_scale else 'linear',
-        tickmode='array' if use_log_scale else 'auto',
-        ticktext=[1, 10, 100, 1000, 10000] if use_log_scale else None,
-        tickvals=[1, 10, 100, 1000, 10000] if use_log_scale else None,
-        title_text=f'Cumulative Number of Deaths ({("log" if use_log_scale else "linear")} scale)',
-        title_font=dict(size=18),
-        tickfont=dict(size=14)
-    ),
-    title_font=dict(size=20),
-    font=dict(size=14),
-
-    updatemenus=[{
-        'type': 'buttons',
-        'showactive': False,
-        'x': 0.05,
-        'y': 1.1,
-        'buttons': [{
-            'label': '▶️ Play',
-            'method': 'animate',
-            'args': [None, {
-                'frame': {'duration': 800, 'redraw': True},
-                'fromcurrent': True,
-                'transition': {'duration': 300},
-                'mode': 'immediate'
-            }]
-        }, {
-            'label': '⏸️ Pause',
-            'method': 'animate',
-            'args': [[None], {
-                'frame': {'duration': 0, 'redraw': False},
-                'mode': 'immediate'
+            for x in ([1, 10, 100, 1000, 10000] if use_log_scale else 
+                        range(1000, 8000, 1000))
+        ],
+        xaxis=dict(
+            type='log' if use_log_scale else 'linear',
+            tickmode='array' if use_log_scale else 'auto',
+            ticktext=[1, 10, 100, 1000, 10000] if use_log_scale else None,
+            tickvals=[1, 10, 100, 1000, 10000] if use_log_scale else None,
+            title_text=f'Cumulative Number of Injuries ({("log" if use_log_scale else "linear")} scale)',
+            title_font=dict(size=18),
+            tickfont=dict(size=14),
+            showgrid=True,
+            gridwidth=1,
+            gridcolor='rgba(128, 128, 128, 0.2)',
+        ),
+        yaxis=dict(
+            type='log' if use_log_scale else 'linear',
+            tickmode='array' if use_log_scale else 'auto',
+            ticktext=[1, 10, 100, 1000, 10000] if use_log_scale else None,
+            tickvals=[1, 10, 100, 1000, 10000] if use_log_scale else None,
+            title_text=f'Cumulative Number of Deaths ({("log" if use_log_scale else "linear")} scale)',
+            title_font=dict(size=18),
+            tickfont=dict(size=14)
+        ),
+        title_font=dict(size=20),
+        font=dict(size=14),
+
+        updatemenus=[{
+            'type': 'buttons',
+            'showactive': False,
+            'x': 0.05,
+            'y': 1.1,
+            'buttons': [{
+                'label': '▶️ Play',
+                'method': 'animate',
+                'args': [None, {
+                    'frame': {'duration': 800, 'redraw': True},
+                    'fromcurrent': True,
+                    'transition': {'duration': 300},
+                    'mode': 'immediate'
+                }]
+            }, {
+                'label': '⏸️ Pause',
+                'method': 'animate',
+                'args': [[None], {
+                    'frame': {'duration': 0, 'redraw': False},
+                    'mode': 'immediate'
+                }]
             }]
-        }]
-    }],
-    sliders=[{
-        'currentvalue': {
-            'prefix': 'Time Period: ',
-            'font': {'size': 16}
-        },
-        'font': {'size': 14},
-        'pad': {'t': 50},
-        'len': 0.9,
-        'x': 0.1,
-        'xanchor': 'left',
-        'y': 0,      
-        'yanchor': 'top',
-        'transition': {'duration': 300}
-    }],
-    margin=dict(r=150)
-)
+        }],
+        sliders=[{
+            'currentvalue': {
+                'prefix': 'Time Period: ',
+                'font': {'size': 16}
+            },
+            'font': {'size': 14},
+            'pad': {'t': 50},
+            'len': 0.9,
+            'x': 0.1,
+            'xanchor': 'left',
+            'y': 0,      
+            'yanchor': 'top',
+            'transition': {'duration': 300}
+        }],
+        margin=dict(r=150)
+    )
 
-# Add annotations for each frame
-for frame in fig.frames:
-    time = frame.name
-    frame_data = time_weapon_data[time_weapon_data['time_period'] == time]
-    
-    # Add trend line
-    frame.update(layout=dict(
-        annotations=[{
+    # Add annotations for each frame
+    for frame in fig.frames:
+        # Stop here if newer controls superseded this chart
+        _token.check()
+        time = frame.name
+        annotations = [{
             'text': f'Time Period: {time}',
             'x': 0.05,
             'y': 0.95,
@@ -424,17 +484,291 @@ for frame in fig.frames:
             'yref': 'paper',
             'font': {'size': 20}
         }]
+
+        # Mark the change points detected in this period
+        frame_points = change_points[change_points['time_period'] == time]
+        if not frame_points.empty:
+            annotations.append({
+                'text': 'Change points: ' + ', '.join(
+                    f"{row.series} {METRICS[row.metric].lower()} {row.direction}" for row in frame_points.itertuples()
+                ),
+                'x': 0.05,
+                'y': 0.88,
+                'showarrow': False,
+                'xref': 'paper',
+                'yref': 'paper',
+                'xanchor': 'left',
+                'font': {'size': 14, 'color': '#e31a1c'}
+            })
+
+        frame.update(layout=dict(annotations=annotations))
+
+    return fig
+
+
+@st.fragment
+def bubble_section(time_weapon_data, change_points, time_group):
+    """The animated bubble chart; changing its palette or scale only reruns this section"""
+    scheme_col, scale_col = st.columns(2)
+    with scheme_col:
+        # Add color scheme selector
+        color_scheme = st.radio(
+            "Color Palette",
+            ["Custom", "Viridis"],
+            horizontal=True,
+            key="color_scheme"
+        )
+    with scale_col:
+        # Add log scale toggle
+        use_log_scale = st.checkbox("Use Log Scale", value=True, help="Toggle between linear and logarithmic scales")
+
+    fig = run_latest(
+        'bubble_chart', build_bubble_chart, time_weapon_data, change_points, time_group, color_scheme, use_log_scale,
+        message="Updating the chart"
+    )
+
+    # Display plot
+    plotly_chart(fig, use_container_width=True)
+
+
+@st.fragment
+def severity_section(bands, weapons, time_group):
+    """Severity bands of one weapon type; picking another only reruns this section"""
+    st.markdown(
+        '''
+        <div style="text-align: right; direction: rtl;">
+        <h3>חומרת האירועים לפי סוג נשק:</h3>
+        <p>
+        הגרף מציג את מספר הנפגעים (הרוגים ופצועים) באירוע בודד בכל תקופה: החציון, האחוזון ה-90 והאחוזון ה-99.
+        כך ניתן להבחין בין סוג נשק שקטלני באופן עקבי לבין סוג נשק שהנפגעים בו נובעים ממספר קטן של אירועים רבי נפגעים.
+        </p>
+        </div>
+        ''',
+        unsafe_allow_html=True
+    )
+    severity_weapon = st.selectbox("Weapon Type", weapons, key="severity_weapon")
+    weapon_bands = bands[bands['weapon'] == severity_weapon]
+    severity = go.Figure()
+    severity.add_trace(go.Scatter(
+        x=[*weapon_bands['time_period'], *weapon_bands['time_period'][::-1]],
+        y=[*weapon_bands['p99'], *weapon_bands['p90'][::-1]],
+        fill='toself',
+        fillcolor='rgba(227, 26, 28, 0.15)',
+        line=dict(width=0),
+        hoverinfo='skip',
+        name='p90 to p99'
     ))
+    for column, name, dash in (('p99', 'p99', 'dot'), ('p90', 'p90', 'dash'), ('median', 'Median', 'solid')):
+        severity.add_trace(go.Scatter(
+            x=weapon_bands['time_period'],
+            y=weapon_bands[column],
+            mode='lines+markers',
+            name=name,
+            line=dict(color='#e31a1c', dash=dash, width=2 if column == 'median' else 1)
+        ))
+    severity.update_layout(
+        height=400,
+        title=f'Casualties per Attack ({severity_weapon}, {time_group}ly)',
+        title_font=dict(size=20),
+        xaxis_title='Time Period',
+        yaxis_title='Casualties per Attack',
+        xaxis_type='category',
+        template='plotly_white',
+        legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1)
+    )
+    plotly_chart(severity, use_container_width=True)
+    st.caption("Quantiles are estimated with mergeable sketches (within 1% of an actual value); periods without attacks are omitted")
 
-# Display plot
-st.plotly_chart(fig, use_container_width=True)
 
-# Add statistics sidebar
-st.sidebar.markdown("### Current Statistics")
-current_stats = time_weapon_data.groupby('weapon').agg({
-    'id': 'sum',
-    'fatalities': 'sum',
-    'injuries': 'sum'
-}).sort_values('id', ascending=False).rename(columns={'id': 'Incidents', "fatalities": "Deaths", "injuries": "Injuries"})
 
-st.sidebar.dataframe(current_stats, use_container_width=True)
+@st.fragment
+def change_point_section(series, segments, weapons):
+    """
+    Timeline of one monthly series with its change points and forecast.
+    Changing the series, metric or horizon only reruns this section.
+    """
+    st.markdown(
+        '''
+        <div style="text-align: right; direction: rtl;">
+        <h3>נקודות שינוי בדפוסי הטרור:</h3>
+        <p>
+        הגרף מציג את מספר האירועים או הנפגעים בכל חודש, יחד עם נקודות השינוי שזוהו אוטומטית -
+        החודשים שבהם הרמה הממוצעת של הסדרה השתנתה באופן מובהק. הקו המדורג מציג את הממוצע החודשי בין נקודות השינוי.
+        </p>
+        </div>
+        ''',
+        unsafe_allow_html=True
+    )
+
+    series_col, metric_col, horizon_col = st.columns(3)
+    with series_col:
+        selected_series = st.selectbox("Series", [OVERALL, *weapons], key="change_point_series")
+    with metric_col:
+        selected_metric = st.radio("Metric", list(METRICS), format_func=METRICS.get, horizontal=True, key="change_point_metric")
+    with horizon_col:
+        horizon = st.select_slider(
+            "Forecast (months)",
+            options=[0, 6, 12, 24],
+            value=12,
+            key="forecast_horizon",
+            help="Negative-binomial trend + seasonality forecast of the last 10 years, with an 80% prediction band (0 hides it)"
+        )
+    selected_segments = segments[(segments['series'] == selected_series) & (segments['metric'] == selected_metric)]
+
+    timeline = go.Figure()
+    timeline.add_trace(go.Bar(
+        x=series.columns,
+        y=series.loc[(selected_series, selected_metric)],
+        name=f"Monthly {METRICS[selected_metric].lower()}",
+        marker_color='rgba(31, 120, 180, 0.45)'
+    ))
+    timeline.add_trace(go.Scatter(
+        x=[date for segment in selected_segments.itertuples() for date in (segment.start, segment.end + pd.offsets.MonthEnd(), None)],
+        y=[value for segment in selected_segments.itertuples() for value in (segment.mean, segment.mean, None)],
+        mode='lines',
+        name='Segment mean',
+        line=dict(color='#e31a1c', width=3)
+    ))
+    if horizon:
+        # Forecasts of all series are fitted together; show the selected one after the last month
+        forecast = forecast_series(series, horizon)
+        forecast = forecast[(forecast['series'] == selected_series) & (forecast['metric'] == selected_metric)]
+        timeline.add_trace(go.Scatter(
+            x=[*forecast['month'], *forecast['month'][::-1]],
+            y=[*forecast['upper'], *forecast['lower'][::-1]],
+            fill='toself',
+            fillcolor='rgba(255, 127, 0, 0.2)',
+            line=dict(width=0),
+            hoverinfo='skip',
+            name='80% prediction band'
+        ))
+        timeline.add_trace(go.Scatter(
+            x=forecast['month'],
+            y=forecast['mean'],
+            mode='lines',
+            name='Forecast',
+            line=dict(color='#ff7f00', width=3, dash='dot')
+        ))
+    for start in selected_segments['start'].iloc[1:]:
+        timeline.add_vline(x=start, line=dict(color='gray', dash='dash', width=1))
+    timeline.update_layout(
+        height=450,
+        title=f'Monthly {METRICS[selected_metric]}, Change Points and Forecast ({selected_series})',
+        title_font=dict(size=20),
+        xaxis_title='Month',
+        yaxis_title=f'Monthly {METRICS[selected_metric]}',
+        template='plotly_white',
+        legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1),
+        bargap=0
+    )
+    plotly_chart(timeline, use_container_width=True)
+    st.caption("The GTD has no records for 1993 (the original records were lost), so change points around that year reflect the gap in the data")
+
+    change_table = selected_segments.assign(
+        before=selected_segments['mean'].shift()
+    ).iloc[1:][['start', 'before', 'mean']].rename(
+        columns={'start': 'Change Month', 'before': 'Monthly Mean Before', 'mean': 'Monthly Mean After'}
+    )
+    st.dataframe(
+        change_table,
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            'Change Month': st.column_config.DateColumn(format="YYYY-MM"),
+            'Monthly Mean Before': st.column_config.NumberColumn(format="%.2f"),
+            'Monthly Mean After': st.column_config.NumberColumn(format="%.2f"),
+        }
+    )
+
+@st.fragment
+def weapon_sections(terror_data, series):
+    """
+    The time grouping, minimum incidents and change-point sensitivity, and
+    the sections they drive: the bubble chart, the severity bands, the
+    change points and the sidebar statistics. Changing them only reruns
+    these sections (not the data loading and filtering above), and the
+    controls of each section only rerun that section.
+    """
+    time_col, incidents_col, sensitivity_col = st.columns(3)
+    with time_col:
+        # Time aggregation selector
+        time_group = st.selectbox(
+            "Time Grouping",
+            ["Month", "Year"],
+            index=1,
+            label_visibility="visible",
+            key="time_group",
+            help="Select time aggregation level"
+        )
+    with incidents_col:
+        # Minimum incidents threshold
+        min_incidents = st.slider(
+            "Minimum Incidents per Weapon Type",
+            min_value=1,
+            max_value=50,
+            value=5
+        )
+    with sensitivity_col:
+        # Sensitivity of the change-point detection
+        sensitivity = st.slider(
+            "Change-Point Sensitivity",
+            min_value=0.5,
+            max_value=2.0,
+            value=1.0,
+            step=0.25,
+            help="Higher values detect more (smaller) changes"
+        )
+
+    time_weapon_data = weapon_time_data(terror_data, time_group, min_incidents)
+    weapons = sorted(time_weapon_data['weapon'].unique())
+    weapon_count_placeholder.markdown(f"Weapon types in visualization: **{len(weapons)}**")
+
+    # Change points of the monthly series, overall and per weapon type shown
+    segments = detect_change_points(series, sensitivity)
+    change_points = segments[
+        segments['series'].isin([OVERALL, *weapons]) & (segments['start'] > segments.groupby(['series', 'metric'])['start'].transform('min'))
+    ].copy()
+    previous_mean = segments.groupby(['series', 'metric'])['mean'].shift()
+    change_points['direction'] = np.where(change_points['mean'] > previous_mean[change_points.index], '↑', '↓')
+    change_points['time_period'] = change_points['start'].dt.strftime('%Y-%m' if time_group == "Month" else '%Y')
+
+    bubble_section(time_weapon_data, change_points, time_group)
+
+    # Severity bands of the weapon types shown, from the merged quantile sketches
+    if is_out_of_core():
+        st.info("Out-of-core mode: the data file is aggregated in chunks without being loaded, so the severity bands (which need every event) and the shared filters are not available.")
+    else:
+        bands, overall_bands = severity_bands(sketches, sketch_months, sketch_weapons, time_group)
+        severity_section(bands, weapons, time_group)
+
+    change_point_section(series, segments, weapons)
+
+    # Statistics of the weapon types shown
+    current_stats = time_weapon_data.groupby('weapon').agg({
+        'id': 'sum',
+        'fatalities': 'sum',
+        'injuries': 'sum'
+    }).sort_values('id', ascending=False).rename(columns={'id': 'Incidents', "fatalities": "Deaths", "injuries": "Injuries"})
+    # Casualties per attack next to the sums, so a few mass-casualty attacks stand out
+    if not is_out_of_core():
+        current_stats = current_stats.join(overall_bands)
+    stats_placeholder.dataframe(current_stats, use_container_width=True)
+
+    # Export the data behind the animation
+    export_buttons(
+        time_weapon_data.drop(columns='bubble_size').rename(columns={
+            'time_period': 'Time Period',
+            'weapon': 'Weapon Type',
+            'id': 'Incidents',
+            'fatalities': 'Deaths',
+            'injuries': 'Injuries',
+            'cumulative_incidents': 'Cumulative Incidents',
+            'cumulative_fatalities': 'Cumulative Deaths',
+            'cumulative_injuries': 'Cumulative Injuries'
+        }),
+        f'weapon_evolution_{time_group.lower()}ly',
+        container=export_placeholder.container()
+    )
+
+
+weapon_sections(terror_data, series)
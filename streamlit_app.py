@@ -1,13 +1,14 @@
 import streamlit as st
-import pandas as pd
-import math
-from pathlib import Path
 from st_pages import add_page_title, get_nav_from_toml
+from utils.shared_data import pin_dataset_version
 
 
 # Set the title and favicon that appear in the Browser's tab bar.
 st.set_page_config(layout="wide")
 
+# In multi-worker mode, switch to the latest published dataset between runs
+pin_dataset_version()
+
 nav = get_nav_from_toml("pages.toml")
 
 pg = st.navigation(nav)
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+
+from utils.forecast import design_matrix, fit_negative_binomial, forecast_series
+
+
+def monthly_frame(rows):
+    """Series frame as built by utils.changepoints.monthly_series"""
+    months = pd.period_range('2005-01', periods=len(rows[0][2]), freq='M').to_timestamp()
+    return pd.DataFrame(
+        np.array([values for _, _, values in rows], dtype=float),
+        index=pd.MultiIndex.from_tuples([(series, metric) for series, metric, _ in rows], names=['series', 'metric']),
+        columns=months
+    )
+
+
+def test_all_zero_series_forecasts_zero():
+    series = monthly_frame([
+        ('Biological', 'incidents', np.zeros(120)),
+        ('Biological', 'casualties', np.zeros(120)),
+    ])
+    forecast = forecast_series(series, horizon=12)
+    assert len(forecast) == 24
+    assert (forecast[['mean', 'lower', 'upper']] == 0).all().all()
+
+
+def test_single_event_series_has_a_small_band():
+    values = np.zeros(120)
+    values[60] = 1
+    series = monthly_frame([('Melee', 'incidents', values)])
+    forecast = forecast_series(series, horizon=12)
+    assert np.isfinite(forecast[['mean', 'lower', 'upper']].to_numpy()).all()
+    assert forecast['mean'].max() < 1
+    assert forecast['upper'].max() <= 2
+
+
+def test_zero_series_does_not_affect_the_others():
+    rng = np.random.default_rng(1)
+    busy = rng.poisson(5, 120).astype(float)
+    alone = forecast_series(monthly_frame([('Explosives', 'incidents', busy)]), horizon=6)
+    mixed = forecast_series(monthly_frame([
+        ('Explosives', 'incidents', busy),
+        ('Biological', 'incidents', np.zeros(120)),
+    ]), horizon=6)
+    pd.testing.assert_series_equal(
+        alone['mean'], mixed.loc[mixed['series'] == 'Explosives', 'mean'].reset_index(drop=True)
+    )
+    assert 2 < alone['mean'].mean() < 10
+
+
+def test_fit_keeps_an_all_zero_intercept_finite():
+    beta, covariance, alpha = fit_negative_binomial(np.zeros((1, 120)), design_matrix(120))
+    assert np.isfinite(beta).all() and np.isfinite(covariance).all()
+    assert beta[0, 0] > -20
@@ -0,0 +1,68 @@
+import pandas as pd
+
+from utils.network import GroupNetwork, centrality, incident_codes
+
+
+def events(eventids, related, groups):
+    return pd.DataFrame({
+        'eventid': eventids,
+        'iyear': 1988,
+        'imonth': 8,
+        'iday': 11,
+        'related': related,
+        'gname': groups,
+        'gname2': None,
+        'gname3': None,
+    })
+
+
+def test_events_listing_each_other_form_one_incident():
+    df = events(
+        [198808110001, 198808110002, 198808110003],
+        ['198808110002', '198808110001', None],
+        ['Group A', 'Group B', 'Group C'],
+    )
+    codes = incident_codes(df)
+    assert codes[0] == codes[1] != codes[2]
+
+    metrics = centrality(GroupNetwork(df).cooccurrence())
+    metrics.index = ['Group A', 'Group B', 'Group C']
+    assert metrics.loc['Group A', 'degree'] == 1
+    assert metrics.loc['Group B', 'degree'] == 1
+    assert metrics.loc['Group C', 'degree'] == 0
+
+
+def test_lists_in_different_orders_form_one_incident():
+    df = events(
+        [198808110004, 198808110005, 198808110006],
+        [
+            '198808110004, 198808110005, 198808110006',
+            '198808110005, 198808110004, 198808110006',
+            '198808110006, 198808110004, 198808110005',
+        ],
+        ['Group A', 'Group B', 'Group C'],
+    )
+    assert len(set(incident_codes(df))) == 1
+
+
+def test_ids_in_scientific_notation_are_recovered_from_the_lists():
+    # The bundled extract stores eventid as 1.98808E+11
+    df = events(
+        [1.98808e11, 1.98808e11, 1.98808e11],
+        ['198808110002', '198808110001', None],
+        ['Group A', 'Group B', 'Group C'],
+    )
+    codes = incident_codes(df)
+    assert codes[0] == codes[1] != codes[2]
+
+
+def test_published_arrays_rebuild_the_same_network():
+    df = events(
+        [198808110001, 198808110002, 198808110003],
+        ['198808110002', '198808110001', None],
+        ['Group A', 'Group B', 'Group A'],
+    )
+    network = GroupNetwork(df)
+    attached = GroupNetwork.from_arrays(*network.to_arrays())
+    assert list(attached.groups) == list(network.groups)
+    assert (attached.cooccurrence() != network.cooccurrence()).nnz == 0
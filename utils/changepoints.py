@@ -0,0 +1,125 @@
+import streamlit as st
+import pandas as pd
+import numpy as np
+
+METRICS = {
+    'incidents': 'Incidents',
+    'casualties': 'Casualties',
+}
+
+# Series label of the totals over all weapon types
+OVERALL = 'All Weapons'
+
+
+def monthly_series(data):
+    """
+    Monthly incidents and casualties (deaths + injuries), overall and per
+    weapon type, as one frame with a (series, metric) row per series and a
+    column per month. Months without events are 0. `data` has one row per
+    event, or per-row sums with an `incidents` column (out-of-core).
+    """
+    months = (data['year'] * 12 + data['month'] - 1).to_numpy()
+    first, n_months = months.min(), months.max() - months.min() + 1
+    weapons = sorted(data['weapon'].unique())
+    weapon_codes = pd.Categorical(data['weapon'], categories=weapons).codes
+    cells = weapon_codes * n_months + months - first
+
+    rows, labels = [], []
+    casualties = (data['fatalities'] + data['injuries']).to_numpy(dtype=float)
+    incidents = data['incidents'].to_numpy(dtype=float) if 'incidents' in data else None
+    for metric, weights in (('incidents', incidents), ('casualties', casualties)):
+        per_weapon = np.bincount(cells, weights=weights, minlength=len(weapons) * n_months)
+        per_weapon = per_weapon.reshape(len(weapons), n_months)
+        rows += [per_weapon.sum(axis=0, keepdims=True), per_weapon]
+        labels += [(OVERALL, metric)] + [(weapon, metric) for weapon in weapons]
+
+    dates = pd.period_range(pd.Period(year=first // 12, month=first % 12 + 1, freq='M'), periods=n_months)
+    return pd.DataFrame(
+        np.vstack(rows),
+        index=pd.MultiIndex.from_tuples(labels, names=['series', 'metric']),
+        columns=dates.to_timestamp()
+    )
+
+
+def pelt(values, penalty, min_size=6):
+    """
+    PELT (pruned exact linear time) change-point search run on every row of
+    a (series x time) matrix at once, with a mean-shift cost. A start
+    position is pruned from a series once it can no longer begin that
+    series' last segment, and only positions still open in some series are
+    evaluated. Returns the change points (first index of each new segment)
+    of every series.
+    """
+    n_series, n = values.shape
+    penalty = np.broadcast_to(np.asarray(penalty, dtype=float), (n_series,))[:, None]
+    cumsum = np.zeros((n_series, n + 1))
+    cumsum[:, 1:] = np.cumsum(values, axis=1)
+    cumsq = np.zeros((n_series, n + 1))
+    cumsq[:, 1:] = np.cumsum(values ** 2, axis=1)
+
+    best = np.full((n_series, n + 1), np.inf)
+    best[:, 0] = -penalty[:, 0]
+    last = np.zeros((n_series, n + 1), dtype=int)
+    active = np.zeros((n_series, n + 1), dtype=bool)
+    rows = np.arange(n_series)
+
+    for t in range(min_size, n + 1):
+        active[:, t - min_size] |= np.isfinite(best[:, t - min_size])
+        starts = np.flatnonzero(active[:, :t - min_size + 1].any(axis=0))
+        sums = cumsum[:, [t]] - cumsum[:, starts]
+        cost = cumsq[:, [t]] - cumsq[:, starts] - sums ** 2 / (t - starts)
+        total = np.where(active[:, starts], best[:, starts] + cost + penalty, np.inf)
+        choice = total.argmin(axis=1)
+        best[:, t] = total[rows, choice]
+        last[:, t] = starts[choice]
+        active[:, starts] &= total - penalty <= best[:, [t]]
+
+    change_points = []
+    for row in rows:
+        points, t = [], n
+        while t > 0:
+            t = last[row, t]
+            if t > 0:
+                points.append(t)
+        change_points.append(np.array(points[::-1], dtype=int))
+    return change_points
+
+
+def noise_scale(values):
+    """Robust per-series noise level from the MAD of month-to-month differences"""
+    differences = np.diff(values, axis=1)
+    deviation = np.abs(differences - np.median(differences, axis=1, keepdims=True))
+    scale = np.median(deviation, axis=1) / (0.6745 * np.sqrt(2))
+    fallback = differences.std(axis=1) / np.sqrt(2)
+    scale = np.where(scale > 0, scale, fallback)
+    return np.where(scale > 0, scale, 1.0)
+
+
+@st.cache_data
+def detect_change_points(series, sensitivity=1.0, min_size=6):
+    """
+    Segments of every monthly series between detected change points.
+
+    Counts are log1p-transformed and scaled by their noise level, so one
+    BIC-style penalty (3 log n, divided by the sensitivity) fits all series.
+    Returns one row per segment with its start, end and mean monthly value.
+    """
+    values = np.log1p(series.to_numpy(dtype=float))
+    values = values / noise_scale(values)[:, None]
+    penalty = 3 * np.log(values.shape[1]) / sensitivity
+    change_points = pelt(values, penalty, min_size)
+
+    dates = series.columns
+    raw = series.to_numpy(dtype=float)
+    segments = []
+    for (label, metric), row, points in zip(series.index, raw, change_points):
+        bounds = [0, *points, len(dates)]
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            segments.append({
+                'series': label,
+                'metric': metric,
+                'start': dates[start],
+                'end': dates[end - 1],
+                'mean': row[start:end].mean(),
+            })
+    return pd.DataFrame(segments)
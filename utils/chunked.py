@@ -0,0 +1,377 @@
+"""
+Out-of-core aggregation of GTD extracts larger than memory.
+
+The CSV is streamed in chunks of CHUNK_ROWS rows and every chunk is folded
+into the small aggregates the pages are built from:
+
+- task3: incidents, fatalities and injuries per year, month and weapon type
+- task2: per-year moments (count, sums, cross-products) of perpetrators,
+  deaths and injuries, enough for the correlation matrix of any year range
+- task1: events and casualties per location (coordinates rounded to ~100 m)
+- homePage: a profile of every column (type, missing values, min / max /
+  mean / standard deviation, approximate number of distinct values)
+
+Every aggregate merges associatively and commutatively with another one of
+the same kind, so chunks are folded in parallel worker processes and merged
+in whatever order they finish. Memory is bounded by the chunks in flight
+(two per worker) plus the aggregates, whatever the size of the input.
+
+Set GTD_OUT_OF_CORE=1 to have the pages use the aggregates instead of
+loading the CSV: the home page shows the column profile, task2 the
+correlation table and task3 the weapon timeline, change points and forecast.
+The views that need individual events (task2's scatter plots, task3's
+severity bands, the shared filters) are left out. task1 still loads every
+row (it maps individual events); its location counts are only written by
+the command line.
+
+Usage (from the repository root):
+    python -m utils.chunked --csv data/IL_data.csv --out aggregates --chunk-rows 100000 --workers 4
+"""
+import argparse
+import math
+import multiprocessing
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import reduce
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.data import DATA_FILENAME, VEHICLE_WEAPON
+
+OUT_OF_CORE_VARIABLE = 'GTD_OUT_OF_CORE'
+
+CHUNK_ROWS = 100_000
+
+# Chunks read ahead per worker: bounds memory while keeping every worker busy
+CHUNKS_IN_FLIGHT = 2
+
+FEATURES = ['nperps', 'nkill', 'nwound']
+
+# Files smaller than this are folded in-process: starting worker processes
+# (each importing pandas and streamlit) costs more than it saves
+IN_PROCESS_BYTES = 64 * 1024 * 1024
+
+# Rounding of the coordinates of the location counts (3 decimals ~ 100 m)
+LOCATION_DECIMALS = 3
+
+# HyperLogLog registers for distinct counts: 2^12 registers, ~1.6% standard error
+HLL_BITS = 12
+
+
+def is_out_of_core():
+    """Whether the CSV should be streamed instead of loaded"""
+    return os.environ.get(OUT_OF_CORE_VARIABLE, '') not in ('', '0')
+
+
+def iter_chunks(path=DATA_FILENAME, chunk_rows=CHUNK_ROWS, usecols=None):
+    """The CSV as DataFrames of at most chunk_rows rows"""
+    return pd.read_csv(path, encoding='ISO-8859-1', low_memory=False, chunksize=chunk_rows, usecols=usecols)
+
+
+def _add(left, right):
+    """Sum of two partial tables indexed by key (keys missing on one side count as 0)"""
+    return left.add(right, fill_value=0)
+
+
+class TimeWeaponSums:
+    """Incidents, fatalities and injuries per (year, month, weapon) (task3)"""
+
+    def __init__(self, table):
+        self.table = table
+
+    @classmethod
+    def fold(cls, chunk):
+        weapons = chunk['weaptype1_txt'].replace(VEHICLE_WEAPON, 'Vehicle')
+        table = pd.DataFrame({
+            'year': chunk['iyear'],
+            'month': chunk['imonth'],
+            'weapon': weapons,
+            'incidents': 1,
+            'fatalities': chunk['nkill'].fillna(0),
+            'injuries': chunk['nwound'].fillna(0),
+        }).groupby(['year', 'month', 'weapon']).sum()
+        return cls(table)
+
+    def merge(self, other):
+        return TimeWeaponSums(_add(self.table, other.table))
+
+    def frame(self):
+        return self.table.astype(np.int64).sort_index().reset_index()
+
+
+class CorrelationMoments:
+    """
+    Per-year count, sums and cross-product sums of FEATURES over the events
+    where all of them are positive (the events of the task2 matrix).
+    """
+
+    def __init__(self, table):
+        self.table = table
+
+    @classmethod
+    def fold(cls, chunk):
+        values = chunk[FEATURES]
+        kept = values.gt(0).all(axis=1)
+        values = values[kept].astype(float)
+        columns = {'n': 1}
+        for i, first in enumerate(FEATURES):
+            columns[f'sum_{first}'] = values[first]
+            for second in FEATURES[i:]:
+                columns[f'sum_{first}_{second}'] = values[first] * values[second]
+        table = pd.DataFrame(columns, index=values.index).groupby(chunk.loc[kept, 'iyear'].rename('year')).sum()
+        return cls(table)
+
+    def merge(self, other):
+        return CorrelationMoments(_add(self.table, other.table))
+
+    def frame(self):
+        return self.table.sort_index().reset_index()
+
+    def correlation(self, years=None):
+        """Pearson correlation matrix of FEATURES over a (first, last) year range"""
+        table = self.table
+        if years is not None:
+            table = table.loc[years[0]:years[1]]
+        totals = table.sum()
+        n = totals['n']
+        means = np.array([totals[f'sum_{feature}'] for feature in FEATURES]) / n
+        covariance = np.empty((len(FEATURES), len(FEATURES)))
+        for i, first in enumerate(FEATURES):
+            for j, second in enumerate(FEATURES):
+                key = f'sum_{first}_{second}' if i <= j else f'sum_{second}_{first}'
+                covariance[i, j] = totals[key] / n - means[i] * means[j]
+        deviations = np.sqrt(np.diag(covariance))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            correlation = covariance / np.outer(deviations, deviations)
+        return pd.DataFrame(correlation, index=FEATURES, columns=FEATURES)
+
+
+class LocationCounts:
+    """Events, deaths and injuries per rounded (latitude, longitude) (task1)"""
+
+    def __init__(self, table):
+        self.table = table
+
+    @classmethod
+    def fold(cls, chunk):
+        located = chunk[chunk['latitude'].notna() & chunk['longitude'].notna()]
+        table = pd.DataFrame({
+            'latitude': located['latitude'].astype(float).round(LOCATION_DECIMALS),
+            'longitude': located['longitude'].astype(float).round(LOCATION_DECIMALS),
+            'events': 1,
+            'nkill': located['nkill'].fillna(0),
+            'nwound': located['nwound'].fillna(0),
+        }).groupby(['latitude', 'longitude']).sum()
+        return cls(table)
+
+    def merge(self, other):
+        return LocationCounts(_add(self.table, other.table))
+
+    def frame(self):
+        return self.table.astype(np.int64).sort_index().reset_index()
+
+
+def _hll_registers(values):
+    """HyperLogLog registers of the distinct values of a Series"""
+    registers = np.zeros(1 << HLL_BITS, dtype=np.uint8)
+    if values.empty:
+        return registers
+    hashes = pd.util.hash_array(values.to_numpy())
+    index = (hashes >> np.uint64(64 - HLL_BITS)).astype(np.int64)
+    # Rank of the first set bit in the next 52 bits (exact as float64)
+    rest = ((hashes << np.uint64(HLL_BITS)) >> np.uint64(HLL_BITS)).astype(float)
+    with np.errstate(divide='ignore'):
+        ranks = np.where(rest > 0, 52 - np.floor(np.log2(rest)), 53)
+    np.maximum.at(registers, index, ranks.astype(np.uint8))
+    return registers
+
+
+def _hll_estimate(registers):
+    m = len(registers)
+    estimate = 0.7213 / (1 + 1.079 / m) * m * m / np.sum(2.0 ** -registers.astype(float))
+    zeros = np.count_nonzero(registers == 0)
+    if estimate <= 2.5 * m and zeros:
+        # Small range correction (linear counting)
+        estimate = m * np.log(m / zeros)
+    return int(round(estimate))
+
+
+class ColumnProfile:
+    """
+    Per-column rows, missing values, min / max / sum / sum of squares of the
+    numeric values and HyperLogLog registers of the distinct values
+    (homePage). Negative numbers are GTD's codes for unknown values and
+    count as missing, as on the home page.
+    """
+
+    def __init__(self, rows, table, registers):
+        self.rows = rows
+        self.table = table
+        self.registers = registers
+
+    @classmethod
+    def fold(cls, chunk):
+        records = {}
+        registers = {}
+        for column in chunk.columns:
+            values = chunk[column]
+            numeric = pd.api.types.is_numeric_dtype(values)
+            if numeric:
+                values = values.astype(float)
+                values = values[values >= 0]
+                # Same hash for 5 and 5.0 in chunks read with different dtypes
+                distinct = values
+            else:
+                values = values.dropna()
+                distinct = values.astype(str)
+            records[column] = {
+                'numeric': numeric,
+                'count': len(values),
+                'min': values.min() if numeric and len(values) else np.nan,
+                'max': values.max() if numeric and len(values) else np.nan,
+                'sum': values.sum() if numeric else 0.0,
+                'sum_squares': (values * values).sum() if numeric else 0.0,
+            }
+            registers[column] = _hll_registers(distinct)
+        return cls(len(chunk), pd.DataFrame.from_dict(records, orient='index'), registers)
+
+    def merge(self, other):
+        left, right = self.table.align(other.table, join='outer')
+        table = pd.DataFrame({
+            # A column is numeric only if it was numeric in every chunk that had it
+            'numeric': left['numeric'].fillna(True).astype(bool) & right['numeric'].fillna(True).astype(bool),
+            'count': left['count'].fillna(0) + right['count'].fillna(0),
+            'min': np.fmin(left['min'], right['min']),
+            'max': np.fmax(left['max'], right['max']),
+            'sum': left['sum'].fillna(0) + right['sum'].fillna(0),
+            'sum_squares': left['sum_squares'].fillna(0) + right['sum_squares'].fillna(0),
+        })
+        # Keep the order of the columns in the file
+        table = table.reindex([*self.table.index, *other.table.index.difference(self.table.index, sort=False)])
+        registers = dict(self.registers)
+        for column, column_registers in other.registers.items():
+            registers[column] = np.maximum(registers[column], column_registers) if column in registers else column_registers
+        return ColumnProfile(self.rows + other.rows, table, registers)
+
+    def frame(self):
+        """One row per column: type, unique (approximate), missing, min, max, mean, std"""
+        table = self.table
+        count = table['count'].astype(np.int64)
+        numeric = table['numeric'].astype(bool)
+        mean = table['sum'] / count.where(count > 0)
+        variance = (table['sum_squares'] - count * mean * mean) / (count - 1).where(count > 1)
+        return pd.DataFrame({
+            'type': np.where(numeric, 'numeric', 'text'),
+            'unique': [_hll_estimate(self.registers[column]) for column in table.index],
+            'missing': self.rows - count,
+            'min': table['min'].where(numeric),
+            'max': table['max'].where(numeric),
+            'mean': mean.where(numeric),
+            'std': np.sqrt(variance.clip(lower=0)).where(numeric),
+        }, index=table.index.rename('column'))
+
+
+class ChunkAggregates:
+    """All the aggregates of one chunk, or of any number of merged chunks"""
+
+    def __init__(self, time_weapon, moments, locations, profile):
+        self.time_weapon = time_weapon
+        self.moments = moments
+        self.locations = locations
+        self.profile = profile
+
+    @classmethod
+    def fold(cls, chunk):
+        return cls(
+            TimeWeaponSums.fold(chunk),
+            CorrelationMoments.fold(chunk),
+            LocationCounts.fold(chunk),
+            ColumnProfile.fold(chunk),
+        )
+
+    def merge(self, other):
+        return ChunkAggregates(
+            self.time_weapon.merge(other.time_weapon),
+            self.moments.merge(other.moments),
+            self.locations.merge(other.locations),
+            self.profile.merge(other.profile),
+        )
+
+    def tables(self):
+        """The aggregates as DataFrames, by name"""
+        return {
+            'time_weapon_sums': self.time_weapon.frame(),
+            'correlation_moments': self.moments.frame(),
+            'location_counts': self.locations.frame(),
+            'column_profile': self.profile.frame().reset_index(),
+        }
+
+
+def estimated_chunks(path, chunk_rows=CHUNK_ROWS):
+    """Approximate number of chunks of the CSV, from the line length of its first MB"""
+    size = Path(path).stat().st_size
+    with open(path, 'rb') as file:
+        sample = file.read(1 << 20)
+    if not sample:
+        return 1
+    rows = size / len(sample) * max(sample.count(b'\n'), 1)
+    return max(1, math.ceil(rows / chunk_rows))
+
+
+def aggregate_csv(path=DATA_FILENAME, chunk_rows=CHUNK_ROWS, workers=None):
+    """
+    Stream the CSV and fold it into ChunkAggregates. With workers > 1 the
+    chunks are folded in a process pool while the next ones are read; at
+    most CHUNKS_IN_FLIGHT chunks per worker are held in memory at a time.
+    Files under IN_PROCESS_BYTES are folded in-process, and there are never
+    more workers than chunks.
+    """
+    if Path(path).stat().st_size < IN_PROCESS_BYTES:
+        workers = 1
+    workers = min(workers or 1, estimated_chunks(path, chunk_rows))
+    chunks = iter_chunks(path, chunk_rows)
+    if workers == 1:
+        return reduce(ChunkAggregates.merge, map(ChunkAggregates.fold, chunks))
+
+    # spawn: forking the multi-threaded Streamlit server is unsafe
+    context = multiprocessing.get_context('spawn')
+    result = None
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        pending = set()
+        for chunk in chunks:
+            if len(pending) >= workers * CHUNKS_IN_FLIGHT:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result() if result is None else result.merge(future.result())
+            pending.add(pool.submit(ChunkAggregates.fold, chunk))
+        for future in pending:
+            result = future.result() if result is None else result.merge(future.result())
+    return result
+
+
+@st.cache_resource(show_spinner="Profiling the data file...")
+def get_aggregates(version):
+    """The aggregates of the current data file, streamed once per version"""
+    return aggregate_csv(DATA_FILENAME, workers=os.cpu_count())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fold a GTD CSV into the dashboard aggregates without loading it")
+    parser.add_argument('--csv', type=Path, default=DATA_FILENAME)
+    parser.add_argument('--out', type=Path, required=True, help="directory for the aggregate Parquet files")
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    aggregates = aggregate_csv(args.csv, args.chunk_rows, args.workers)
+    args.out.mkdir(parents=True, exist_ok=True)
+    for name, table in aggregates.tables().items():
+        table.to_parquet(args.out / f'{name}.parquet', index=False)
+        print(f"{name}: {len(table):,} rows")
+
+
+if __name__ == '__main__':
+    main()
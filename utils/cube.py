@@ -0,0 +1,174 @@
+import streamlit as st
+import pandas as pd
+import numpy as np
+
+from utils import shared_data
+from utils.data import VEHICLE_WEAPON, get_raw_data, is_shared
+
+# Cube dimension -> label
+DIMENSIONS = {
+    'weapon': 'Weapon Type',
+    'target': 'Target Type',
+    'attack': 'Attack Type',
+    'region': 'Region',
+    'success': 'Success',
+    'suicide': 'Suicide Attack',
+    'decade': 'Decade',
+    'year': 'Year',
+    'month': 'Month',
+}
+
+# Time hierarchy, coarsest first: drill-down goes right, roll-up goes left
+TIME_LEVELS = ['decade', 'year', 'month']
+
+MEASURES = {
+    'incidents': 'Incidents',
+    'fatalities': 'Deaths',
+    'injuries': 'Injuries',
+}
+
+
+class Cube:
+    """
+    Aggregate cube of incidents, deaths and injuries.
+
+    The base cuboid holds one cell per distinct combination of all dimensions.
+    Any roll-up (group by a subset of dimensions, optionally diced by
+    dimension values) is answered from the smallest cuboid already
+    materialised that covers the requested dimensions, using integer codes
+    combined into a single key and np.bincount, never from the raw rows.
+    Cuboids computed without a dice are kept for later queries.
+    """
+
+    def __init__(self, df):
+        self.labels = {}
+        codes = {}
+        for dim in DIMENSIONS:
+            codes[dim], self.labels[dim] = pd.factorize(df[dim], sort=True)
+            self.labels[dim] = list(self.labels[dim])
+        measures = {
+            'incidents': np.ones(len(df)),
+            'fatalities': df['fatalities'].to_numpy(dtype=float),
+            'injuries': df['injuries'].to_numpy(dtype=float),
+        }
+        self.cuboids = {}
+        base = self._group(list(DIMENSIONS), codes, measures, np.ones(len(df), dtype=bool))
+        self.cuboids[frozenset(DIMENSIONS)] = base
+
+    def to_arrays(self):
+        """The base cuboid as arrays, plus the dimension labels"""
+        base = self.cuboids[frozenset(DIMENSIONS)]
+        arrays = {f'code_{dim}': codes for dim, codes in base['codes'].items()}
+        arrays.update({f'measure_{measure}': values for measure, values in base['measures'].items()})
+        return arrays, {'labels': self.labels, 'size': base['size']}
+
+    @classmethod
+    def from_arrays(cls, arrays, meta):
+        """Wrap a published (memory-mapped) base cuboid without copying it"""
+        cube = cls.__new__(cls)
+        cube.labels = meta['labels']
+        base = {
+            'codes': {dim: arrays[f'code_{dim}'] for dim in DIMENSIONS},
+            'measures': {measure: arrays[f'measure_{measure}'] for measure in MEASURES},
+            'size': meta['size'],
+        }
+        cube.cuboids = {frozenset(DIMENSIONS): base}
+        return cube
+
+    def _group(self, dims, codes, measures, keep):
+        """Group the kept cells of a cuboid by dims (mixed-radix key + bincount)"""
+        key = np.zeros(int(keep.sum()), dtype=np.int64)
+        for dim in dims:
+            key = key * len(self.labels[dim]) + codes[dim][keep]
+        cells, inverse = np.unique(key, return_inverse=True)
+
+        grouped_codes = {}
+        remainder = cells
+        for dim in reversed(dims):
+            remainder, grouped_codes[dim] = np.divmod(remainder, len(self.labels[dim]))
+        grouped_measures = {
+            measure: np.bincount(inverse, weights=values[keep], minlength=len(cells))
+            for measure, values in measures.items()
+        }
+        return {'codes': grouped_codes, 'measures': grouped_measures, 'size': len(cells)}
+
+    def source_for(self, dims):
+        """The smallest materialised cuboid containing all the given dimensions"""
+        needed = frozenset(dims)
+        # A snapshot: other sessions share this cube and may publish cuboids meanwhile
+        cuboids = list(self.cuboids.items())
+        return min(
+            ((cuboid_dims, cuboid) for cuboid_dims, cuboid in cuboids if needed <= cuboid_dims),
+            key=lambda item: item[1]['size']
+        )
+
+    def aggregate(self, dims, dice=None):
+        """
+        Roll the cube up to the given dimensions, keeping only cells whose
+        values are in `dice` ({dimension: allowed values}). Returns a
+        DataFrame with one row per non-empty cell.
+        """
+        dims = list(dims)
+        dice = {dim: values for dim, values in (dice or {}).items() if values is not None}
+        source_dims, source = self.source_for(set(dims) | set(dice))
+
+        keep = np.ones(source['size'], dtype=bool)
+        for dim, values in dice.items():
+            allowed = [self.labels[dim].index(value) for value in values if value in self.labels[dim]]
+            keep &= np.isin(source['codes'][dim], allowed)
+
+        result = self._group(dims, source['codes'], source['measures'], keep)
+        if not dice:
+            # Published complete, in one step; a concurrent duplicate keeps the first one
+            self.cuboids.setdefault(frozenset(dims), result)
+
+        frame = pd.DataFrame({
+            dim: np.asarray(self.labels[dim], dtype=object)[result['codes'][dim]] if len(self.labels[dim]) else []
+            for dim in dims
+        })
+        for measure, values in result['measures'].items():
+            frame[measure] = values.astype(int)
+        frame.attrs['source'] = sorted(source_dims)
+        frame.attrs['source_cells'] = source['size']
+        return frame
+
+
+def drill_down(level):
+    """The next finer time level (or the same one at the finest level)"""
+    return TIME_LEVELS[min(TIME_LEVELS.index(level) + 1, len(TIME_LEVELS) - 1)]
+
+
+def roll_up(level):
+    """The next coarser time level (or the same one at the coarsest level)"""
+    return TIME_LEVELS[max(TIME_LEVELS.index(level) - 1, 0)]
+
+
+@st.cache_resource
+def get_cube(version):
+    """
+    Build the base cuboid once per dataset version (attach the published
+    one in multi-worker mode).
+    """
+    if is_shared():
+        return Cube.from_arrays(*shared_data.attach_arrays(version, 'cube'))
+    return build_cube(get_raw_data(version))
+
+
+def build_cube(df):
+    """
+    Build the base cuboid of the raw data.
+    """
+    data = pd.DataFrame({
+        'weapon': df['weaptype1_txt'].replace(VEHICLE_WEAPON, 'Vehicle').fillna('Unknown'),
+        'target': df['targtype1_txt'].fillna('Unknown'),
+        'attack': df['attacktype1_txt'].fillna('Unknown'),
+        'region': df['provstate'].fillna('Unknown'),
+        'success': df['success'].map({1: 'Successful', 0: 'Failed'}).fillna('Unknown'),
+        'suicide': df['suicide'].map({1: 'Suicide', 0: 'Not Suicide'}).fillna('Unknown'),
+        'decade': (df['iyear'] // 10 * 10).astype(str) + 's',
+        'year': df['iyear'],
+        'month': df['iyear'].astype(str) + '-' + df['imonth'].astype(str).str.zfill(2),
+        'fatalities': df['nkill'].clip(lower=0).fillna(0),
+        'injuries': df['nwound'].clip(lower=0).fillna(0),
+    })
+    return Cube(data)
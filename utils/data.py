@@ -0,0 +1,71 @@
+import streamlit as st
+import pandas as pd
+from pathlib import Path
+
+from utils import shared_data
+
+DATA_FILENAME = Path(__file__).parent.parent / 'data/IL_data.csv'
+
+VEHICLE_WEAPON = 'Vehicle (not to include vehicle-borne explosives, i.e., car or truck bombs)'
+
+
+def dataset_version():
+    """
+    Identify the current version of the data file, used as a cache key so
+    indexes and aggregates are rebuilt when the CSV is replaced. In
+    multi-worker mode this is the published version pinned for the session.
+    """
+    directory = shared_data.shared_dir()
+    if directory is not None:
+        return shared_data.pinned_version(directory)
+    stat = DATA_FILENAME.stat()
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+
+def replace_value(values, old, new):
+    """
+    Series.replace of a single value. Also works on the categorical text
+    columns of the shared dataset, which take no values outside their
+    categories.
+    """
+    if not isinstance(values.dtype, pd.CategoricalDtype):
+        return values.replace(old, new)
+    if old not in values.cat.categories:
+        return values
+    if new not in values.cat.categories:
+        values = values.cat.add_categories([new])
+    return values.where(values != old, new).cat.remove_categories([old])
+
+
+def is_shared():
+    """Whether the data comes from a published, memory-mapped dataset"""
+    return shared_data.shared_dir() is not None
+
+
+def get_raw_data(version):
+    """
+    All columns of the Terror Attacks data. Row positions match the index
+    of every page's own loader.
+    """
+    if is_shared():
+        return _attach_raw_data(version)
+    return _read_raw_data(version)
+
+
+@st.cache_data
+def _read_raw_data(version):
+    """
+    Read all columns of the Terror Attacks data from the CSV file.
+    """
+    return pd.read_csv(DATA_FILENAME, encoding='ISO-8859-1', low_memory=False)
+
+
+@st.cache_resource(max_entries=1)
+def _attach_raw_data(version):
+    """
+    Map the published dataset once per version. Not cache_data: that would
+    hand every caller its own unpickled copy instead of the shared pages.
+    Only the latest version stays mapped; a session still pinned to the
+    previous one maps it again (cheap) until its next rerun.
+    """
+    return shared_data.attach_frame(version)
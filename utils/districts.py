@@ -0,0 +1,416 @@
+"""
+District (provstate) outlines and aggregates for the task1 choropleth.
+
+The GTD has no geometry, so the outlines bundled in data/districts.json are
+derived from the located events: every cell of a ~1 km grid goes to the
+district of its nearest event location (within MAX_DISTANCE_KM), and the
+boundary of each district is traced into polygons and simplified at several
+tolerances. The map switches between them by zoom level.
+
+Regenerate the bundle after replacing the CSV (from the repository root):
+    python -m utils.districts
+"""
+import json
+from pathlib import Path
+
+import streamlit as st
+import numpy as np
+import pandas as pd
+from branca.element import MacroElement, Template
+
+from utils.kde import GRID_BOUNDS
+
+DISTRICTS_FILENAME = Path(__file__).parent.parent / 'data/districts.json'
+
+# Approximate end-2017 populations in thousands (Israel CBS; PCBS 2017 census
+# for the West Bank and Gaza, plus Israeli residents of the West Bank)
+POPULATION_THOUSANDS = {
+    'Jerusalem': 1134,
+    'Northern': 1399,
+    'Haifa': 996,
+    'Central': 2116,
+    'Tel Aviv': 1388,
+    'Southern': 1244,
+    'West Bank': 3295,
+    'Gaza Strip': 1899,
+    'Golan Heights': 49,
+}
+DISTRICTS = list(POPULATION_THOUSANDS)
+
+# Grid cell (degrees) and how far from the nearest event a cell still belongs to a district
+CELL_DEGREES = 0.01
+MAX_DISTANCE_KM = 13
+# Event locations vote with their nearest neighbours (by events), so stray mislocated events do not make islands
+VOTE_NEIGHBOURS = 7
+# Smaller pieces of a district (in cells) are dropped
+MIN_CELLS = 15
+
+# (simplification tolerance in degrees, lowest zoom level it is shown at), coarsest first
+LEVELS = [(0.03, 0), (0.01, 9), (0.002, 11)]
+
+METRICS = {
+    'events': 'Events',
+    'nkill': 'Deaths',
+    'nwound': 'Injuries',
+}
+
+
+# -----------------------------------------------------------------------------
+# Building the outlines
+
+
+def district_grid(lat, lon, districts):
+    """
+    District code of every grid cell (-1 outside all districts); row 0 is the
+    southern edge. `districts` holds the district code of each event.
+    """
+    from scipy import ndimage
+    from scipy.spatial import cKDTree
+
+    south, west, north, east = GRID_BOUNDS
+    scale = np.array([111.2, 111.2 * np.cos(np.radians((south + north) / 2))])
+
+    # Majority district of the events at every location and its nearest locations
+    coordinates, location_codes = np.unique(np.column_stack([lat, lon]), axis=0, return_inverse=True)
+    location_codes = location_codes.ravel()
+    votes = np.zeros((len(coordinates), len(DISTRICTS)))
+    np.add.at(votes, (location_codes, districts), 1)
+    tree = cKDTree(coordinates * scale)
+    _, neighbours = tree.query(coordinates * scale, k=min(VOTE_NEIGHBOURS, len(coordinates)))
+    location_districts = votes[neighbours].sum(axis=1).argmax(axis=1)
+
+    rows = int(round((north - south) / CELL_DEGREES))
+    cols = int(round((east - west) / CELL_DEGREES))
+    centers = np.stack(np.meshgrid(
+        south + (np.arange(rows) + 0.5) * CELL_DEGREES, west + (np.arange(cols) + 0.5) * CELL_DEGREES, indexing='ij'
+    ), axis=-1).reshape(-1, 2)
+    distances, nearest = tree.query(centers * scale, distance_upper_bound=MAX_DISTANCE_KM)
+    grid = np.where(np.isfinite(distances), location_districts[np.minimum(nearest, len(coordinates) - 1)], -1)
+    grid = grid.reshape(rows, cols)
+
+    # Drop small pieces, then give enclosed gaps to the one district around them
+    for code in range(len(DISTRICTS)):
+        pieces, n_pieces = ndimage.label(grid == code)
+        sizes = np.bincount(pieces.ravel(), minlength=n_pieces + 1)
+        grid[(sizes < MIN_CELLS)[pieces] & (pieces > 0)] = -1
+    gaps, n_gaps = ndimage.label(grid == -1)
+    border = np.unique(np.concatenate([gaps[0], gaps[-1], gaps[:, 0], gaps[:, -1]]))
+    for gap in np.setdiff1d(np.arange(1, n_gaps + 1), border):
+        mask = gaps == gap
+        around = np.unique(grid[ndimage.binary_dilation(mask) & ~mask])
+        if len(around) == 1:
+            grid[mask] = around[0]
+    return grid
+
+
+# Unit steps of the boundary edges: right, up, left, down
+_STEPS = np.array([[1, 0], [0, 1], [-1, 0], [0, -1]])
+
+
+def trace_rings(mask):
+    """
+    Boundary rings of a boolean grid as (x, y) vertex arrays in cell units,
+    with the inside on the left: outer rings counter-clockwise, holes
+    clockwise. Cells touching only at a corner get separate rings.
+    """
+    padded = np.pad(mask, 1)
+    inside = padded[1:-1, 1:-1]
+    edges = []
+    # (neighbour outside, start corner offset, step) of each side of a cell, going counter-clockwise
+    for outside, (dx, dy), step in (
+        (~padded[:-2, 1:-1], (0, 0), 0),   # bottom, going right
+        (~padded[1:-1, 2:], (1, 0), 1),    # right, going up
+        (~padded[2:, 1:-1], (1, 1), 2),    # top, going left
+        (~padded[1:-1, :-2], (0, 1), 3),   # left, going down
+    ):
+        rows, cols = np.nonzero(inside & outside)
+        edges += [((col + dx, row + dy), step) for row, col in zip(rows.tolist(), cols.tolist())]
+
+    outgoing = {}
+    for start, step in edges:
+        outgoing.setdefault(start, []).append(step)
+
+    rings = []
+    while outgoing:
+        start = next(iter(outgoing))
+        vertex, step = start, None
+        ring = []
+        while True:
+            steps = outgoing.get(vertex)
+            if not steps:
+                break
+            # Prefer a left turn (hugging the current cell), then straight on: keeps corner-touching cells apart
+            if step is None:
+                choice = steps[0]
+            else:
+                choice = min(steps, key=lambda candidate: {1: 0, 0: 1, 3: 2}.get((candidate - step) % 4, 3))
+            steps.remove(choice)
+            if not steps:
+                del outgoing[vertex]
+            ring.append(vertex)
+            vertex = (vertex[0] + _STEPS[choice][0], vertex[1] + _STEPS[choice][1])
+            step = choice
+            if vertex == start and start not in outgoing:
+                break
+        rings.append(np.array(ring, dtype=float))
+    return rings
+
+
+def _signed_area(ring):
+    x, y = ring[:, 0], ring[:, 1]
+    return (np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1))) / 2
+
+
+def _contains(ring, point):
+    """Ray-casting point-in-polygon test"""
+    x, y = ring[:, 0], ring[:, 1]
+    next_x, next_y = np.roll(x, -1), np.roll(y, -1)
+    crosses = (y > point[1]) != (next_y > point[1])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        at = x + (point[1] - y) * (next_x - x) / (next_y - y)
+    return np.count_nonzero(crosses & (point[0] < at)) % 2 == 1
+
+
+def simplify(ring, tolerance):
+    """Douglas-Peucker simplification of a closed ring (None if it collapses)"""
+    if tolerance <= 0 or len(ring) < 4:
+        return ring
+    # Split the ring at the vertex farthest from the first one
+    far = int(np.argmax(((ring - ring[0]) ** 2).sum(axis=1)))
+    points = np.vstack([ring, ring[:1]])
+    keep = np.zeros(len(points), dtype=bool)
+    keep[[0, far, len(points) - 1]] = True
+    stack = [(0, far), (far, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        segment = points[last] - points[first]
+        offsets = points[first + 1:last] - points[first]
+        length = np.hypot(*segment)
+        if length > 0:
+            distances = np.abs(segment[0] * offsets[:, 1] - segment[1] * offsets[:, 0]) / length
+        else:
+            distances = np.hypot(offsets[:, 0], offsets[:, 1])
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            middle = first + 1 + farthest
+            keep[middle] = True
+            stack += [(first, middle), (middle, last)]
+    simplified = points[keep][:-1]
+    return simplified if len(simplified) >= 3 and abs(_signed_area(simplified)) > 0 else None
+
+
+def _polygons(rings):
+    """Group rings into [outer, *holes] polygons (each hole goes to the smallest outer ring around it)"""
+    outers = [ring for ring in rings if _signed_area(ring) > 0]
+    polygons = [[ring] for ring in outers]
+    for hole in (ring for ring in rings if _signed_area(ring) < 0):
+        around = [index for index, outer in enumerate(outers) if _contains(outer, hole.mean(axis=0))]
+        if around:
+            polygons[min(around, key=lambda index: _signed_area(outers[index]))].append(hole)
+    return polygons
+
+
+def _to_geojson_ring(ring):
+    south, west, _, _ = GRID_BOUNDS
+    coordinates = np.column_stack([west + ring[:, 0] * CELL_DEGREES, south + ring[:, 1] * CELL_DEGREES]).round(4)
+    return np.vstack([coordinates, coordinates[:1]]).tolist()
+
+
+def build_outlines(df):
+    """The outlines of every district as one GeoJSON FeatureCollection per level of LEVELS"""
+    located = df[df['latitude'].notna() & df['longitude'].notna() & df['provstate'].isin(DISTRICTS)]
+    grid = district_grid(
+        located['latitude'].to_numpy(), located['longitude'].to_numpy(),
+        pd.Categorical(located['provstate'], categories=DISTRICTS).codes
+    )
+    rings = {district: trace_rings(grid == code) for code, district in enumerate(DISTRICTS)}
+
+    levels = []
+    for tolerance, _ in LEVELS:
+        features = []
+        for district, district_rings in rings.items():
+            simplified = [ring for ring in (simplify(ring, tolerance / CELL_DEGREES) for ring in district_rings)
+                          if ring is not None]
+            polygons = _polygons(simplified)
+            if polygons:
+                features.append({
+                    'type': 'Feature',
+                    'properties': {'district': district},
+                    'geometry': {
+                        'type': 'MultiPolygon',
+                        'coordinates': [[_to_geojson_ring(ring) for ring in polygon] for polygon in polygons]
+                    }
+                })
+        levels.append({'type': 'FeatureCollection', 'features': features})
+    return levels
+
+
+def write_outlines(path=DISTRICTS_FILENAME):
+    """Build the outlines from the CSV and bundle them"""
+    from utils.data import DATA_FILENAME
+
+    df = pd.read_csv(DATA_FILENAME, encoding='ISO-8859-1', low_memory=False)
+    levels = build_outlines(df)
+    path.write_text(json.dumps({
+        'levels': [{'tolerance': tolerance, 'min_zoom': min_zoom, 'outlines': outlines}
+                   for (tolerance, min_zoom), outlines in zip(LEVELS, levels)]
+    }, separators=(',', ':')))
+    return path
+
+
+# -----------------------------------------------------------------------------
+# Serving
+
+
+@st.cache_data
+def load_outlines():
+    """The bundled outlines of every simplification level"""
+    return json.loads(DISTRICTS_FILENAME.read_text())['levels']
+
+
+@st.cache_data
+def district_aggregates(data):
+    """
+    Events, deaths and injuries per district, for every year and for all
+    years together, as {metric: {year: [value per district]}}. The map
+    recolours from these without rerunning the page.
+    """
+    data = data[data['provstate'].isin(DISTRICTS)]
+    district_codes = pd.Categorical(data['provstate'], categories=DISTRICTS).codes
+    years = sorted(data['iyear'].unique().tolist())
+    year_codes = np.searchsorted(years, data['iyear'].to_numpy())
+    cells = year_codes * len(DISTRICTS) + district_codes
+
+    aggregates = {}
+    for metric in METRICS:
+        weights = None if metric == 'events' else data[metric].fillna(0).clip(lower=0).to_numpy()
+        per_year = np.bincount(cells, weights=weights, minlength=len(years) * len(DISTRICTS))
+        per_year = per_year.reshape(len(years), len(DISTRICTS))
+        aggregates[metric] = {'All': per_year.sum(axis=0).tolist(), **{
+            str(year): values.tolist() for year, values in zip(years, per_year)
+        }}
+    return {'years': [str(year) for year in years], 'values': aggregates}
+
+
+class DistrictChoropleth(MacroElement):
+    """
+    Choropleth of the districts with its own metric / year / per-capita
+    controls and legend. All levels of the outlines and all aggregates are
+    sent once; changing a control only restyles the existing shapes, and
+    zooming swaps in the outline level of that zoom.
+    """
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function() {
+            var map = {{ this._parent.get_name() }};
+            var payload = {{ this.payload }};
+            var colors = ['#ffffb2', '#fed976', '#feb24c', '#fd8d3c', '#fc4e2a', '#e31a1c', '#b10026'];
+            var state = {metric: 'events', year: 'All', perCapita: false};
+
+            function value(district) {
+                var index = payload.districts.indexOf(district);
+                var values = payload.aggregates.values[state.metric][state.year];
+                var v = values ? values[index] : 0;
+                return state.perCapita ? v / payload.population[index] : v;
+            }
+            function maximum() {
+                return Math.max.apply(null, payload.districts.map(value)) || 1;
+            }
+            function color(v, top) {
+                return v > 0 ? colors[Math.min(colors.length - 1, Math.floor(v / top * colors.length))] : '#f7f7f7';
+            }
+            function format(v) {
+                return state.perCapita ? v.toFixed(2) : Math.round(v).toLocaleString();
+            }
+            function unit() {
+                return payload.metrics[state.metric] + (state.perCapita ? ' per 100,000 residents' : '');
+            }
+
+            var layers = payload.levels.map(function(level) {
+                return L.geoJSON(level.outlines, {
+                    style: {weight: 1, color: '#555', fillOpacity: 0.7},
+                    onEachFeature: function(feature, layer) {
+                        layer.bindTooltip(function() {
+                            var district = feature.properties.district;
+                            return '<b>' + district + '</b><br>' + unit() + ': ' + format(value(district));
+                        }, {sticky: true});
+                    }
+                });
+            });
+            var legend = L.control({position: 'bottomright'});
+            legend.onAdd = function() {
+                this._div = L.DomUtil.create('div', 'info legend');
+                this._div.style.cssText = 'background: white; padding: 6px 8px; border-radius: 4px; font-size: 12px;';
+                return this._div;
+            };
+            legend.addTo(map);
+
+            function restyle() {
+                var top = maximum();
+                layers.forEach(function(layer) {
+                    layer.setStyle(function(feature) {
+                        return {fillColor: color(value(feature.properties.district), top)};
+                    });
+                });
+                var rows = colors.map(function(c, i) {
+                    return '<i style="background:' + c + '; width: 14px; height: 10px; display: inline-block;"></i> '
+                        + format(top * i / colors.length) + ' - ' + format(top * (i + 1) / colors.length);
+                });
+                legend._div.innerHTML = '<b>' + unit() + '</b><br>' + rows.join('<br>');
+            }
+            function pickLevel() {
+                var zoom = map.getZoom();
+                var chosen = 0;
+                payload.levels.forEach(function(level, i) { if (zoom >= level.min_zoom) { chosen = i; } });
+                layers.forEach(function(layer, i) {
+                    if (i === chosen && !map.hasLayer(layer)) { layer.addTo(map); layer.bringToBack(); }
+                    if (i !== chosen && map.hasLayer(layer)) { map.removeLayer(layer); }
+                });
+            }
+
+            var controls = L.control({position: 'topright'});
+            controls.onAdd = function() {
+                var div = L.DomUtil.create('div');
+                div.style.cssText = 'background: white; padding: 6px 8px; border-radius: 4px; font-size: 13px;';
+                var metricOptions = Object.keys(payload.metrics).map(function(key) {
+                    return '<option value="' + key + '">' + payload.metrics[key] + '</option>';
+                }).join('');
+                var yearOptions = ['All'].concat(payload.aggregates.years).map(function(year) {
+                    return '<option value="' + year + '">' + (year === 'All' ? 'All years' : year) + '</option>';
+                }).join('');
+                div.innerHTML = '<select class="metric">' + metricOptions + '</select> '
+                    + '<select class="year">' + yearOptions + '</select><br>'
+                    + '<label><input type="checkbox" class="per-capita"> Per 100,000 residents</label>';
+                L.DomEvent.disableClickPropagation(div);
+                div.querySelector('.metric').onchange = function(e) { state.metric = e.target.value; restyle(); };
+                div.querySelector('.year').onchange = function(e) { state.year = e.target.value; restyle(); };
+                div.querySelector('.per-capita').onchange = function(e) { state.perCapita = e.target.checked; restyle(); };
+                return div;
+            };
+            controls.addTo(map);
+
+            map.on('zoomend', pickLevel);
+            pickLevel();
+            restyle();
+        })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, levels, aggregates):
+        super().__init__()
+        self._name = 'DistrictChoropleth'
+        self.payload = json.dumps({
+            'levels': levels,
+            'aggregates': aggregates,
+            'districts': DISTRICTS,
+            # In units of 100,000 residents
+            'population': [POPULATION_THOUSANDS[district] / 100 for district in DISTRICTS],
+            'metrics': METRICS,
+        }, separators=(',', ':'))
+
+
+if __name__ == '__main__':
+    print(f"Wrote {write_outlines()}")
@@ -0,0 +1,115 @@
+import io
+
+import streamlit as st
+
+# Rows encoded per chunk (and per Parquet row group)
+CHUNK_ROWS = 20_000
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only stream that hands out what was written since the last drain"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+class _ChunkReader(io.RawIOBase):
+    """Read-only stream over a generator of encoded chunks, pulled as it is read"""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.pending = b''
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        # Streamlit rewinds the stream before reading it; only that no-op is supported
+        if (offset, whence) not in ((0, io.SEEK_SET), (0, io.SEEK_CUR)) or (whence == io.SEEK_SET and self.position):
+            raise io.UnsupportedOperation("seek")
+        return self.position
+
+    def readinto(self, buffer):
+        while not self.pending:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                return 0
+            # A view, so handing out a chunk piece by piece does not copy its rest
+            self.pending = memoryview(chunk)
+        size = min(len(buffer), len(self.pending))
+        buffer[:size] = self.pending[:size]
+        self.pending = self.pending[size:]
+        self.position += size
+        return size
+
+
+def iter_csv(data, chunk_rows=CHUNK_ROWS):
+    """The frame as CSV, yielded as encoded chunks (header first)"""
+    yield data.iloc[:0].to_csv(index=False).encode()
+    for start in range(0, len(data), chunk_rows):
+        yield data.iloc[start:start + chunk_rows].to_csv(index=False, header=False).encode()
+
+
+def iter_parquet(data, chunk_rows=CHUNK_ROWS):
+    """The frame as Parquet, yielded as one chunk per row group (footer last)"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink = _ChunkSink()
+    schema = pa.Schema.from_pandas(data, preserve_index=False)
+    with pq.ParquetWriter(sink, schema) as writer:
+        for start in range(0, len(data), chunk_rows):
+            chunk = pa.Table.from_pandas(data.iloc[start:start + chunk_rows], schema=schema, preserve_index=False)
+            writer.write_table(chunk)
+            yield sink.drain()
+    yield sink.drain()
+
+
+def export_buttons(data, file_stem, container=st.sidebar):
+    """
+    CSV and Parquet download buttons for a frame. The file is only encoded
+    when a button is clicked, chunk by chunk and off the script thread, and
+    clicking does not rerun the page. Chunks are encoded as Streamlit reads
+    the stream, but Streamlit keeps the finished file in its media storage
+    until the download is served.
+    """
+    csv_col, parquet_col = container.columns(2)
+    csv_col.download_button(
+        "⬇ CSV",
+        data=lambda: _ChunkReader(iter_csv(data)),
+        file_name=f"{file_stem}.csv",
+        mime="text/csv",
+        on_click="ignore",
+        key=f"export_csv_{file_stem}",
+        use_container_width=True
+    )
+    parquet_col.download_button(
+        "⬇ Parquet",
+        data=lambda: _ChunkReader(iter_parquet(data)),
+        file_name=f"{file_stem}.parquet",
+        mime="application/vnd.apache.parquet",
+        on_click="ignore",
+        key=f"export_parquet_{file_stem}",
+        use_container_width=True
+    )
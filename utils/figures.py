@@ -0,0 +1,149 @@
+import base64
+
+import streamlit as st
+import numpy as np
+import plotly.graph_objects as go
+import plotly.io as pio
+
+# Typed-array dtypes understood by plotly.js, smallest first
+INTEGER_DTYPES = [np.int8, np.uint8, np.int16, np.uint16, np.int32, np.uint32]
+
+# Arrays shorter than this are smaller as plain JSON lists than as base64
+MIN_TYPED_LENGTH = 8
+
+# Frame trace properties kept even when they never change
+FRAME_KEEP = {'type', 'ids'}
+
+
+def _is_typed(value):
+    """Typed-array spec ({dtype, bdata, shape}) as produced by plotly"""
+    return isinstance(value, dict) and 'bdata' in value
+
+
+def _decode(spec):
+    array = np.frombuffer(base64.b64decode(spec['bdata']), dtype=spec.get('dtype', 'f8'))
+    if 'shape' in spec:
+        array = array.reshape([int(size) for size in str(spec['shape']).split(',')])
+    return array
+
+
+def typed_array(values):
+    """
+    Numeric data as the smallest lossless typed array (plotly serialises
+    numpy arrays as base64 binary). Non-numeric data, including object
+    arrays of numeric-looking labels ('2001', '007'), is returned unchanged
+    and short arrays as lists.
+    """
+    array = np.asarray(values)
+    if array.dtype.kind not in 'iuf' or array.size == 0:
+        return values
+    if array.size < MIN_TYPED_LENGTH:
+        return array.tolist()
+
+    finite = array[np.isfinite(array)] if array.dtype.kind == 'f' else array
+    if finite.size == array.size and np.all(np.mod(finite, 1) == 0):
+        low, high = finite.min(), finite.max()
+        for dtype in INTEGER_DTYPES:
+            if np.iinfo(dtype).min <= low and high <= np.iinfo(dtype).max:
+                return array.astype(dtype)
+    single = array.astype(np.float32)
+    if np.array_equal(single.astype(array.dtype), array, equal_nan=True):
+        return single
+    return array.astype(np.float64)
+
+
+def _encode_trace(trace):
+    """Replace every numeric array of a trace (nested dicts included) by a typed array"""
+    encoded = {}
+    for key, value in trace.items():
+        if _is_typed(value):
+            encoded[key] = typed_array(_decode(value))
+        elif isinstance(value, dict):
+            encoded[key] = _encode_trace(value)
+        elif isinstance(value, (list, tuple, np.ndarray)) and not any(isinstance(item, dict) for item in value):
+            encoded[key] = typed_array(value)
+        else:
+            encoded[key] = value
+    return encoded
+
+
+def _flatten(trace, prefix=()):
+    for key, value in trace.items():
+        if isinstance(value, dict) and not _is_typed(value):
+            yield from _flatten(value, prefix + (key,))
+        else:
+            yield prefix + (key,), value
+
+
+def _same(first, second):
+    if isinstance(first, np.ndarray) or isinstance(second, np.ndarray):
+        return np.array_equal(np.asarray(first, dtype=object), np.asarray(second, dtype=object))
+    return first == second
+
+
+def _drop(trace, paths, prefix=()):
+    kept = {}
+    for key, value in trace.items():
+        path = prefix + (key,)
+        if isinstance(value, dict) and not _is_typed(value):
+            value = _drop(value, paths, path)
+            if value:
+                kept[key] = value
+        elif path not in paths:
+            kept[key] = value
+    return kept
+
+
+def dedupe_frames(figure):
+    """
+    Drop from the animation frames every trace property that has the same
+    value in the figure and in all frames. plotly.js merges frame data into
+    the current traces, so only the changing properties need to travel.
+    """
+    data, frames = figure['data'], figure.get('frames', [])
+    constant = []
+    for index, trace in enumerate(data):
+        values = dict(_flatten(trace))
+        for frame in frames:
+            for frame_index, frame_trace in zip(frame.get('traces', range(len(frame['data']))), frame['data']):
+                if frame_index != index:
+                    continue
+                frame_values = dict(_flatten(frame_trace))
+                values = {
+                    path: value for path, value in values.items()
+                    if path in frame_values and _same(value, frame_values[path])
+                }
+        constant.append({path for path in values if path[-1] not in FRAME_KEEP})
+
+    for frame in frames:
+        frame['data'] = [
+            _drop(frame_trace, constant[frame_index]) if frame_index < len(constant) else frame_trace
+            for frame_index, frame_trace in zip(frame.get('traces', range(len(frame['data']))), frame['data'])
+        ]
+    return figure
+
+
+def compact_figure(fig):
+    """
+    A copy of the figure with typed-array numeric data and deduplicated
+    animation frames.
+    """
+    figure = fig.to_plotly_json()
+    figure['data'] = [_encode_trace(trace) for trace in figure['data']]
+    for frame in figure.get('frames', []):
+        frame['data'] = [_encode_trace(trace) for trace in frame.get('data', [])]
+    return go.Figure(dedupe_frames(figure))
+
+
+def payload_bytes(fig):
+    """Size of the figure as serialised for the browser"""
+    return len(pio.to_json(fig, validate=False).encode())
+
+
+def plotly_chart(fig, **kwargs):
+    """
+    st.plotly_chart with a compact figure payload, reporting its size.
+    """
+    figure = compact_figure(fig)
+    st.plotly_chart(figure, **kwargs)
+    st.caption(f"Figure payload: {payload_bytes(figure) / 1024:,.1f} KB")
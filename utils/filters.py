@@ -0,0 +1,235 @@
+import streamlit as st
+import pandas as pd
+import numpy as np
+
+from utils import shared_data
+from utils.data import VEHICLE_WEAPON, dataset_version, get_raw_data, is_shared
+
+# Filter dimension -> (CSV column, label)
+FILTER_COLUMNS = {
+    'year': ('iyear', 'Year'),
+    'weapon': ('weaptype1_txt', 'Weapon Type'),
+    'city': ('city', 'City'),
+    'target': ('targtype1_txt', 'Target Type'),
+    'attack': ('attacktype1_txt', 'Attack Type'),
+}
+
+SESSION_KEY = 'shared_filters'
+
+
+# Dimensions with more values than this keep row-id lists instead of dense bitmaps
+DENSE_MAX_VALUES = 64
+
+
+def _set_bits(bitmap, rows):
+    """Set the bits of the given row positions in a packed bitmap (in place)"""
+    np.bitwise_or.at(bitmap, rows >> 3, (0x80 >> (rows & 7)).astype(np.uint8))
+    return bitmap
+
+
+class BitmapIndex:
+    """
+    Precomputed bitmaps (one bit per row, packed 8 rows per byte) for every
+    value of the low-cardinality filter dimensions, and sorted row-id lists
+    for the high-cardinality ones (e.g. city), where dense bitmaps would cost
+    values x rows bits. Selections are answered by OR-ing the bitmaps of the
+    selected values and AND-ing across dimensions.
+    """
+
+    def __init__(self, df):
+        self.n_rows = len(df)
+        self.all_rows = np.packbits(np.ones(self.n_rows, dtype=bool))
+        self.bitmaps = {}
+        self.row_lists = {}
+        for dim, (column, _) in FILTER_COLUMNS.items():
+            codes, uniques = pd.factorize(df[column], sort=True)
+            values = uniques.tolist()
+            if len(values) > DENSE_MAX_VALUES:
+                # Row ids grouped by value: value i owns rows[bounds[i]:bounds[i + 1]]
+                kept = np.flatnonzero(codes >= 0)
+                rows = kept[np.argsort(codes[kept], kind='stable')].astype(np.int32)
+                bounds = np.searchsorted(codes[rows], np.arange(len(values) + 1))
+                self.row_lists[dim] = (values, rows, bounds)
+            else:
+                rows = np.flatnonzero(codes >= 0)
+                bitmaps = np.zeros((len(values), len(self.all_rows)), dtype=np.uint8)
+                np.bitwise_or.at(bitmaps, (codes[rows], rows >> 3), (0x80 >> (rows & 7)).astype(np.uint8))
+                self.bitmaps[dim] = dict(zip(values, bitmaps))
+
+    def to_arrays(self):
+        """The bitmaps as one (values x bytes) array per dense dimension, the row lists, plus the values"""
+        arrays = {
+            dim: np.stack(list(bitmaps.values())) if bitmaps else np.zeros((0, len(self.all_rows)), dtype=np.uint8)
+            for dim, bitmaps in self.bitmaps.items()
+        }
+        for dim, (_, rows, bounds) in self.row_lists.items():
+            arrays[f'{dim}_rows'] = rows
+            arrays[f'{dim}_bounds'] = bounds
+        meta = {
+            'n_rows': self.n_rows,
+            'values': {dim: list(bitmaps) for dim, bitmaps in self.bitmaps.items()},
+            'row_lists': {dim: values for dim, (values, _, _) in self.row_lists.items()},
+        }
+        return arrays, meta
+
+    @classmethod
+    def from_arrays(cls, arrays, meta):
+        """Wrap published (memory-mapped) bitmap and row-list arrays without copying them"""
+        index = cls.__new__(cls)
+        index.n_rows = meta['n_rows']
+        index.all_rows = np.packbits(np.ones(index.n_rows, dtype=bool))
+        index.bitmaps = {dim: dict(zip(values, arrays[dim])) for dim, values in meta['values'].items()}
+        index.row_lists = {
+            dim: (values, arrays[f'{dim}_rows'], arrays[f'{dim}_bounds'])
+            for dim, values in meta.get('row_lists', {}).items()
+        }
+        return index
+
+    def values(self, dim):
+        if dim in self.row_lists:
+            return list(self.row_lists[dim][0])
+        return list(self.bitmaps[dim])
+
+    def select(self, dim, values):
+        """OR the bitmaps of the given values; an empty selection keeps every row"""
+        if not values:
+            return self.all_rows
+        if dim in self.row_lists:
+            all_values, rows, bounds = self.row_lists[dim]
+            positions = {value: i for i, value in enumerate(all_values)}
+            selected = [rows[bounds[positions[value]]:bounds[positions[value] + 1]] for value in values if value in positions]
+            bitmap = np.zeros_like(self.all_rows)
+            return _set_bits(bitmap, np.concatenate(selected)) if selected else bitmap
+        bitmaps = [self.bitmaps[dim][value] for value in values if value in self.bitmaps[dim]]
+        if not bitmaps:
+            return np.zeros_like(self.all_rows)
+        return np.bitwise_or.reduce(bitmaps)
+
+    def select_range(self, dim, low, high):
+        return self.select(dim, [value for value in self.values(dim) if low <= value <= high])
+
+    def combine(self, selection):
+        """AND together the per-dimension selections (year is a (low, high) range)"""
+        result = self.all_rows
+        for dim, values in selection.items():
+            if dim == 'year':
+                if values is not None:
+                    result = result & self.select_range(dim, *values)
+            elif values:
+                result = result & self.select(dim, values)
+        return result
+
+    def to_mask(self, bitmap):
+        return np.unpackbits(bitmap, count=self.n_rows).astype(bool)
+
+
+@st.cache_resource
+def get_bitmap_index(version):
+    """
+    Build the bitmap index once per dataset version, shared by all sessions
+    (and by all workers, in multi-worker mode).
+    """
+    if is_shared():
+        return BitmapIndex.from_arrays(*shared_data.attach_arrays(version, 'filters'))
+    return build_bitmap_index(get_raw_data(version))
+
+
+def build_bitmap_index(df):
+    """
+    Build the bitmap index of the raw data.
+    """
+    df = df[[column for column, _ in FILTER_COLUMNS.values()]].copy()
+    # Same value normalisation the pages apply
+    df['weaptype1_txt'] = df['weaptype1_txt'].replace(VEHICLE_WEAPON, 'Vehicle')
+    df['city'] = df['city'].replace('Sederot', 'Sderot')
+    return BitmapIndex(df)
+
+
+def get_selection():
+    """
+    The cross-page filter selection stored in the session.
+    """
+    if SESSION_KEY not in st.session_state:
+        st.session_state[SESSION_KEY] = {dim: [] for dim in FILTER_COLUMNS if dim != 'year'}
+        st.session_state[SESSION_KEY]['year'] = None
+    return st.session_state[SESSION_KEY]
+
+
+def _store(dim):
+    value = st.session_state[f'filter_{dim}']
+    if dim == 'year':
+        value = tuple(value)
+        index = get_bitmap_index(dataset_version())
+        if value == (min(index.values('year')), max(index.values('year'))):
+            value = None
+    get_selection()[dim] = value
+
+
+def _clear():
+    st.session_state.pop(SESSION_KEY, None)
+
+
+def year_range_slider(label='Year', container=st, years=None):
+    """
+    Render the shared year range slider. Every page that shows it reads and
+    writes the same selection. `years` defaults to the years of the bitmap
+    index (pass them in to avoid loading the data, e.g. out-of-core).
+    """
+    if years is None:
+        years = get_bitmap_index(dataset_version()).values('year')
+    min_year = min(years)
+    max_year = max(years)
+    selected = get_selection()['year'] or (min_year, max_year)
+    st.session_state['filter_year'] = (max(selected[0], min_year), min(selected[1], max_year))
+    return container.slider(
+        label,
+        min_value=min_year,
+        max_value=max_year,
+        key='filter_year',
+        on_change=_store,
+        args=('year',)
+    )
+
+
+def render_filter_sidebar(dims=('year', 'weapon', 'city', 'target', 'attack')):
+    """
+    Render the shared filter widgets in the sidebar. Selections persist across
+    pages, so filtering on one page filters every other page too.
+    """
+    index = get_bitmap_index(dataset_version())
+    selection = get_selection()
+    with st.sidebar.expander("Shared Filters", expanded=any(selection[dim] for dim in dims)):
+        for dim in dims:
+            if dim == 'year':
+                year_range_slider(FILTER_COLUMNS['year'][1])
+                continue
+            key = f'filter_{dim}'
+            st.session_state[key] = selection[dim]
+            st.multiselect(
+                FILTER_COLUMNS[dim][1],
+                options=index.values(dim),
+                key=key,
+                on_change=_store,
+                args=(dim,),
+                placeholder="All"
+            )
+        st.button("Clear filters", on_click=_clear, use_container_width=True)
+
+
+def filter_mask(dims=None):
+    """
+    Boolean mask over all rows of the dataset for the current selection,
+    restricted to the given dimensions (e.g. those a page renders).
+    """
+    index = get_bitmap_index(dataset_version())
+    selection = get_selection()
+    if dims is not None:
+        selection = {dim: selection[dim] for dim in dims}
+    return index.to_mask(index.combine(selection))
+
+
+def apply_filters(df):
+    """
+    Filter a page's DataFrame (indexed by CSV row position) by the shared selection.
+    """
+    return df[filter_mask()[df.index]]
@@ -0,0 +1,116 @@
+import streamlit as st
+import pandas as pd
+import numpy as np
+
+# Fourier harmonics of the yearly cycle in the seasonal term
+HARMONICS = 2
+
+# Weight of the prior on each intercept (centred on the series' mean level), relative to the ridge
+INTERCEPT_PRIOR = 0.001
+
+
+def design_matrix(n, start_month=0, harmonics=HARMONICS):
+    """
+    Intercept, linear trend (in years) and yearly Fourier terms for n
+    consecutive months, the first being calendar month `start_month` (0-11).
+    """
+    t = np.arange(n)
+    angle = 2 * np.pi * (start_month + t) / 12
+    columns = [np.ones(n), t / 12]
+    for k in range(1, harmonics + 1):
+        columns += [np.sin(k * angle), np.cos(k * angle)]
+    return np.column_stack(columns)
+
+
+def fit_negative_binomial(y, X, iterations=25, ridge=1e-3):
+    """
+    Negative-binomial log-linear regression of every row of y (series x
+    months) on the shared design X, fitted together by batched IRLS: each
+    iteration solves all the weighted normal equations in one
+    np.linalg.solve call. The dispersion of each series is re-estimated from
+    its Pearson residuals between iterations (0 means Poisson). A small ridge
+    on the non-intercept terms and a weak prior on the intercept (centred on
+    the series' log mean level) keep sparse series finite; without the prior
+    the intercept of an all-zero series runs off to -inf. Series without any
+    event should still not be fitted (see forecast_series).
+
+    Returns the coefficients (series x terms), their covariances and the
+    dispersions.
+    """
+    n_series, n = y.shape
+    p = X.shape[1]
+    penalty = np.diag(np.r_[INTERCEPT_PRIOR, np.ones(p - 1)] * ridge * n)
+    prior = np.zeros((n_series, p))
+    prior[:, 0] = np.log(y.mean(axis=1) + 0.1)
+    beta = prior.copy()
+    alpha = np.zeros(n_series)
+
+    for _ in range(iterations):
+        eta = beta @ X.T
+        mu = np.exp(np.clip(eta, -20, 20))
+        weights = mu / (1 + alpha[:, None] * mu)
+        z = eta + (y - mu) / mu
+        # X' W X and X' W z of every series at once
+        xtwx = np.einsum('sn,ni,nj->sij', weights, X, X) + penalty
+        xtwz = np.einsum('sn,ni->si', weights * z, X) + prior @ penalty
+        updated = np.linalg.solve(xtwx, xtwz[:, :, None])[:, :, 0]
+        converged = np.abs(updated - beta).max() < 1e-6
+        beta = updated
+
+        mu = np.exp(np.clip(beta @ X.T, -20, 20))
+        alpha = np.maximum(0, (((y - mu) ** 2 - mu) / mu ** 2).sum(axis=1) / max(n - p, 1))
+        if converged:
+            break
+
+    weights = mu / (1 + alpha[:, None] * mu)
+    covariance = np.linalg.inv(np.einsum('sn,ni,nj->sij', weights, X, X) + penalty)
+    return beta, covariance, alpha
+
+
+@st.cache_data
+def forecast_series(series, horizon=12, history=120, level=0.8, draws=1000, seed=0):
+    """
+    Forecast every monthly series `horizon` months ahead with a
+    negative-binomial trend + seasonality model fitted on its last `history`
+    months. Prediction bands are the central `level` quantiles of simulated
+    counts, drawing both the coefficients (from their estimated covariance)
+    and the negative-binomial noise, for all series at once.
+
+    Returns one row per series, metric and forecast month with the mean,
+    lower and upper bounds. Series without any event in the history are
+    forecast as zero, with a zero band.
+    """
+    y = series.to_numpy(dtype=float)[:, -history:]
+    n_series, n = y.shape
+    first = series.columns[-n]
+    X = design_matrix(n + horizon, first.month - 1)
+    mean = np.zeros((n_series, horizon))
+    lower = np.zeros((n_series, horizon))
+    upper = np.zeros((n_series, horizon))
+
+    active = y.sum(axis=1) > 0
+    if active.any():
+        beta, covariance, alpha = fit_negative_binomial(y[active], X[:n])
+
+        future = X[n:]
+        rng = np.random.default_rng(seed)
+        # Coefficient draws (series x draws x terms) through the Cholesky factor of each covariance
+        noise = rng.standard_normal((len(beta), draws, X.shape[1]))
+        coefficients = beta[:, None, :] + np.einsum('sij,sdj->sdi', np.linalg.cholesky(covariance), noise)
+        mu = np.exp(np.clip(coefficients @ future.T, -20, 20))
+        # Gamma-Poisson mixture: negative-binomial counts with mean mu and dispersion alpha
+        shape = 1 / np.maximum(alpha, 1e-8)[:, None, None]
+        counts = rng.poisson(mu * rng.gamma(shape, 1 / shape, size=mu.shape))
+        lower[active], upper[active] = np.quantile(counts, [(1 - level) / 2, (1 + level) / 2], axis=1)
+        mean[active] = np.exp(np.clip(beta @ future.T, -20, 20))
+
+    months = pd.date_range(series.columns[-1] + pd.offsets.MonthBegin(), periods=horizon, freq='MS')
+    labels = series.index.to_frame(index=False)
+    return pd.DataFrame({
+        'series': np.repeat(labels['series'].to_numpy(), horizon),
+        'metric': np.repeat(labels['metric'].to_numpy(), horizon),
+        'month': np.tile(months, n_series),
+        'mean': mean.ravel(),
+        'lower': lower.ravel(),
+        'upper': upper.ravel(),
+    })
@@ -0,0 +1,48 @@
+import streamlit as st
+import numpy as np
+import plotly.graph_objects as go
+
+
+def bin_edges(values, nbins):
+    """
+    Bin edges for a histogram: one bin per integer when the data is integer
+    valued and has at most nbins distinct steps, otherwise nbins equal bins.
+    """
+    low, high = values.min(), values.max()
+    if np.all(np.mod(values, 1) == 0) and high - low + 1 <= nbins:
+        return np.arange(low - 0.5, high + 1.5)
+    if low == high:
+        return np.array([low - 0.5, high + 0.5])
+    return np.linspace(low, high, nbins + 1)
+
+
+@st.cache_data
+def binned_histogram(values, nbins=30):
+    """
+    Count values per bin on the server (a single O(n) bincount pass).
+    Returns (counts, edges); missing values are ignored.
+    """
+    values = np.asarray(values, dtype=float)
+    values = values[np.isfinite(values)]
+    if values.size == 0:
+        return np.zeros(0, dtype=int), np.zeros(1)
+    edges = bin_edges(values, nbins)
+    width = edges[1] - edges[0]
+    index = np.clip(((values - edges[0]) / width).astype(int), 0, len(edges) - 2)
+    return np.bincount(index, minlength=len(edges) - 1), edges
+
+
+def histogram_trace(values, nbins=30, **trace_kwargs):
+    """
+    A pre-aggregated bar trace drawing the histogram of values, so the
+    figure payload depends on the number of bins rather than on the rows.
+    customdata holds each bin's [start, end] for hover templates.
+    """
+    counts, edges = binned_histogram(values, nbins)
+    return go.Bar(
+        x=(edges[:-1] + edges[1:]) / 2,
+        y=counts,
+        width=np.diff(edges),
+        customdata=np.column_stack([edges[:-1], edges[1:]]),
+        **trace_kwargs
+    )
@@ -0,0 +1,100 @@
+import numpy as np
+
+# Fixed grid covering Israel, the West Bank and Gaza (south, west, north, east)
+GRID_BOUNDS = (29.4, 34.2, 33.5, 35.95)
+EARTH_RADIUS_KM = 6371.0
+
+# Color stops (position, r, g, b, a) for the heat overlay: transparent -> yellow -> red
+HEAT_COLORS = np.array([
+    [0.00, 255, 255, 178, 0],
+    [0.05, 255, 237, 160, 120],
+    [0.25, 254, 178, 76, 170],
+    [0.50, 253, 141, 60, 200],
+    [0.75, 240, 59, 32, 220],
+    [1.00, 189, 0, 38, 235],
+])
+
+
+def _mercator_y(lat):
+    return np.log(np.tan(np.pi / 4 + np.radians(lat) / 2))
+
+
+def grid_shape(cell_km):
+    """
+    Number of (rows, cols) of the grid. Rows are evenly spaced in Web Mercator
+    y, so the raster can be overlaid on the map without reprojection.
+    """
+    south, west, north, east = GRID_BOUNDS
+    km_per_radian = EARTH_RADIUS_KM * np.cos(np.radians((south + north) / 2))
+    rows = int(np.ceil((_mercator_y(north) - _mercator_y(south)) * km_per_radian / cell_km))
+    cols = int(np.ceil(np.radians(east - west) * km_per_radian / cell_km))
+    return rows, cols
+
+
+def bin_weights(lat, lon, weights, shape):
+    """
+    Linear binning: split each event's weight over its four nearest grid
+    nodes. Row 0 is the northern edge of the grid.
+    """
+    south, west, north, east = GRID_BOUNDS
+    rows, cols = shape
+    inside = (lat >= south) & (lat <= north) & (lon >= west) & (lon <= east) & np.isfinite(weights)
+    lat, lon, weights = lat[inside], lon[inside], weights[inside]
+
+    y = (_mercator_y(north) - _mercator_y(lat)) / (_mercator_y(north) - _mercator_y(south)) * (rows - 1)
+    x = (lon - west) / (east - west) * (cols - 1)
+    y0 = np.minimum(np.floor(y).astype(int), rows - 2)
+    x0 = np.minimum(np.floor(x).astype(int), cols - 2)
+    dy, dx = y - y0, x - x0
+
+    grid = np.zeros(rows * cols)
+    for row_offset, col_offset, share in (
+        (0, 0, (1 - dy) * (1 - dx)), (0, 1, (1 - dy) * dx),
+        (1, 0, dy * (1 - dx)), (1, 1, dy * dx)
+    ):
+        index = (y0 + row_offset) * cols + (x0 + col_offset)
+        grid += np.bincount(index, weights=weights * share, minlength=rows * cols)
+    return grid.reshape(shape)
+
+
+def gaussian_kernel(bandwidth_km, cell_km):
+    """2D Gaussian kernel in grid cells, truncated at 4 standard deviations"""
+    sigma = bandwidth_km / cell_km
+    radius = int(np.ceil(4 * sigma))
+    offsets = np.arange(-radius, radius + 1)
+    kernel_1d = np.exp(-0.5 * (offsets / sigma) ** 2)
+    kernel = np.outer(kernel_1d, kernel_1d)
+    return kernel / kernel.sum()
+
+
+def fft_convolve(grid, kernel):
+    """'same'-size linear convolution using real FFTs (zero padded)"""
+    full_shape = [grid.shape[axis] + kernel.shape[axis] - 1 for axis in (0, 1)]
+    fft_shape = [int(2 ** np.ceil(np.log2(size))) for size in full_shape]
+    result = np.fft.irfft2(np.fft.rfft2(grid, fft_shape) * np.fft.rfft2(kernel, fft_shape), fft_shape)
+    top, left = kernel.shape[0] // 2, kernel.shape[1] // 2
+    return result[top:top + grid.shape[0], left:left + grid.shape[1]]
+
+
+def weighted_kde(lat, lon, weights, bandwidth_km, cell_km=0.5):
+    """
+    Weighted kernel density estimate on the fixed grid (weight per km²).
+    Binning plus FFT convolution keeps the cost near O(grid) regardless of
+    the number of events.
+    """
+    shape = grid_shape(cell_km)
+    grid = bin_weights(np.asarray(lat, dtype=float), np.asarray(lon, dtype=float), np.asarray(weights, dtype=float), shape)
+    density = fft_convolve(grid, gaussian_kernel(bandwidth_km, cell_km))
+    # FFT round-off can leave tiny negative values
+    return np.clip(density, 0, None) / cell_km ** 2
+
+
+def to_rgba(density):
+    """
+    Color a density raster into an RGBA uint8 image (square-root scaled so
+    isolated events stay visible next to dense clusters).
+    """
+    peak = density.max()
+    scaled = np.sqrt(density / peak) if peak > 0 else density
+    channels = [np.interp(scaled, HEAT_COLORS[:, 0], HEAT_COLORS[:, channel]) for channel in range(1, 5)]
+    return np.stack(channels, axis=-1).astype(np.uint8)
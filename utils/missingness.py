@@ -0,0 +1,112 @@
+import streamlit as st
+import pandas as pd
+import numpy as np
+
+from utils.data import get_raw_data
+
+# GTD codebook values for "unknown"
+UNKNOWN_CODES = [-9, -99]
+
+# Columns where the codebook uses those codes (elsewhere negative numbers are
+# real values, e.g. longitudes west of Greenwich)
+UNKNOWN_CODE_COLUMNS = [
+    'vicinity', 'doubtterr', 'nperps', 'nperpcap', 'claimed', 'claim2', 'claim3', 'compclaim',
+    'property', 'propvalue', 'ishostkid', 'nhostkid', 'nhostkidus', 'nhours', 'ndays',
+    'ransom', 'ransomamt', 'ransomamtus', 'ransompaid', 'ransompaidus', 'nreleased',
+    'INT_LOG', 'INT_IDEO', 'INT_MISC', 'INT_ANY',
+]
+
+# Number of set bits of every 16-bit word
+POPCOUNT16 = np.unpackbits(np.arange(1 << 16, dtype='>u2').view(np.uint8)).reshape(-1, 16).sum(axis=1).astype(np.uint8)
+
+
+def _words(packed):
+    """Packed bitmaps (... x bytes) viewed as 16-bit words, padded with a zero byte if needed"""
+    if packed.shape[-1] % 2:
+        packed = np.concatenate([packed, np.zeros((*packed.shape[:-1], 1), dtype=np.uint8)], axis=-1)
+    return np.ascontiguousarray(packed).view(np.uint16)
+
+
+def popcount(words):
+    """Set bits of each bitmap (last axis) of a word array"""
+    return POPCOUNT16[words].sum(axis=-1, dtype=np.int64)
+
+
+def and_counts(left, right):
+    """Set bits of left[i] & right[j] for every pair of word bitmaps (left x right)"""
+    counts = np.empty((len(left), len(right)), dtype=np.int64)
+    for i, bitmap in enumerate(left):
+        counts[i] = popcount(right & bitmap)
+    return counts
+
+
+class MissingnessMasks:
+    """
+    One bitmap per column (packed 8 rows per byte) of the rows where it is
+    missing, kept separately for empty cells and for GTD's "unknown" codes
+    (-9, -99, in the columns that use them), plus one bitmap of the rows of
+    every year. Completeness and co-missingness of any year range are AND /
+    OR combinations of these bitmaps and their bit counts.
+    """
+
+    def __init__(self, df, year_column='iyear'):
+        self.columns = list(df.columns)
+        self.n_rows = len(df)
+        empty = np.empty((len(self.columns), self.n_rows), dtype=bool)
+        unknown = np.zeros((len(self.columns), self.n_rows), dtype=bool)
+        for i, column in enumerate(self.columns):
+            values = df[column]
+            empty[i] = values.isna().to_numpy()
+            if pd.api.types.is_string_dtype(values) or isinstance(values.dtype, pd.CategoricalDtype) or values.dtype == object:
+                empty[i] |= (values.astype(str).str.strip() == '').to_numpy()
+            elif column in UNKNOWN_CODE_COLUMNS:
+                unknown[i] = values.isin(UNKNOWN_CODES).to_numpy()
+        self.empty = _words(np.packbits(empty, axis=1))
+        self.unknown = _words(np.packbits(unknown, axis=1))
+
+        years = df[year_column].to_numpy()
+        self.years = np.unique(years).tolist()
+        self.year_rows = _words(np.packbits(years[None, :] == np.array(self.years)[:, None], axis=1))
+
+    def _missing(self, include_unknown):
+        return self.empty | self.unknown if include_unknown else self.empty
+
+    def _rows(self, years):
+        """Bitmap of the rows of the (first, last) year range"""
+        first, last = years
+        selected = [i for i, year in enumerate(self.years) if first <= year <= last]
+        return np.bitwise_or.reduce(self.year_rows[selected], axis=0)
+
+    def missing_counts(self, years, include_unknown=False):
+        """Missing rows of every column in the year range, and the number of rows in it"""
+        rows = self._rows(years)
+        return pd.Series(popcount(self._missing(include_unknown) & rows), index=self.columns), int(popcount(rows))
+
+    def completeness(self, years, include_unknown=False):
+        """Share of the rows of each year where each column is present (columns x years)"""
+        selected = [year for year in self.years if years[0] <= year <= years[1]]
+        year_rows = self.year_rows[[self.years.index(year) for year in selected]]
+        missing = and_counts(self._missing(include_unknown), year_rows)
+        return pd.DataFrame(1 - missing / popcount(year_rows), index=self.columns, columns=selected)
+
+    def co_missingness(self, years, include_unknown=False):
+        """
+        Phi coefficient (correlation of the missing indicators) of every pair
+        of columns over the rows of the year range. NaN for columns that are
+        always or never missing there.
+        """
+        rows = self._rows(years)
+        missing = self._missing(include_unknown) & rows
+        n = popcount(rows)
+        both = and_counts(missing, missing)
+        counts = np.diag(both).astype(float)
+        spread = counts * (n - counts)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            phi = (n * both - np.outer(counts, counts)) / np.sqrt(np.outer(spread, spread))
+        return pd.DataFrame(phi, index=self.columns, columns=self.columns)
+
+
+@st.cache_resource(show_spinner=False)
+def get_missingness(version):
+    """Missingness bitmaps of all the columns of the data, built once per version"""
+    return MissingnessMasks(get_raw_data(version))
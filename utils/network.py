@@ -0,0 +1,247 @@
+import streamlit as st
+import pandas as pd
+import numpy as np
+
+from utils import shared_data
+from utils.data import get_raw_data, is_shared
+
+GROUP_COLUMNS = ['gname', 'gname2', 'gname3']
+
+# Group names that do not identify a perpetrator
+EXCLUDED_GROUPS = {'Unknown'}
+
+
+def _related_ids(related):
+    """The eventids listed in each `related` value (a set per row, empty when missing)"""
+    return [
+        {int(part) for part in value.replace(';', ',').split(',') if part.strip().isdigit()}
+        if isinstance(value, str) else set()
+        for value in related
+    ]
+
+
+def _own_ids(df, listed):
+    """
+    Each row's eventid, or -1 where it is not known exactly. Extracts that
+    store eventid in scientific notation (1.97109E+11) lose its sequence
+    digits; there a row's id is the one id mentioned in other rows' lists
+    with the row's date (eventid = YYYYMMDD + sequence) that is not in its
+    own list, when there is exactly one.
+    """
+    eventids = df['eventid'].to_numpy(dtype=float)
+    if pd.Series(eventids).is_unique and np.all(eventids % 1 == 0):
+        return eventids.astype(np.int64)
+
+    dates = (df['iyear'] * 10000 + df['imonth'] * 100 + df['iday']).to_numpy(dtype=np.int64)
+    mentioned = pd.Series(sorted(set().union(*listed)), dtype=np.int64)
+    by_date = mentioned.groupby(mentioned // 10000).agg(set)
+    own = np.full(len(df), -1, dtype=np.int64)
+    for row, (date, ids) in enumerate(zip(dates, listed)):
+        candidates = by_date.get(date, set()) - ids
+        if len(candidates) == 1:
+            own[row] = candidates.pop()
+    return own
+
+
+def incident_codes(df):
+    """
+    Incident of every event: events linked through their `related` lists
+    (directly or through other events) form one incident. GTD lists the
+    other events of a multi-part attack there, in no particular order and
+    without the event itself, so the incidents are the connected components
+    of the graph joining each event to the ids it lists and to its own id.
+    """
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+
+    n_events = len(df)
+    listed = _related_ids(df['related'])
+    own = _own_ids(df, listed)
+    ids = pd.Index(sorted(set().union(*listed) | set(own[own >= 0].tolist())))
+
+    # Nodes: events 0..n_events-1, then one node per eventid
+    rows = [np.repeat(np.arange(n_events), [len(values) for values in listed]), np.flatnonzero(own >= 0)]
+    targets = [ids.get_indexer([value for values in listed for value in values]), ids.get_indexer(own[own >= 0])]
+    rows, targets = np.concatenate(rows), np.concatenate(targets).astype(np.int64) + n_events
+    size = n_events + len(ids)
+    graph = coo_matrix((np.ones(len(rows)), (rows, targets)), shape=(size, size))
+    _, labels = connected_components(graph, directed=False)
+    codes, _ = pd.factorize(labels[:n_events])
+    return codes
+
+
+class GroupNetwork:
+    """
+    Sparse incidence matrix of incidents x perpetrator groups.
+
+    An incident is one event, or all the events of a multi-part attack,
+    linked through their `related` lists (see incident_codes). Two groups
+    co-occur when they are named in the same incident, either by co-claiming
+    one event or by taking part in related events.
+    """
+
+    def __init__(self, df):
+        # scipy is only needed once the network is built
+        from scipy import sparse
+
+        n_events = len(df)
+        event_incidents = incident_codes(df)
+
+        # Event x group incidence from the three group columns
+        names = df[GROUP_COLUMNS].to_numpy().ravel()
+        valid = pd.notna(names) & ~np.isin(names, list(EXCLUDED_GROUPS))
+        group_codes, groups = pd.factorize(names[valid], sort=True)
+        self.groups = pd.Index(groups, name='group')
+        event_rows = np.repeat(np.arange(n_events), len(GROUP_COLUMNS))[valid]
+
+        incidence = sparse.csr_matrix(
+            (np.ones(len(group_codes)), (event_incidents[event_rows], group_codes)),
+            shape=(event_incidents.max(initial=-1) + 1, len(self.groups))
+        )
+        incidence.data[:] = 1  # a group counts once per incident
+        self.incidence = incidence
+
+        # Per incident: the year of its first event (for periods and year filters)
+        self.incident_years = pd.Series(df['iyear'].to_numpy()).groupby(event_incidents).min().to_numpy()
+        self.event_incidents = event_incidents
+
+    def to_arrays(self):
+        """The incidence matrix (CSR arrays) and event / incident arrays, plus the group names"""
+        arrays = {
+            'data': self.incidence.data,
+            'indices': self.incidence.indices,
+            'indptr': self.incidence.indptr,
+            'incident_years': self.incident_years,
+            'event_incidents': self.event_incidents,
+        }
+        return arrays, {'groups': self.groups.tolist(), 'shape': list(self.incidence.shape)}
+
+    @classmethod
+    def from_arrays(cls, arrays, meta):
+        """Wrap a published (memory-mapped) network without copying its arrays"""
+        from scipy import sparse
+
+        network = cls.__new__(cls)
+        network.groups = pd.Index(meta['groups'], name='group')
+        network.incidence = sparse.csr_matrix(
+            (arrays['data'], arrays['indices'], arrays['indptr']), shape=tuple(meta['shape'])
+        )
+        network.incident_years = arrays['incident_years']
+        network.event_incidents = arrays['event_incidents']
+        return network
+
+    def cooccurrence(self, incident_mask=None):
+        """
+        Group x group co-occurrence counts (sparse). The diagonal holds the
+        number of incidents of each group.
+        """
+        incidence = self.incidence if incident_mask is None else self.incidence[incident_mask]
+        return (incidence.T @ incidence).tocsr()
+
+    def incident_mask(self, event_mask):
+        """Incidents with at least one event selected by a mask over the events"""
+        mask = np.zeros(self.incidence.shape[0], dtype=bool)
+        mask[self.event_incidents[event_mask]] = True
+        return mask
+
+
+def centrality(cooccurrence, iterations=200, tolerance=1e-9):
+    """
+    Node metrics of a co-occurrence network: incidents, degree (number of
+    partner groups), weighted degree (shared incidents) and eigenvector
+    centrality (power iteration on the sparse matrix).
+    """
+    from scipy import sparse
+
+    incidents = cooccurrence.diagonal()
+    adjacency = (cooccurrence - sparse.diags(incidents)).tocsr()
+    adjacency.eliminate_zeros()
+    degree = np.diff(adjacency.indptr)
+    weighted_degree = np.asarray(adjacency.sum(axis=1)).ravel()
+
+    vector = np.ones(adjacency.shape[0]) / max(adjacency.shape[0], 1)
+    # Shifting by the identity keeps power iteration from oscillating on bipartite components
+    shifted = adjacency + sparse.identity(adjacency.shape[0])
+    for _ in range(iterations):
+        updated = shifted @ vector
+        norm = np.linalg.norm(updated)
+        if norm == 0:
+            break
+        updated /= norm
+        converged = np.abs(updated - vector).max() < tolerance
+        vector = updated
+        if converged:
+            break
+    vector[degree == 0] = 0
+
+    return pd.DataFrame({
+        'incidents': incidents.astype(int),
+        'degree': degree,
+        'weighted_degree': weighted_degree.astype(int),
+        'eigenvector': vector / vector.max() if vector.max() > 0 else vector,
+    })
+
+
+def period_evolution(network, event_mask, period_years):
+    """
+    Network size per period: groups active, groups with partners, edges and
+    each group's degree, from one sparse product per period.
+    """
+    selected = network.incident_mask(event_mask)
+    periods = (network.incident_years // period_years) * period_years
+    summary, degrees = [], {}
+    for period in np.unique(periods[selected]):
+        cooccurrence = network.cooccurrence(selected & (periods == period))
+        metrics = centrality(cooccurrence, iterations=50)
+        label = f"{period}-{period + period_years - 1}"
+        summary.append({
+            'period': label,
+            'active_groups': int((metrics['incidents'] > 0).sum()),
+            'connected_groups': int((metrics['degree'] > 0).sum()),
+            'edges': int(metrics['degree'].sum() // 2),
+        })
+        degrees[label] = metrics['degree'].to_numpy()
+    return pd.DataFrame(summary), pd.DataFrame(degrees, index=network.groups)
+
+
+def spring_layout(adjacency, iterations=150, seed=0):
+    """
+    Vectorised Fruchterman-Reingold layout of a small dense adjacency matrix.
+    """
+    n = adjacency.shape[0]
+    rng = np.random.default_rng(seed)
+    positions = rng.uniform(-1, 1, size=(n, 2))
+    if n < 2:
+        return positions
+    k = 1 / np.sqrt(n)
+    temperature = 0.1
+    weights = adjacency / adjacency.max() if adjacency.max() > 0 else adjacency
+    for _ in range(iterations):
+        delta = positions[:, None, :] - positions[None, :, :]
+        distance = np.maximum(np.linalg.norm(delta, axis=-1), 1e-3)
+        force = k ** 2 / distance - weights * distance ** 2 / k
+        displacement = (delta / distance[..., None] * force[..., None]).sum(axis=1)
+        # Weak gravity keeps unconnected groups near the center
+        displacement -= 0.05 * positions
+        length = np.maximum(np.linalg.norm(displacement, axis=1), 1e-9)
+        positions += displacement / length[:, None] * np.minimum(length, temperature)[:, None]
+        temperature *= 0.98
+    return positions
+
+
+@st.cache_resource
+def get_group_network(version):
+    """
+    Build the incidents x groups incidence matrix once per dataset version
+    (in multi-worker mode, map the published one).
+    """
+    if is_shared():
+        return GroupNetwork.from_arrays(*shared_data.attach_arrays(version, 'network'))
+    return build_group_network(get_raw_data(version))
+
+
+def build_group_network(df):
+    """
+    Build the group network of the raw data.
+    """
+    return GroupNetwork(df[GROUP_COLUMNS + ['eventid', 'related', 'iyear', 'imonth', 'iday']])
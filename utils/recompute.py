@@ -0,0 +1,117 @@
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+# Seconds a control has to stay still before its section is recomputed
+DEBOUNCE_SECONDS = 0.3
+
+# How often the script checks for a newer widget change while it waits
+POLL_SECONDS = 0.05
+
+# Inputs remembered per key and session as computed (their results are cached)
+REMEMBERED_INPUTS = 32
+
+
+class Cancelled(Exception):
+    """Raised inside a computation that a newer one has superseded"""
+
+
+class CancelToken:
+    """Cooperative cancellation flag, checked by a computation between its steps"""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def check(self):
+        if self._event.is_set():
+            raise Cancelled()
+
+
+@st.cache_resource
+def _executor():
+    """Worker threads shared by all sessions"""
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix='recompute')
+
+
+def _run(ctx, compute, token, *args):
+    # Cached functions called by compute look up the session of the run that started it
+    add_script_run_ctx(threading.current_thread(), ctx)
+    return compute(token, *args)
+
+
+def _fingerprint(args):
+    """Digest of a computation's inputs (DataFrames and Series by content)"""
+    digest = hashlib.sha1()
+    for arg in args:
+        if isinstance(arg, (pd.DataFrame, pd.Series)):
+            digest.update(pd.util.hash_pandas_object(arg).to_numpy().tobytes())
+            digest.update(repr(arg.columns.tolist() if isinstance(arg, pd.DataFrame) else arg.name).encode())
+        else:
+            digest.update(repr(arg).encode())
+    return digest.hexdigest()
+
+
+def run_latest(key, compute, *args, debounce=DEBOUNCE_SECONDS, message="Updating"):
+    """
+    Return compute(token, *args), computed on a worker thread once the
+    inputs have stayed unchanged for `debounce` seconds. Only the latest call
+    per key and session matters: starting a new one cancels the previous
+    computation, and a widget change while waiting (or computing) interrupts
+    the script at the next status update, so rapid slider drags never queue
+    up full recomputations. Reruns with unchanged inputs, or with inputs this
+    session already computed (cache hits), are not debounced.
+
+    `compute` must not call Streamlit itself (st.cache_data functions taking
+    the token as `_token` are fine) and should call token.check() between
+    its steps.
+    """
+    state_key = f'_recompute_{key}'
+    inputs_key = f'_recompute_{key}_inputs'
+    computed_key = f'_recompute_{key}_computed'
+    previous = st.session_state.get(state_key)
+    if previous is not None:
+        previous.cancel()
+    token = st.session_state[state_key] = CancelToken()
+
+    inputs = _fingerprint(args)
+    computed = st.session_state.setdefault(computed_key, [])
+    if st.session_state.get(inputs_key) in (None, inputs) or inputs in computed:
+        # First render, unchanged inputs or a cache hit: nothing to wait for
+        debounce = 0
+    st.session_state[inputs_key] = inputs
+
+    status = st.empty()
+    start = time.monotonic()
+    future = None
+    try:
+        # Each status update is a point where Streamlit can stop this run for a newer one
+        while time.monotonic() - start < debounce:
+            status.caption(f"{message}...")
+            time.sleep(POLL_SECONDS)
+        future = _executor().submit(_run, get_script_run_ctx(), compute, token, *args)
+        while not wait([future], timeout=POLL_SECONDS).done:
+            status.caption(f"{message}... {time.monotonic() - start:.1f} s")
+        result = future.result()
+        if inputs not in computed:
+            computed.append(inputs)
+            del computed[:-REMEMBERED_INPUTS]
+    finally:
+        # Interrupted by a newer run: let the worker stop at its next check
+        if future is None or not future.done():
+            token.cancel()
+            if future is not None:
+                future.cancel()
+    status.empty()
+    return result
@@ -0,0 +1,230 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import streamlit as st
+import pandas as pd
+import numpy as np
+
+from utils.data import get_raw_data
+from utils.spatial import chord_to_km, km_to_chord, to_unit_vectors
+
+# Most Monte Carlo processes, whatever the number of cores
+MAX_WORKERS = 4
+# Memory all the Monte Carlo processes may use for their count arrays together
+WORKERS_MEMORY_BYTES = 1 << 30
+
+
+def _llr(cases, expected, total):
+    """Poisson log-likelihood ratio of cylinders with more cases than expected (0 otherwise)"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        inside = cases * np.log(cases / expected)
+        rest = total - cases
+        outside = np.where(rest > 0, rest * np.log(rest / (total - expected)), 0)
+        llr = inside + outside
+    return np.where((cases > expected) & (cases >= 2), llr, 0)
+
+
+class SpaceTimeScan:
+    """
+    Space-time permutation scan statistic (Kulldorff 2005) over event
+    locations x months.
+
+    Candidate cylinders are the k nearest locations around every location
+    (within max_radius_km) x every window of up to max_months months. The
+    expected count of a cylinder only depends on the location and month
+    totals, which a permutation of the months keeps, so Monte Carlo
+    replicates only recount cases. Every replicate evaluates all cylinders
+    at once with cumulative sums over neighbours and months.
+    """
+
+    def __init__(self, lat, lon, months, max_radius_km=10, max_neighbours=30, max_months=12):
+        # scipy is only needed once the scan is built
+        from scipy.spatial import cKDTree
+
+        coordinates = np.column_stack([lat, lon])
+        self.locations, self.location_codes = np.unique(coordinates, axis=0, return_inverse=True)
+        self.location_codes = self.location_codes.ravel()
+        self.first_month = int(months.min())
+        self.month_codes = np.asarray(months) - self.first_month
+        self.n_locations = len(self.locations)
+        self.n_months = int(self.month_codes.max()) + 1
+        self.max_months = min(max_months, self.n_months)
+        self.total = len(self.month_codes)
+
+        # Nearest locations of every center; missing neighbours point to an empty extra location
+        tree = cKDTree(to_unit_vectors(self.locations[:, 0], self.locations[:, 1]))
+        k = min(max_neighbours, self.n_locations)
+        chords, neighbours = tree.query(tree.data, k=k, distance_upper_bound=km_to_chord(max_radius_km))
+        self.neighbours = np.where(np.isfinite(chords), neighbours, self.n_locations).reshape(self.n_locations, k)
+        self.radii = chord_to_km(np.where(np.isfinite(chords), chords, 0)).reshape(self.n_locations, k)
+        self.radii = np.maximum.accumulate(self.radii, axis=1)
+
+        location_totals = np.append(np.bincount(self.location_codes, minlength=self.n_locations), 0)
+        self.zone_totals = np.cumsum(location_totals[self.neighbours], axis=1).astype(np.float32)
+        # A zone is a candidate if it adds a location to the previous one and holds at most half of all cases
+        self.valid_zones = (self.neighbours < self.n_locations) & (self.zone_totals <= self.total / 2)
+        month_totals = np.concatenate([[0], np.cumsum(np.bincount(self.month_codes, minlength=self.n_months))])
+        self.window_totals = [
+            (month_totals[w:] - month_totals[:-w]).astype(np.float32) for w in range(1, self.max_months + 1)
+        ]
+
+    def _cumulative_counts(self, month_codes):
+        """Cases of every zone up to each month: (centers, neighbours, months + 1)"""
+        counts = np.bincount(
+            self.location_codes * self.n_months + month_codes, minlength=(self.n_locations + 1) * self.n_months
+        ).astype(np.float32).reshape(self.n_locations + 1, self.n_months)
+        zones = np.cumsum(counts[self.neighbours], axis=1)
+        cumulative = np.zeros(zones.shape[:2] + (self.n_months + 1,), dtype=np.float32)
+        np.cumsum(zones, axis=2, out=cumulative[:, :, 1:])
+        return cumulative
+
+    def replicate_bytes(self):
+        """
+        Peak memory of one replicate: the cumulative counts plus about twice
+        as much for the window cases and candidate masks of _window_llr.
+        """
+        return 3 * 4 * self.neighbours.size * (self.n_months + 1)
+
+    def _window_llr(self, cumulative, w):
+        """
+        LLR of every cylinder of w months that can be a cluster (at least 2
+        cases, a zone with a new location and at most half of all cases),
+        as flat arrays with the (center, neighbour, start) index of each.
+        """
+        cases = cumulative[:, :, w:] - cumulative[:, :, :-w]
+        starts = cases.shape[2]
+        candidates = np.flatnonzero((cases >= 2) & self.valid_zones[:, :, None])
+        cases = cases.ravel()[candidates]
+        zones, start = np.divmod(candidates, starts)
+        expected = self.zone_totals.ravel()[zones] * self.window_totals[w - 1][start] / self.total
+        return _llr(cases, expected, self.total), cases, expected, (*np.divmod(zones, self.neighbours.shape[1]), start)
+
+    def max_llr(self, month_codes):
+        """The largest log-likelihood ratio over all cylinders"""
+        cumulative = self._cumulative_counts(month_codes)
+        return max(float(self._window_llr(cumulative, w)[0].max(initial=0)) for w in range(1, self.max_months + 1))
+
+    def clusters(self, limit=10, candidates=5000):
+        """
+        The most likely clusters of the observed data, best first, skipping
+        cylinders that overlap a better one in both space and time.
+        """
+        cumulative = self._cumulative_counts(self.month_codes)
+        found = []
+        for w in range(1, self.max_months + 1):
+            llr, cases, expected, (center, neighbour, start) = self._window_llr(cumulative, w)
+            top = np.argsort(-llr, kind='stable')[:candidates]
+            top = top[llr[top] > 0]
+            found.append(pd.DataFrame({
+                'llr': llr[top],
+                'center': center[top],
+                'neighbours': neighbour[top] + 1,
+                'start': start[top],
+                'months': w,
+                'cases': cases[top],
+                'expected': expected[top],
+            }))
+        candidates = pd.concat(found).sort_values('llr', ascending=False, kind='stable')
+
+        selected = []
+        for cluster in candidates.itertuples(index=False):
+            zone = set(self.neighbours[cluster.center, :cluster.neighbours].tolist()) - {self.n_locations}
+            window = (cluster.start, cluster.start + cluster.months - 1)
+            if any(zone & other_zone and window[0] <= other_window[1] and other_window[0] <= window[1]
+                   for _, other_zone, other_window in selected):
+                continue
+            selected.append((cluster, zone, window))
+            if len(selected) == limit:
+                break
+
+        return pd.DataFrame([{
+            'lat': self.locations[cluster.center, 0],
+            'lon': self.locations[cluster.center, 1],
+            'radius_km': self.radii[cluster.center, cluster.neighbours - 1],
+            'start_month': self.first_month + window[0],
+            'end_month': self.first_month + window[1],
+            'cases': int(cluster.cases),
+            'expected': float(cluster.expected),
+            'llr': float(cluster.llr),
+            'locations': sorted(zone),
+        } for cluster, zone, window in selected])
+
+
+# Scan of the current process pool worker
+_worker_scan = None
+
+
+def _init_worker(scan):
+    global _worker_scan
+    _worker_scan = scan
+
+
+def _replicate_maxima(seeds):
+    """Maximum LLR of one permutation replicate per seed"""
+    return [
+        _worker_scan.max_llr(np.random.default_rng(seed).permutation(_worker_scan.month_codes))
+        for seed in seeds
+    ]
+
+
+def monte_carlo(scan, replicates=99, seed=0, workers=None):
+    """
+    Maximum LLR of `replicates` random permutations of the months, run in a
+    process pool. One seed per replicate keeps the result independent of
+    the number of workers. By default there are at most MAX_WORKERS
+    workers, and fewer if their replicates would not fit together in
+    WORKERS_MEMORY_BYTES (each worker also holds a copy of the scan).
+    """
+    seeds = np.random.SeedSequence(seed).spawn(replicates)
+    if not workers:
+        fitting = WORKERS_MEMORY_BYTES // max(scan.replicate_bytes(), 1)
+        workers = max(1, min(os.cpu_count() or 1, MAX_WORKERS, fitting, replicates))
+    if workers == 1:
+        _init_worker(scan)
+        return np.array(_replicate_maxima(seeds))
+    chunks = [list(chunk) for chunk in np.array_split(np.array(seeds, dtype=object), workers * 4) if len(chunk)]
+    # spawn, not fork: the Streamlit server process is multi-threaded
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_worker, initargs=(scan,)) as pool:
+        return np.concatenate([maxima for maxima in pool.map(_replicate_maxima, chunks)])
+
+
+@st.cache_data(show_spinner="Running the space-time scan...")
+def get_space_time_clusters(version, max_radius_km=10, max_months=12, replicates=99, limit=10):
+    """
+    Most likely space-time clusters of all located events with their Monte
+    Carlo p-values, once per dataset version and settings.
+    """
+    df = get_raw_data(version)
+    located = df[df['latitude'].notna() & df['longitude'].notna()]
+    # imonth 0 (unknown month) counts as January, as on the periods page
+    months = (located['iyear'] * 12 + located['imonth'].clip(lower=1) - 1).to_numpy()
+    scan = SpaceTimeScan(
+        located['latitude'].to_numpy(), located['longitude'].to_numpy(), months,
+        max_radius_km=max_radius_km, max_months=max_months
+    )
+    clusters = scan.clusters(limit=limit)
+    if clusters.empty:
+        return clusters
+
+    maxima = monte_carlo(scan, replicates)
+    clusters['p_value'] = [(1 + (maxima >= llr).sum()) / (replicates + 1) for llr in clusters['llr']]
+
+    # Name each cluster after the most common known city (or district) among its events
+    cities = located['city'].to_numpy()
+    districts = located['provstate'].to_numpy()
+    names = []
+    for cluster in clusters.itertuples():
+        inside = np.isin(scan.location_codes, cluster.locations) & \
+            (months >= cluster.start_month) & (months <= cluster.end_month)
+        known = pd.Series(cities[inside]).dropna()
+        known = known[known != 'Unknown']
+        if not known.empty:
+            names.append(known.mode().iloc[0])
+        else:
+            names.append(f"Unknown ({pd.Series(districts[inside]).mode().iloc[0]})")
+    clusters['city'] = names
+    for column in ('start_month', 'end_month'):
+        clusters[column] = [f"{month // 12}-{month % 12 + 1:02d}" for month in clusters[column]]
+    return clusters.drop(columns='locations')
@@ -0,0 +1,225 @@
+import re
+import unicodedata
+
+import streamlit as st
+import numpy as np
+
+from utils import shared_data
+from utils.data import get_raw_data, is_shared
+
+# Free-text fields of the GTD that are indexed for search
+TEXT_FIELDS = ['summary', 'location', 'motive', 'weapdetail', 'addnotes', 'city', 'gname', 'target1']
+
+STOP_WORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'in', 'into', 'is', 'it', 'its',
+    'of', 'on', 'or', 'that', 'the', 'their', 'this', 'to', 'was', 'were', 'which', 'with'
+}
+
+# Spelling variants common in English transliterations of Hebrew and Arabic
+# place and group names (Tiqwa/Tikva, Be'er Sheva/Beersheba, Sederot/Sderot)
+TRANSLITERATIONS = [('ph', 'f'), ('kh', 'h'), ('ch', 'h'), ('tz', 'z'), ('ts', 'z'), ('q', 'k'), ('ck', 'k'),
+                    ('w', 'v'), ('v', 'b'), ('j', 'y'), ('c', 'k')]
+
+TOKEN_PATTERN = re.compile(r"[^\W_]+(?:'[^\W_]+)*")
+QUERY_PATTERN = re.compile(r'"([^"]+)"|(\S+)')
+
+
+def tokenize(text):
+    """
+    Lowercase, strip accents and split into word tokens. Apostrophes inside a
+    word are dropped (Be'er -> beer) rather than splitting it.
+    """
+    text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii').lower()
+    return [token.replace("'", "") for token in TOKEN_PATTERN.findall(text)]
+
+
+def sound_key(token):
+    """
+    Transliteration-friendly key: fold spelling variants, collapse doubled
+    letters and drop inner vowels, so different romanisations of the same
+    name share a key.
+    """
+    for variant, replacement in TRANSLITERATIONS:
+        token = token.replace(variant, replacement)
+    token = re.sub(r'(.)\1+', r'\1', token)
+    return token[:1] + re.sub(r'[aeiouy]', '', token[1:])
+
+
+class InvertedIndex:
+    """
+    Postings of every term, stored as flat arrays sorted by (term, document,
+    position) with per-term offsets. Supports BM25 ranking and phrase
+    matching through the stored positions.
+    """
+
+    def __init__(self, documents, key):
+        self.vocabulary = {}
+        key_cache = {}
+        term_ids, doc_ids, positions = [], [], []
+        for doc_id, tokens in enumerate(documents):
+            for position, token in enumerate(tokens):
+                if token not in key_cache:
+                    key_cache[token] = key(token)
+                term_ids.append(self.vocabulary.setdefault(key_cache[token], len(self.vocabulary)))
+                doc_ids.append(doc_id)
+                positions.append(position)
+        self.key = key
+
+        term_ids = np.array(term_ids, dtype=np.int32)
+        doc_ids = np.array(doc_ids, dtype=np.int32)
+        positions = np.array(positions, dtype=np.int32)
+        order = np.lexsort((positions, doc_ids, term_ids))
+        self.postings_docs = doc_ids[order]
+        self.postings_positions = positions[order]
+        self.offsets = np.searchsorted(term_ids[order], np.arange(len(self.vocabulary) + 1))
+
+        self._set_lengths(np.array([len(tokens) for tokens in documents], dtype=np.int32))
+
+    def _set_lengths(self, doc_lengths):
+        self.doc_lengths = doc_lengths
+        self.n_docs = len(doc_lengths)
+        self.average_length = max(doc_lengths.mean(), 1) if self.n_docs else 1
+        self.position_stride = int(doc_lengths.max(initial=0)) + 1
+
+    # Arrays that make up the index, besides the vocabulary
+    ARRAYS = ('postings_docs', 'postings_positions', 'offsets', 'doc_lengths')
+
+    def to_arrays(self):
+        """The postings arrays, plus the vocabulary (terms in term id order)"""
+        return {name: getattr(self, name) for name in self.ARRAYS}, list(self.vocabulary)
+
+    @classmethod
+    def from_arrays(cls, arrays, vocabulary, key):
+        """Wrap published (memory-mapped) postings without copying them"""
+        index = cls.__new__(cls)
+        index.vocabulary = {term: term_id for term_id, term in enumerate(vocabulary)}
+        index.key = key
+        index.postings_docs = arrays['postings_docs']
+        index.postings_positions = arrays['postings_positions']
+        index.offsets = arrays['offsets']
+        index._set_lengths(arrays['doc_lengths'])
+        return index
+
+    def postings(self, token):
+        term_id = self.vocabulary.get(self.key(token))
+        if term_id is None:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32)
+        start, end = self.offsets[term_id], self.offsets[term_id + 1]
+        return self.postings_docs[start:end], self.postings_positions[start:end]
+
+    def bm25(self, tokens, k1=1.2, b=0.75):
+        """BM25 score of every document for the given query tokens"""
+        scores = np.zeros(self.n_docs)
+        for token in set(tokens):
+            docs, _ = self.postings(token)
+            if docs.size == 0:
+                continue
+            docs, term_frequency = np.unique(docs, return_counts=True)
+            idf = np.log(1 + (self.n_docs - docs.size + 0.5) / (docs.size + 0.5))
+            length_norm = k1 * (1 - b + b * self.doc_lengths[docs] / self.average_length)
+            scores[docs] += idf * term_frequency * (k1 + 1) / (term_frequency + length_norm)
+        return scores
+
+    def phrase_docs(self, tokens):
+        """Documents in which the tokens appear consecutively"""
+        docs, positions = self.postings(tokens[0])
+        keys = docs.astype(np.int64) * self.position_stride + positions
+        for offset, token in enumerate(tokens[1:], start=1):
+            docs, positions = self.postings(token)
+            next_keys = docs.astype(np.int64) * self.position_stride + positions - offset
+            keys = np.intersect1d(keys, next_keys, assume_unique=True)
+        return np.unique(keys // self.position_stride)
+
+
+class SearchIndex:
+    """
+    Exact-token and transliteration-key indexes over the same documents.
+    Exact matches rank higher; the key index finds alternative spellings and
+    is used for phrase matching.
+    """
+
+    SOUND_WEIGHT = 0.5
+    PHRASE_BOOST = 2.0
+
+    # Index attribute -> key of its terms
+    KEYS = {'exact': lambda token: token, 'sound': sound_key}
+
+    def __init__(self, documents):
+        self.exact = InvertedIndex(documents, key=self.KEYS['exact'])
+        self.sound = InvertedIndex(documents, key=self.KEYS['sound'])
+        self.n_docs = len(documents)
+
+    def to_arrays(self):
+        """The arrays of both indexes (prefixed with the index name), plus their vocabularies"""
+        arrays, meta = {}, {'n_docs': self.n_docs, 'vocabularies': {}}
+        for name in self.KEYS:
+            index_arrays, meta['vocabularies'][name] = getattr(self, name).to_arrays()
+            arrays.update({f'{name}_{key}': values for key, values in index_arrays.items()})
+        return arrays, meta
+
+    @classmethod
+    def from_arrays(cls, arrays, meta):
+        """Wrap a published (memory-mapped) search index without copying its postings"""
+        search = cls.__new__(cls)
+        search.n_docs = meta['n_docs']
+        for name, key in cls.KEYS.items():
+            index_arrays = {array: arrays[f'{name}_{array}'] for array in InvertedIndex.ARRAYS}
+            setattr(search, name, InvertedIndex.from_arrays(index_arrays, meta['vocabularies'][name], key))
+        return search
+
+    @staticmethod
+    def parse(query):
+        """Split a query into quoted phrases and single words (stop words removed)"""
+        phrases, words = [], []
+        for phrase, word in QUERY_PATTERN.findall(query):
+            tokens = tokenize(phrase or word)
+            if phrase and len(tokens) > 1:
+                phrases.append(tokens)
+            words.extend(token for token in tokens if token not in STOP_WORDS)
+        return phrases, words
+
+    def search(self, query, mask=None, limit=100):
+        """
+        Ranked search. Every quoted phrase must match; the other words are
+        ranked with BM25 (any of them may match). Returns (document ids,
+        scores) of at most `limit` hits, best first, restricted to mask.
+        """
+        phrases, words = self.parse(query)
+        if not words:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        scores = self.exact.bm25(words) + self.SOUND_WEIGHT * self.sound.bm25(words)
+
+        candidates = scores > 0
+        for phrase in phrases:
+            phrase_mask = np.zeros(self.n_docs, dtype=bool)
+            phrase_mask[self.sound.phrase_docs(phrase)] = True
+            candidates &= phrase_mask
+            scores[phrase_mask] *= self.PHRASE_BOOST
+        if mask is not None:
+            candidates &= mask
+
+        hits = np.flatnonzero(candidates)
+        if hits.size > limit:
+            hits = hits[np.argpartition(-scores[hits], limit)[:limit]]
+        hits = hits[np.argsort(-scores[hits], kind='stable')]
+        return hits, scores[hits]
+
+
+@st.cache_resource
+def get_search_index(version):
+    """
+    Build the search index over the GTD text fields once per dataset version
+    (in multi-worker mode, map the published one). Document ids are the CSV
+    row positions.
+    """
+    if is_shared():
+        return SearchIndex.from_arrays(*shared_data.attach_arrays(version, 'search'))
+    return build_search_index(get_raw_data(version))
+
+
+def build_search_index(df):
+    """
+    Build the search index of the raw data.
+    """
+    text = df[TEXT_FIELDS].fillna('').astype(str).agg(' '.join, axis=1)
+    return SearchIndex([tokenize(document) for document in text])
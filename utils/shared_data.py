@@ -0,0 +1,269 @@
+"""
+Multi-worker serving over one shared, memory-mapped copy of the dataset.
+
+A loader process reads data/IL_data.csv once and publishes every column and
+the precomputed aggregates (filter bitmaps, OLAP base cuboid, search index,
+group network) as .npy files in a version directory. Workers started with
+GTD_SHARED_DIR set map those files read-only instead of parsing the CSV, so
+the operating system keeps a single copy in its page cache for all of them.
+
+Version handshake: a version directory is complete before it is renamed into
+place, and only then is the CURRENT file atomically replaced with its name.
+Each session pins the CURRENT version at the start of every script run, so a
+republished dataset is picked up on the next rerun, never in the middle of one.
+
+Usage (from the repository root):
+    python -m utils.shared_data --dir /dev/shm/terror-attacks
+    python -m utils.shared_data --dir /dev/shm/terror-attacks --workers 4 --base-port 8501 --watch 30
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import streamlit as st
+
+SHARED_DIR_VARIABLE = 'GTD_SHARED_DIR'
+CURRENT_FILENAME = 'CURRENT'
+META_FILENAME = 'meta.json'
+VERSION_KEY = 'dataset_version'
+
+# Published versions kept on disk (sessions still on the previous one keep working)
+KEEP_VERSIONS = 2
+
+ROOT = Path(__file__).parent.parent
+DEFAULT_DIR = Path('/dev/shm/terror-attacks') if Path('/dev/shm').is_dir() else Path(tempfile.gettempdir()) / 'terror-attacks'
+
+
+def shared_dir():
+    """The published dataset directory in multi-worker mode, otherwise None"""
+    value = os.environ.get(SHARED_DIR_VARIABLE)
+    return Path(value) if value else None
+
+
+def current_version(directory):
+    """The latest complete published version"""
+    return (directory / CURRENT_FILENAME).read_text().strip()
+
+
+def pinned_version(directory):
+    """The version pinned for the running session (the latest one outside a session)"""
+    version = st.session_state.get(VERSION_KEY) if st.runtime.exists() else None
+    return version or current_version(directory)
+
+
+def pin_dataset_version():
+    """
+    Pin the latest published version for this session. Called at the start
+    of every run of the app; a no-op unless running in multi-worker mode.
+    """
+    directory = shared_dir()
+    if directory is not None:
+        st.session_state[VERSION_KEY] = current_version(directory)
+
+
+# -----------------------------------------------------------------------------
+# Workers: attach read-only
+
+
+def _read_meta(path):
+    return json.loads((path / META_FILENAME).read_text())
+
+
+def attach_frame(version):
+    """
+    The published dataset as a DataFrame. Numeric columns are read-only
+    memory maps of the published files (no copy); text columns are
+    categoricals over their mapped codes, so a worker only holds one copy of
+    each distinct string.
+    """
+    import numpy as np
+    import pandas as pd
+
+    path = shared_dir() / version
+    columns = {}
+    for position, column in enumerate(_read_meta(path)['columns']):
+        # A plain ndarray view of the map (no copy) behaves like the CSV columns
+        values = np.asarray(np.load(path / f'{position}.npy', mmap_mode='r'))
+        if 'categories' in column:
+            values = pd.Categorical.from_codes(values, column['categories'])
+        columns[column['name']] = values
+    return pd.DataFrame(columns, copy=False)
+
+
+def attach_arrays(version, name):
+    """The arrays (read-only memory maps) and metadata of a published aggregate"""
+    import numpy as np
+
+    path = shared_dir() / version / name
+    meta = _read_meta(path)
+    arrays = {key: np.asarray(np.load(path / f'{key}.npy', mmap_mode='r')) for key in meta['arrays']}
+    return arrays, meta['meta']
+
+
+# -----------------------------------------------------------------------------
+# Loader: publish
+
+
+def _build_filters(df):
+    from utils.filters import build_bitmap_index
+    return build_bitmap_index(df).to_arrays()
+
+
+def _build_cube(df):
+    from utils.cube import build_cube
+    return build_cube(df).to_arrays()
+
+
+def _build_search(df):
+    from utils.search import build_search_index
+    return build_search_index(df).to_arrays()
+
+
+def _build_network(df):
+    from utils.network import build_group_network
+    return build_group_network(df).to_arrays()
+
+
+# Aggregate name -> builder returning (arrays, JSON metadata)
+AGGREGATES = {
+    'filters': _build_filters,
+    'cube': _build_cube,
+    'search': _build_search,
+    'network': _build_network,
+}
+
+
+def _json_default(value):
+    return value.item()
+
+
+def _write_frame(df, path):
+    import numpy as np
+    import pandas as pd
+
+    columns = []
+    for position, name in enumerate(df.columns):
+        series = df[name]
+        column = {'name': name, 'dtype': str(series.dtype)}
+        if pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+            np.save(path / f'{position}.npy', series.to_numpy())
+        else:
+            codes, categories = pd.factorize(series)
+            # Saved in the integer type pandas keeps categorical codes in, so attaching does not copy them
+            np.save(path / f'{position}.npy', pd.Categorical.from_codes(codes, categories).codes)
+            column['categories'] = categories.tolist()
+        columns.append(column)
+    (path / META_FILENAME).write_text(json.dumps({'columns': columns, 'rows': len(df)}, default=_json_default))
+
+
+def _write_arrays(arrays, meta, path):
+    import numpy as np
+
+    path.mkdir()
+    for key, values in arrays.items():
+        np.save(path / f'{key}.npy', values)
+    (path / META_FILENAME).write_text(json.dumps({'arrays': list(arrays), 'meta': meta}, default=_json_default))
+
+
+def csv_version():
+    """Version of the CSV file (the same key the single-process app uses)"""
+    from utils.data import DATA_FILENAME
+
+    stat = DATA_FILENAME.stat()
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+
+def publish(directory):
+    """
+    Publish the current CSV (if not already published) and make it the
+    CURRENT version. Returns the version.
+    """
+    import pandas as pd
+    from utils.data import DATA_FILENAME
+
+    directory.mkdir(parents=True, exist_ok=True)
+    version = csv_version()
+    current = directory / CURRENT_FILENAME
+    if current.exists() and current_version(directory) == version:
+        return version
+
+    final = directory / version
+    if not final.exists():
+        staging = Path(tempfile.mkdtemp(prefix=f'.{version}-', dir=directory))
+        staging.chmod(0o755)
+        df = pd.read_csv(DATA_FILENAME, encoding='ISO-8859-1', low_memory=False)
+        _write_frame(df, staging)
+        for name, build in AGGREGATES.items():
+            _write_arrays(*build(df), staging / name)
+        # The version directory is complete before it becomes visible...
+        os.rename(staging, final)
+
+    # ...and CURRENT only ever names a complete version
+    pointer = directory / f'.{CURRENT_FILENAME}-{os.getpid()}'
+    pointer.write_text(version)
+    os.replace(pointer, current)
+
+    published = sorted(
+        (path for path in directory.iterdir() if path.is_dir() and not path.name.startswith('.') and path != final),
+        key=lambda path: path.stat().st_mtime_ns
+    )
+    for old in published[:len(published) - (KEEP_VERSIONS - 1)]:
+        # Workers still mapping these files keep their pages until they unmap them
+        shutil.rmtree(old, ignore_errors=True)
+    return version
+
+
+def start_workers(directory, workers, base_port):
+    """Start `workers` Streamlit servers attached to the published dataset"""
+    env = {**os.environ, SHARED_DIR_VARIABLE: str(directory.resolve())}
+    return [
+        subprocess.Popen(
+            [sys.executable, '-m', 'streamlit', 'run', 'streamlit_app.py',
+             '--server.port', str(base_port + worker), '--server.headless', 'true'],
+            cwd=ROOT,
+            env=env
+        )
+        for worker in range(workers)
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument('--dir', type=Path, default=DEFAULT_DIR, help='Directory of the published dataset')
+    parser.add_argument('--workers', type=int, default=0, help='Streamlit workers to start (0: only publish)')
+    parser.add_argument('--base-port', type=int, default=8501, help='Port of the first worker')
+    parser.add_argument('--watch', type=float, default=0,
+                        help='Check the CSV every this many seconds and republish it when it changes')
+    args = parser.parse_args(argv)
+
+    version = publish(args.dir)
+    print(f"Published version {version} to {args.dir}")
+    processes = start_workers(args.dir, args.workers, args.base_port)
+    for worker, _ in enumerate(processes):
+        print(f"Worker {worker + 1} on port {args.base_port + worker}")
+    if not processes and not args.watch:
+        return
+
+    try:
+        while True:
+            time.sleep(args.watch or 1)
+            if args.watch and csv_version() != version:
+                version = publish(args.dir)
+                print(f"Published version {version}")
+            if processes and all(process.poll() is not None for process in processes):
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            process.terminate()
+
+
+if __name__ == '__main__':
+    main()
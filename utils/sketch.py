@@ -0,0 +1,63 @@
+import numpy as np
+
+
+class QuantileSketches:
+    """
+    A batch of mergeable quantile sketches of counts (non-negative
+    integers), one per group (DDSketch-style: counts in logarithmic buckets).
+
+    Bucket 0 counts zeros and bucket k >= 1 the values in
+    (gamma^(k-2), gamma^(k-1)], so every quantile is returned within
+    `relative_accuracy` of a value of the data. Sketches merge by adding their
+    bucket counts, so a roll-up of periods or an appended batch of events
+    never needs the raw rows again.
+    """
+
+    def __init__(self, counts, relative_accuracy=0.01):
+        self.counts = counts
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+
+    @classmethod
+    def from_values(cls, values, groups, n_groups, relative_accuracy=0.01):
+        """Sketch of the values of each group (group codes 0..n_groups-1)"""
+        sketches = cls(None, relative_accuracy)
+        buckets = sketches._bucket(np.asarray(values, dtype=float))
+        n_buckets = int(buckets.max(initial=0)) + 1
+        sketches.counts = np.bincount(
+            np.asarray(groups, dtype=np.int64) * n_buckets + buckets, minlength=n_groups * n_buckets
+        ).reshape(n_groups, n_buckets)
+        return sketches
+
+    def _bucket(self, values):
+        with np.errstate(divide='ignore'):
+            keys = np.ceil(np.log(values) / np.log(self.gamma))
+        return np.where(values > 0, np.maximum(keys + 1, 1), 0).astype(np.int64)
+
+    def _value(self, buckets):
+        """Representative value of each bucket (within the relative accuracy of all its values)"""
+        return np.where(buckets > 0, 2 * self.gamma ** (buckets - 1.0) / (self.gamma + 1), 0.0)
+
+    def _padded(self, n_buckets):
+        return np.pad(self.counts, ((0, 0), (0, n_buckets - self.counts.shape[1])))
+
+    def merge(self, other):
+        """Group-wise merge with another batch of the same groups (e.g. newly appended events)"""
+        n_buckets = max(self.counts.shape[1], other.counts.shape[1])
+        return QuantileSketches(self._padded(n_buckets) + other._padded(n_buckets), self.relative_accuracy)
+
+    def roll_up(self, codes, n_groups):
+        """Merge groups into coarser ones: group i becomes part of group codes[i]"""
+        counts = np.zeros((n_groups, self.counts.shape[1]), dtype=self.counts.dtype)
+        np.add.at(counts, codes, self.counts)
+        return QuantileSketches(counts, self.relative_accuracy)
+
+    def quantiles(self, qs):
+        """The qs quantiles of every group (groups x qs), NaN for empty groups"""
+        qs = np.asarray(qs, dtype=float)
+        cumulative = np.cumsum(self.counts, axis=1)
+        totals = cumulative[:, -1]
+        # Rank of each quantile (lower quantile, as in DDSketch), then its bucket
+        ranks = np.floor(qs[None, :] * np.maximum(totals[:, None] - 1, 0))
+        buckets = (cumulative[:, None, :] <= ranks[:, :, None]).sum(axis=2)
+        return np.where(totals[:, None] > 0, self._value(buckets), np.nan)
@@ -0,0 +1,85 @@
+import streamlit as st
+import numpy as np
+
+from utils.data import get_raw_data
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def to_unit_vectors(lat, lon):
+    """Points on the unit sphere; straight-line (chord) distance between them is monotonic in haversine distance"""
+    lat, lon = np.radians(lat), np.radians(lon)
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+def chord_to_km(chord):
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(chord / 2, 0, 1))
+
+
+def km_to_chord(km):
+    return 2 * np.sin(km / (2 * EARTH_RADIUS_KM))
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+class HaversineIndex:
+    """
+    KD-tree over event locations answering radius and k-nearest queries with
+    great-circle (haversine) distances. Results are CSV row positions.
+    """
+
+    def __init__(self, lat, lon, rows):
+        # scipy is only needed once the index is built
+        from scipy.spatial import cKDTree
+
+        self.rows = np.asarray(rows)
+        self.tree = cKDTree(to_unit_vectors(lat, lon))
+
+    def radius(self, lat, lon, km):
+        """Rows within km of the point, with their distances in km, nearest first"""
+        center = to_unit_vectors(lat, lon)[0]
+        positions = np.array(self.tree.query_ball_point(center, km_to_chord(km)), dtype=int)
+        if positions.size == 0:
+            return positions, np.zeros(0)
+        distances = chord_to_km(np.linalg.norm(self.tree.data[positions] - center, axis=1))
+        order = np.argsort(distances, kind='stable')
+        return self.rows[positions[order]], distances[order]
+
+    def nearest(self, lat, lon, k, mask=None):
+        """
+        The k nearest rows to the point (optionally only rows where mask is
+        True), with their distances in km.
+        """
+        k = min(k, self.tree.n)
+        if mask is None:
+            chords, positions = self.tree.query(to_unit_vectors(lat, lon)[0], k=k)
+        else:
+            # Widen the search until enough rows pass the mask
+            allowed = mask[self.rows]
+            wanted = k
+            while True:
+                count = min(wanted, self.tree.n)
+                chords, positions = self.tree.query(to_unit_vectors(lat, lon)[0], k=count)
+                chords, positions = np.atleast_1d(chords), np.atleast_1d(positions)
+                keep = allowed[positions]
+                if keep.sum() >= k or count == self.tree.n:
+                    chords, positions = chords[keep][:k], positions[keep][:k]
+                    break
+                wanted *= 4
+        return self.rows[np.atleast_1d(positions)], chord_to_km(np.atleast_1d(chords))
+
+
+@st.cache_resource
+def get_spatial_index(version):
+    """
+    Build the haversine index over every event with coordinates, once per dataset version.
+    Not published for multi-worker mode: a KD-tree cannot wrap mapped arrays,
+    so each worker builds its own (about 4 floats per located event).
+    """
+    df = get_raw_data(version)
+    located = df[df['latitude'].notna() & df['longitude'].notna()]
+    return HaversineIndex(located['latitude'].to_numpy(), located['longitude'].to_numpy(), located.index.to_numpy())
@@ -0,0 +1,311 @@
+// Client-side views of the static export. Every view is built from the typed
+// arrays in window.GTD (written by utils/static_export.py), decoded once per page.
+(function () {
+  'use strict';
+
+  const TYPES = {
+    uint8: Uint8Array, int8: Int8Array, uint16: Uint16Array, int16: Int16Array,
+    uint32: Uint32Array, int32: Int32Array, float32: Float32Array, float64: Float64Array
+  };
+
+  const WEAPON_COLORS = {
+    'Explosives': '#e31a1c', 'Firearms': '#1f78b4', 'Melee': '#33a02c', 'Incendiary': '#ff7f00',
+    'Vehicle': '#6a3d9a', 'Unknown': '#666666', 'Chemical': '#b15928', 'Biological': '#20b2aa', 'Other': '#a6cee3'
+  };
+
+  function decode(entry) {
+    const binary = atob(entry.data);
+    const bytes = new Uint8Array(binary.length);
+    for (let i = 0; i < binary.length; i++) bytes[i] = binary.charCodeAt(i);
+    return new TYPES[entry.type](bytes.buffer);
+  }
+
+  const columns = {};
+  for (const [name, entry] of Object.entries(window.GTD.columns)) columns[name] = decode(entry);
+
+  function text(name, i) {
+    const code = columns[name][i];
+    return code < 0 ? null : window.GTD.columns[name].dictionary[code];
+  }
+
+  function isNumeric(name) {
+    return !window.GTD.columns[name].dictionary;
+  }
+
+  function el(tag, attrs, children) {
+    const node = document.createElement(tag);
+    Object.assign(node, attrs || {});
+    for (const child of children || []) node.append(child);
+    return node;
+  }
+
+  function table(headers, rows) {
+    return el('table', {}, [
+      el('thead', {}, [el('tr', {}, headers.map(h => el('th', {textContent: h})))]),
+      el('tbody', {}, rows.map(row => el('tr', {}, row.map(cell => el('td', {textContent: cell})))))
+    ]);
+  }
+
+  function presetSelect(presets, label, onChange) {
+    const select = el('select', {}, presets.map((preset, i) => el('option', {value: i, textContent: label(preset)})));
+    select.addEventListener('change', () => onChange(presets[select.value]));
+    return select;
+  }
+
+  const fmt = (value, digits) => value === null || Number.isNaN(value) ? 'N/A'
+    : value.toLocaleString('en-US', {minimumFractionDigits: digits, maximumFractionDigits: digits});
+
+  // ---------------------------------------------------------------------------
+  // Home page: dataset explorer
+
+  function home(root) {
+    const summary = window.GTD.summary;
+    const missing = summary.reduce((total, column) => total + column.missing, 0);
+    root.append(el('h1', {textContent: 'Terror Attacks Visualization Project'}));
+    root.append(el('h2', {textContent: 'Dataset Explorer'}));
+    root.append(el('div', {className: 'metrics'}, [
+      ['Total Rows', window.GTD.rows], ['Total Columns', summary.length], ['Missing Values', missing]
+    ].map(([label, value]) => el('div', {className: 'metric'}, [
+      el('div', {className: 'label', textContent: label}), el('div', {className: 'value', textContent: fmt(value, 0)})
+    ]))));
+
+    root.append(el('h3', {textContent: 'Column Overview'}));
+    root.append(table(
+      ['Column', 'Unique Values', 'Missing Values (%)', 'Min', 'Max', 'Mean', 'Description'],
+      summary.map(c => [c.name, c.unique, (100 * c.missing / window.GTD.rows).toFixed(1) + '%',
+        fmt(c.min, 2), fmt(c.max, 2), fmt(c.mean, 2), c.description])
+    ));
+
+    root.append(el('h3', {textContent: 'Detailed Analysis'}));
+    const chart = el('div', {className: 'wide'});
+    const stats = el('div', {className: 'narrow'});
+    const select = el('select', {}, summary.map(c => el('option', {value: c.column, textContent: c.name})));
+    root.append(select, el('div', {className: 'row'}, [chart, stats]));
+
+    function render() {
+      const column = summary.find(c => c.column === select.value);
+      const values = columns[column.column];
+      if (isNumeric(column.column)) {
+        const present = Array.from(values).filter(v => !Number.isNaN(v));
+        Plotly.react(chart, [{type: 'histogram', x: present}], {
+          title: {text: 'Distribution of ' + column.name}, template: window.GTD.templates.plotly_white,
+          xaxis: {title: {text: column.name}}, yaxis: {title: {text: 'Count'}}
+        });
+        const sorted = present.slice().sort((a, b) => a - b);
+        const mean = present.reduce((a, b) => a + b, 0) / present.length;
+        const std = Math.sqrt(present.reduce((a, b) => a + (b - mean) ** 2, 0) / (present.length - 1));
+        const median = sorted.length % 2 ? sorted[(sorted.length - 1) / 2]
+          : (sorted[sorted.length / 2 - 1] + sorted[sorted.length / 2]) / 2;
+        stats.replaceChildren(table(['Statistic', 'Value'], [
+          ['Total Values', window.GTD.rows], ['Unique Values', column.unique], ['Missing Values', column.missing],
+          ['Mean', fmt(mean, 2)], ['Median', fmt(median, 2)], ['Std Dev', fmt(std, 2)],
+          ['Min', fmt(sorted[0], 2)], ['Max', fmt(sorted[sorted.length - 1], 2)]
+        ]));
+      } else {
+        const dictionary = window.GTD.columns[column.column].dictionary;
+        const counts = new Array(dictionary.length).fill(0);
+        for (const code of values) if (code >= 0) counts[code]++;
+        const top = counts.map((count, code) => [dictionary[code], count]).sort((a, b) => b[1] - a[1]).slice(0, 10);
+        Plotly.react(chart, [{type: 'bar', x: top.map(t => t[0]), y: top.map(t => t[1])}], {
+          title: {text: `Top ${top.length} Values in ${column.name}`}, template: window.GTD.templates.plotly_white,
+          xaxis: {title: {text: column.name}}, yaxis: {title: {text: 'Count'}}
+        });
+        stats.replaceChildren(table(['Statistic', 'Value'], [
+          ['Total Values', window.GTD.rows], ['Unique Values', column.unique], ['Missing Values', column.missing]
+        ]));
+      }
+    }
+    select.addEventListener('change', render);
+    render();
+  }
+
+  // ---------------------------------------------------------------------------
+  // Task 1: clustered map of attack locations
+
+  function task1(root) {
+    root.append(el('h2', {textContent: 'Geographic distribution of terror attacks'}));
+    const lat = [], lon = [], hover = [];
+    for (let i = 0; i < window.GTD.rows; i++) {
+      if (Number.isNaN(columns.latitude[i]) || Number.isNaN(columns.longitude[i])) continue;
+      lat.push(columns.latitude[i]);
+      lon.push(columns.longitude[i]);
+      hover.push(`<b>City:</b> ${text('city', i)}<br><b>Casualties:</b> ${columns.nkill[i] + columns.nwound[i]}` +
+        `<br><b>Year:</b> ${columns.iyear[i]}`);
+    }
+    const map = el('div', {style: 'height: 700px'});
+    root.append(map);
+    const labels = window.GTD.cityLabels;
+    Plotly.newPlot(map, [{
+      type: 'scattermap', lat: lat, lon: lon, hovertext: hover, hoverinfo: 'text',
+      marker: {size: 10, color: 'blue', opacity: 0.7},
+      cluster: {enabled: true, maxzoom: 11, step: [10, 100], color: ['green', 'yellow', 'orange'], size: [20, 26, 32]}
+    }, {
+      type: 'scattermap', lat: labels.map(c => c.lat), lon: labels.map(c => c.lon),
+      text: labels.map(c => c.name), hoverinfo: 'text', mode: 'markers',
+      marker: {size: 14, color: '#d62728'}
+    }], {
+      map: {style: 'carto-positron', center: {lat: 31.5, lon: 34.8}, zoom: 7},
+      showlegend: false, margin: {l: 0, r: 0, t: 0, b: 0}
+    });
+  }
+
+  // ---------------------------------------------------------------------------
+  // Task 2: correlation matrix between terrorists, deaths and injuries
+
+  const FEATURES = ['nperps', 'nkill', 'nwound'];
+  const LABELS = {nperps: 'Terorists Involved', nkill: 'Deaths', nwound: 'Injuries'};
+  const PAIR_COLORS = {'nperps,nperps': '#1f77b4', 'nkill,nkill': '#1f77b4', 'nwound,nwound': '#1f77b4',
+    'nperps,nkill': '#f9f871', 'nperps,nwound': '#7851a9', 'nkill,nwound': '#ff7f0e'};
+
+  function pearson(x, y) {
+    const n = x.length;
+    const mx = x.reduce((a, b) => a + b, 0) / n, my = y.reduce((a, b) => a + b, 0) / n;
+    let sxy = 0, sxx = 0, syy = 0;
+    for (let i = 0; i < n; i++) {
+      sxy += (x[i] - mx) * (y[i] - my); sxx += (x[i] - mx) ** 2; syy += (y[i] - my) ** 2;
+    }
+    return {r: sxy / Math.sqrt(sxx * syy), slope: sxy / sxx, intercept: my - (sxy / sxx) * mx};
+  }
+
+  function task2(root) {
+    root.append(el('h2', {textContent: 'Correlation between terrorists involved and casualties'}));
+    const chart = el('div', {className: 'wide'});
+    const side = el('div', {className: 'narrow'});
+    root.append(presetSelect(window.GTD.presets.task2, p => `Years ${p.years[0]}-${p.years[1]}`, render));
+    root.append(el('div', {className: 'row'}, [chart, side]));
+
+    function render(preset) {
+      const [start, end] = preset.years;
+      const rows = [];
+      for (let i = 0; i < window.GTD.rows; i++) {
+        if (columns.iyear[i] >= start && columns.iyear[i] <= end && FEATURES.every(f => columns[f][i] > 0)) rows.push(i);
+      }
+      const values = Object.fromEntries(FEATURES.map(f => [f, rows.map(i => columns[f][i])]));
+      const customdata = rows.map(i => [columns.iyear[i], text('city', i)]);
+      const traces = [], layout = {height: 900, showlegend: false, annotations: [],
+        title: {text: `Correlation Matrix with Distributions ${start}-${end}`, font: {size: 30}, x: 0.5}};
+      const gap = 0.08, size = (1 - 2 * gap) / 3;
+
+      FEATURES.forEach((feat1, i) => FEATURES.forEach((feat2, j) => {
+        const n = j * 3 + i + 1, suffix = n === 1 ? '' : n;
+        const xdomain = [i * (size + gap), i * (size + gap) + size], ydomain = [1 - j * (size + gap) - size, 1 - j * (size + gap)];
+        layout['xaxis' + suffix] = {domain: xdomain, anchor: 'y' + suffix, title: {text: LABELS[feat1]}, gridcolor: 'rgba(128, 128, 128, 0.2)'};
+        layout['yaxis' + suffix] = {domain: ydomain, anchor: 'x' + suffix, title: {text: i === j ? 'Count' : LABELS[feat2]}};
+        layout.annotations.push({text: i === j ? `${LABELS[feat1]} Distribution` : `${LABELS[feat1]} vs ${LABELS[feat2]}`,
+          x: (xdomain[0] + xdomain[1]) / 2, y: ydomain[1], xref: 'paper', yref: 'paper', yanchor: 'bottom', showarrow: false, font: {size: 16}});
+        const axes = {xaxis: 'x' + suffix, yaxis: 'y' + suffix};
+        if (!rows.length) return;
+        if (i === j) {
+          traces.push({type: 'histogram', x: values[feat1], nbinsx: 30, marker: {color: PAIR_COLORS[feat1 + ',' + feat1]}, ...axes});
+          return;
+        }
+        const fit = pearson(values[feat1], values[feat2]);
+        const lo = Math.min(...values[feat1]), hi = Math.max(...values[feat1]), pad = (hi - lo) * 0.1;
+        traces.push({type: 'scatter', mode: 'markers', x: values[feat1], y: values[feat2], customdata: customdata,
+          marker: {color: PAIR_COLORS[feat1 + ',' + feat2] || PAIR_COLORS[feat2 + ',' + feat1], size: 5, opacity: 0.6},
+          hovertemplate: `${LABELS[feat1]}: %{x}<br>${LABELS[feat2]}: %{y}<br>Year: %{customdata[0]}<br>City: %{customdata[1]}<extra></extra>`, ...axes});
+        traces.push({type: 'scatter', mode: 'lines', x: [lo - pad, hi + pad],
+          y: [lo - pad, hi + pad].map(x => fit.slope * x + fit.intercept),
+          line: {color: 'rgba(255, 0, 0, 0.8)', width: 2}, hoverinfo: 'skip', ...axes});
+      }));
+      Plotly.react(chart, traces, layout);
+
+      const names = ['Terrorists', 'Deaths', 'Injuries'];
+      side.replaceChildren(el('h3', {textContent: 'Correlation Matrix'}), rows.length ? table([''].concat(names),
+        FEATURES.map((f1, a) => [names[a]].concat(FEATURES.map(f2 => pearson(values[f1], values[f2]).r.toFixed(3)))))
+        : el('p', {textContent: `No valid data found for the selected year range (${start}-${end})`}));
+    }
+    render(window.GTD.presets.task2[0]);
+  }
+
+  // ---------------------------------------------------------------------------
+  // Task 3: cumulative casualties by weapon type over time
+
+  function task3(root) {
+    root.append(el('h2', {textContent: 'Evolution of terror attacks by weapon type'}));
+    const chart = el('div', {className: 'wide'});
+    const side = el('div', {className: 'narrow'});
+    root.append(presetSelect(window.GTD.presets.task3,
+      p => `${p.timeGroup}ly, at least ${p.minIncidents} incidents, ${p.logScale ? 'log' : 'linear'} scale`, render));
+    root.append(el('div', {className: 'row'}, [chart, side]));
+    const weaponNames = window.GTD.columns.weaptype1_txt.dictionary;
+
+    function render(preset) {
+      // Group incidents, deaths and injuries by (time period, weapon)
+      const groups = new Map(), weaponTotals = new Array(weaponNames.length).fill(0);
+      for (let i = 0; i < window.GTD.rows; i++) {
+        const weapon = columns.weaptype1_txt[i];
+        if (weapon < 0) continue;
+        const period = preset.timeGroup === 'Month'
+          ? `${columns.iyear[i]}-${String(columns.imonth[i]).padStart(2, '0')}` : String(columns.iyear[i]).padStart(4, '0');
+        const key = period + '|' + weapon;
+        const group = groups.get(key) || groups.set(key, {period, weapon, id: 0, fatalities: 0, injuries: 0}).get(key);
+        group.id++; group.fatalities += columns.nkill[i]; group.injuries += columns.nwound[i];
+        weaponTotals[weapon]++;
+      }
+      const kept = [...groups.values()].filter(g => weaponTotals[g.weapon] >= preset.minIncidents);
+      const periods = [...new Set(kept.map(g => g.period))].sort();
+      const weapons = [...new Set(kept.map(g => g.weapon))].sort((a, b) => weaponNames[a].localeCompare(weaponNames[b]));
+      const lookup = new Map(kept.map(g => [g.period + '|' + g.weapon, g]));
+
+      // Cumulative totals on the complete (period x weapon) grid
+      const frames = periods.map(period => ({name: period, points: []}));
+      const totals = [];
+      let maxBubble = 1, maxInjuries = 1, maxDeaths = 1;
+      weapons.forEach(weapon => {
+        let incidents = 0, fatalities = 0, injuries = 0;
+        periods.forEach((period, p) => {
+          const group = lookup.get(period + '|' + weapon);
+          if (group) { incidents += group.id; fatalities += group.fatalities; injuries += group.injuries; }
+          const point = {weapon, incidents, fatalities: Math.max(fatalities, 1), injuries: Math.max(injuries, 1), size: incidents + 10};
+          frames[p].points.push(point);
+          maxBubble = Math.max(maxBubble, point.size);
+          maxInjuries = Math.max(maxInjuries, point.injuries);
+          maxDeaths = Math.max(maxDeaths, point.fatalities);
+        });
+        totals.push([weaponNames[weapon], incidents, fatalities, injuries]);
+      });
+
+      const sizeref = 2 * maxBubble / (60 ** 2);
+      const traces = points => points.map(point => ({
+        type: 'scatter', mode: 'markers', name: weaponNames[point.weapon],
+        x: [point.injuries], y: [point.fatalities], customdata: [[point.incidents]],
+        marker: {size: [point.size], sizemode: 'area', sizeref: sizeref, color: WEAPON_COLORS[weaponNames[point.weapon]] || '#999999'},
+        hovertemplate: `<b>${weaponNames[point.weapon]}</b><br>Cumulative Number of Incidents: %{customdata[0]}` +
+          '<br>Cumulative Number of Deaths: %{y:,.0f}<br>Cumulative Number of Injuries: %{x:,.0f}<extra></extra>'
+      }));
+      const log = preset.logScale;
+      const axis = (title, max) => ({
+        type: log ? 'log' : 'linear', title: {text: `${title} (${log ? 'log' : 'linear'} scale)`},
+        range: log ? [Math.log10(0.9), Math.log10(max * 3)] : [0, max * 1.1]
+      });
+      const layout = {
+        height: 700, title: {text: `Evolution of Terror Attacks by Weapon Type (${preset.timeGroup}ly)`},
+        xaxis: axis('Cumulative Number of Injuries', maxInjuries), yaxis: axis('Cumulative Number of Deaths', maxDeaths),
+        legend: {title: {text: 'Weapon Type'}},
+        updatemenus: [{type: 'buttons', showactive: false, x: 0.05, y: 1.1, buttons: [
+          {label: '▶️ Play', method: 'animate', args: [null, {frame: {duration: 800, redraw: true}, fromcurrent: true, transition: {duration: 300}, mode: 'immediate'}]},
+          {label: '⏸️ Pause', method: 'animate', args: [[null], {frame: {duration: 0, redraw: false}, mode: 'immediate'}]}
+        ]}],
+        sliders: [{currentvalue: {prefix: 'Time Period: '}, pad: {t: 50}, len: 0.9, x: 0.1, y: 0,
+          steps: periods.map(period => ({label: period, method: 'animate',
+            args: [[period], {frame: {duration: 0, redraw: true}, mode: 'immediate', transition: {duration: 300}}]}))}]
+      };
+      Plotly.newPlot(chart, {
+        data: frames.length ? traces(frames[0].points) : [],
+        layout: layout,
+        frames: frames.map(frame => ({name: frame.name, data: traces(frame.points)}))
+      });
+      side.replaceChildren(el('h3', {textContent: 'Current Statistics'}),
+        table(['Weapon', 'Incidents', 'Deaths', 'Injuries'], totals.sort((a, b) => b[1] - a[1])));
+    }
+    render(window.GTD.presets.task3[0]);
+  }
+
+  const VIEWS = {home, task1, task2, task3};
+
+  document.addEventListener('DOMContentLoaded', () => {
+    const root = document.getElementById('app');
+    VIEWS[root.dataset.page](root);
+  });
+})();
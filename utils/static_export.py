@@ -0,0 +1,212 @@
+"""
+Render the dashboard into a static HTML/JS bundle that can be served from any
+static file server.
+
+The dataset is encoded once into assets/data.js as base64 typed arrays
+(categorical columns as small integer codes plus a dictionary). Every page of
+the bundle decodes the same arrays and builds its figures in the browser for
+the preset widget states, so no data is duplicated per figure.
+
+Usage (from the repository root):
+    python -m utils.static_export --out dist
+    python -m utils.static_export --out dist --year-ranges 1971-2017 2000-2017 --min-incidents 1 5 10
+"""
+import argparse
+import base64
+import json
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from utils.data import DATA_FILENAME, VEHICLE_WEAPON
+
+ASSETS_PATH = Path(__file__).parent / 'static_assets'
+COLUMN_DESC_FILENAME = Path(__file__).parent.parent / 'data/column_desc.csv'
+
+HOME_COLUMNS = ["iyear", "imonth", "iday", "city", "latitude", "longitude", "nperps", "nkill", "nwound", "weaptype1_txt"]
+
+PAGES = {
+    'index.html': ('home', 'Home Page'),
+    'task1.html': ('task1', 'Task 1'),
+    'task2.html': ('task2', 'Task 2'),
+    'task3.html': ('task3', 'Task 3'),
+}
+
+# Plotly templates the client-side figures use, shipped resolved: plotly.js
+# does not know Python's named templates and ignores a name
+TEMPLATES = ['plotly_white']
+
+# Same cities the task1 page labels on the map
+CITY_LABELS = [
+    {'name': 'Jerusalem', 'lat': 31.772180600401597, 'lon': 35.20426017469879},
+    {'name': 'Tel Aviv', 'lat': 32.082969999999996, 'lon': 34.81188600000001},
+    {'name': 'Ashkelon', 'lat': 31.665745571428566, 'lon': 34.57345348214286},
+    {'name': 'Sderot', 'lat': 31.528199999999995, 'lon': 34.596382000000006},
+    {'name': 'Eshkol regional council', 'lat': 31.213881746268658, 'lon': 34.460347388059695},
+    {'name': 'Ashdod', 'lat': 31.819970431372543, 'lon': 34.66481956862746},
+    {'name': 'Beersheba', 'lat': 31.258944624999998, 'lon': 34.786781},
+    {'name': 'Haifa', 'lat': 32.79357451219513, 'lon': 34.990603195121956},
+    {'name': 'Shaar HaNegev regional council', 'lat': 31.51099376923077, 'lon': 34.62375746153846},
+    {'name': 'Petah Tiqwa', 'lat': 32.089161, 'lon': 34.88382},
+    {'name': 'Netanya', 'lat': 32.32518116, 'lon': 34.85378992},
+    {'name': 'Sdot Negev regional council', 'lat': 31.41276371428572, 'lon': 34.580247190476186},
+    {'name': 'Kissufim', 'lat': 31.373840000000005, 'lon': 34.39836371428571},
+]
+
+
+def load_data():
+    """
+    The home page dataset, normalised the same way as homePage.get_data.
+    It covers every column the task pages need too.
+    """
+    df = pd.read_csv(DATA_FILENAME, encoding='ISO-8859-1', low_memory=False)[HOME_COLUMNS]
+    for column in HOME_COLUMNS:
+        if pd.api.types.is_numeric_dtype(df[column]):
+            df.loc[df[column] < 0, column] = np.nan
+    df['weaptype1_txt'] = df['weaptype1_txt'].replace(VEHICLE_WEAPON, 'Vehicle')
+    cols_to_int = ['iyear', 'imonth', 'iday', 'nperps', 'nkill', 'nwound']
+    df[cols_to_int] = df[cols_to_int].fillna(0).astype(int)
+    df['city'] = df['city'].replace('Sederot', 'Sderot')
+    return df
+
+
+def _smallest_int_dtype(values):
+    for dtype in (np.uint8, np.int8, np.uint16, np.int16, np.uint32, np.int32):
+        info = np.iinfo(dtype)
+        if values.size == 0 or (values.min() >= info.min and values.max() <= info.max):
+            return np.dtype(dtype)
+    return np.dtype(np.float64)
+
+
+def encode_column(series):
+    """
+    Encode a column as a base64 typed array: integers use the smallest integer
+    type that fits, floats use Float32 (NaN for missing), and text columns
+    become integer codes (-1 for missing) plus a dictionary.
+    """
+    if pd.api.types.is_integer_dtype(series):
+        dtype = _smallest_int_dtype(series.to_numpy())
+        encoded = series.to_numpy().astype(dtype)
+        entry = {'type': dtype.name}
+    elif pd.api.types.is_numeric_dtype(series):
+        encoded = series.to_numpy(dtype=np.float32)
+        entry = {'type': 'float32'}
+    else:
+        codes, uniques = pd.factorize(series, sort=True)
+        dtype = _smallest_int_dtype(np.append(codes, -1))
+        encoded = codes.astype(dtype)
+        entry = {'type': dtype.name, 'dictionary': uniques.tolist()}
+    entry['data'] = base64.b64encode(encoded.astype(encoded.dtype.newbyteorder('<')).tobytes()).decode('ascii')
+    return entry
+
+
+def column_summary(df):
+    """
+    The home page "Column Overview" table, precomputed (it does not depend on
+    any widget).
+    """
+    columns_desc = pd.read_csv(COLUMN_DESC_FILENAME, encoding='ISO-8859-1')
+    names = dict(zip(columns_desc.iloc[:, 0], columns_desc.iloc[:, 2]))
+    descriptions = dict(zip(columns_desc.iloc[:, 0], columns_desc.iloc[:, 1]))
+    summary = []
+    for column in df.columns:
+        numeric = pd.api.types.is_numeric_dtype(df[column])
+        summary.append({
+            'column': column,
+            'name': names.get(column, column),
+            'description': descriptions.get(column, 'N/A'),
+            'numeric': bool(numeric),
+            'unique': int(df[column].nunique()),
+            'missing': int(df[column].isna().sum()),
+            'min': float(df[column].min()) if numeric else None,
+            'max': float(df[column].max()) if numeric else None,
+            'mean': float(df[column].mean()) if numeric else None,
+        })
+    return summary
+
+
+def build_bundle(df, presets):
+    """
+    The JavaScript source of assets/data.js: the encoded columns, the
+    precomputed column summary, the figure templates and the preset widget
+    states.
+    """
+    import plotly.io as pio
+
+    bundle = {
+        'rows': len(df),
+        'columns': {column: encode_column(df[column]) for column in df.columns},
+        'summary': column_summary(df),
+        'templates': {name: pio.templates[name].to_plotly_json() for name in TEMPLATES},
+        'cityLabels': CITY_LABELS,
+        'presets': presets,
+    }
+    return 'window.GTD = ' + json.dumps(bundle, separators=(',', ':')) + ';\n'
+
+
+def render_page(page, title):
+    template = (ASSETS_PATH / 'page.html').read_text(encoding='utf-8')
+    links = []
+    for filename, (name, label) in PAGES.items():
+        active = ' class="active"' if name == page else ''
+        links.append(f'<a href="{filename}"{active}>{label}</a>')
+    nav = "\n".join(links)
+    return template.replace('{{title}}', title).replace('{{nav}}', nav).replace('{{page}}', page)
+
+
+def export(out_dir, presets):
+    """
+    Write the static bundle to out_dir and return the written file sizes.
+    """
+    from plotly.offline import get_plotlyjs
+
+    out_dir = Path(out_dir)
+    assets = out_dir / 'assets'
+    assets.mkdir(parents=True, exist_ok=True)
+
+    (assets / 'data.js').write_text(build_bundle(load_data(), presets), encoding='utf-8')
+    (assets / 'plotly.min.js').write_text(get_plotlyjs(), encoding='utf-8')
+    shutil.copy(ASSETS_PATH / 'app.js', assets / 'app.js')
+    shutil.copy(ASSETS_PATH / 'style.css', assets / 'style.css')
+    for filename, (page, title) in PAGES.items():
+        (out_dir / filename).write_text(render_page(page, title), encoding='utf-8')
+
+    return {str(path.relative_to(out_dir)): path.stat().st_size for path in sorted(out_dir.rglob('*')) if path.is_file()}
+
+
+def _year_range(text):
+    start, end = text.split('-')
+    return [int(start), int(end)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument('--out', type=Path, default=Path('dist'), help='Output directory')
+    parser.add_argument('--year-ranges', nargs='+', type=_year_range, default=[[1971, 2017], [1971, 1999], [2000, 2017]],
+                        help='task2 year range presets, e.g. 1971-2017')
+    parser.add_argument('--time-groupings', nargs='+', choices=['Month', 'Year'], default=['Year', 'Month'],
+                        help='task3 Time Grouping presets')
+    parser.add_argument('--min-incidents', nargs='+', type=int, default=[5], help='task3 minimum incidents presets')
+    parser.add_argument('--log-scale', nargs='+', type=lambda text: text.lower() in ('1', 'true', 'yes'), default=[True, False],
+                        help='task3 log scale presets')
+    args = parser.parse_args(argv)
+
+    presets = {
+        'task2': [{'years': years} for years in args.year_ranges],
+        'task3': [
+            {'timeGroup': time_group, 'minIncidents': min_incidents, 'logScale': log_scale}
+            for time_group in args.time_groupings
+            for min_incidents in args.min_incidents
+            for log_scale in args.log_scale
+        ],
+    }
+    sizes = export(args.out, presets)
+    for path, size in sizes.items():
+        print(f"{size / 1024:10.1f} kB  {path}")
+    print(f"{sum(sizes.values()) / 1024:10.1f} kB  total")
+
+
+if __name__ == '__main__':
+    main()